@@ -0,0 +1,163 @@
+"""
+Execução assíncrona (asyncio).
+
+O programa é traduzido pelo backend Python em modo assíncrono: vira uma
+corrotina em que cada comando e cada leitura de sensor são aguardados num
+driver assíncrono, e os laços cedem a vez ao event loop a cada `quantum`
+iterações. Assim um único event loop roda centenas de robôs ao mesmo tempo
+sem uma thread por interpretador, e um `while` apertado não trava os outros.
+
+Um driver implementa duas corrotinas:
+
+    async def send(self, commands)   # lista de nomes de comando, em ordem
+    async def read_all(self)         # {posição: valor} das quatro posições
+
+AsyncRobot põe em cima do driver as mesmas regras da SymbolTable: comandos
+acumulados em lotes, snapshot de sensores válido até o próximo comando e
+envio dos comandos pendentes antes de uma leitura nova.
+
+Uso:
+    results = asyncio.run(run_many([(programa, driver1), (programa, driver2)]))
+"""
+import asyncio
+import time
+from abc import ABC, abstractmethod
+
+import transpiler
+from sensors import StaticSensors
+from sinks import MemorySink
+
+DEFAULT_QUANTUM = 1000
+
+
+class AsyncDriver(ABC):
+    """Interface dos drivers assíncronos (ver docstring do módulo)."""
+    @abstractmethod
+    async def send(self, commands):
+        pass
+
+    @abstractmethod
+    async def read_all(self):
+        pass
+
+
+class LocalDriver(AsyncDriver):
+    """
+    Adapta um CommandSink e um SensorProvider síncronos; `latency` (segundos)
+    simula o tempo de ida e volta até o robô em cada chamada.
+    """
+    def __init__(self, sink=None, sensors=None, latency=0.0):
+        self.sink = sink if sink is not None else MemorySink(batch_size=1)
+        self.sensors = sensors if sensors is not None else StaticSensors()
+        self.latency = latency
+
+    async def send(self, commands):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for name in commands:
+            self.sink.send(name)
+        self.sink.flush()
+
+    async def read_all(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.sensors.read_all()
+
+
+class AsyncRobot:
+    def __init__(self, driver, batch_size=64):
+        self.driver = driver
+        self.batch_size = max(1, batch_size)
+        self.pending = []
+        self.snapshot = None
+        self.hits = 0
+        self.misses = 0
+
+    async def command(self, name):
+        self.pending.append(name)
+        self.snapshot = None
+        if len(self.pending) >= self.batch_size:
+            await self.flush()
+
+    async def read_sensor(self, pos):
+        snapshot = self.snapshot
+        if snapshot is None:
+            self.misses += 1
+            await self.flush()
+            snapshot = self.snapshot = await self.driver.read_all()
+        else:
+            self.hits += 1
+        return snapshot[pos]
+
+    async def flush(self):
+        if self.pending:
+            batch = self.pending
+            self.pending = []
+            await self.driver.send(batch)
+
+
+def compile_program(program):
+    return transpiler.PyTranspiler(program, asynchronous=True).compile("<rbt-async>")
+
+
+def _coroutine(code, command, read_sensor, quantum):
+    namespace = {"_div": transpiler._div, "_fail": transpiler._fail,
+                 "_bool_str": transpiler.bool_str}
+    exec(code, namespace)
+    return namespace["_programa"](command, read_sensor, asyncio.sleep, max(1, quantum))
+
+
+async def run(program, driver, quantum=DEFAULT_QUANTUM, batch_size=64, code=None):
+    """Executa `program` contra `driver`; os comandos pendentes são enviados no fim."""
+    if code is None:
+        code = compile_program(program)
+    robot = AsyncRobot(driver, batch_size)
+    try:
+        await _coroutine(code, robot.command, robot.read_sensor, quantum)
+    except NameError as e:
+        raise transpiler.undefined_variable(e) from None
+    finally:
+        await robot.flush()
+    return robot
+
+
+async def run_many(jobs, quantum=DEFAULT_QUANTUM, batch_size=64):
+    """
+    Roda vários (programa, driver) concorrentemente no event loop atual e
+    devolve um resultado por job, na mesma ordem. A falha de um robô não
+    interrompe os outros. Programas repetidos são traduzidos uma única vez.
+    """
+    codes = {}
+
+    async def one(program, driver):
+        result = {"exit_status": 0, "error": None}
+        start = time.perf_counter()
+        try:
+            if id(program) not in codes:
+                codes[id(program)] = compile_program(program)
+            await run(program, driver, quantum, batch_size, codes[id(program)])
+        except Exception as e:
+            result["exit_status"] = 1
+            result["error"] = str(e)
+        result["wall_time"] = time.perf_counter() - start
+        return result
+
+    return await asyncio.gather(*(one(program, driver) for program, driver in jobs))
+
+
+def run_table(program, symbol_table, quantum=DEFAULT_QUANTUM):
+    """
+    Ponte síncrona usada por `--engine async`: roda a corrotina num event
+    loop próprio usando o sink e os sensores da tabela de símbolos.
+    """
+    async def command(name):
+        symbol_table.command(name)
+
+    async def read_sensor(pos):
+        return symbol_table.read_sensor(pos)
+
+    code = compile_program(program)
+    try:
+        asyncio.run(_coroutine(code, command, read_sensor, quantum))
+    except NameError as e:
+        raise transpiler.undefined_variable(e) from None
@@ -0,0 +1,152 @@
+"""
+Executa muitos programas .rbt (ou muitas instâncias de robô) em paralelo
+num pool de processos e coleta um resultado estruturado por execução.
+
+Entrada: um diretório (todos os *.rbt dentro dele) ou um manifesto JSON /
+JSON Lines com entradas no formato
+
+    {"program": "missao.rbt", "name": "robo-7", "sensors": {"front": "wall"}}
+
+em que só "program" é obrigatório (caminho relativo ao manifesto) e
+"sensors" fixa a leitura de cada posição (o padrão é "none").
+
+Cada worker analisa cada arquivo uma única vez e reaproveita a AST para
+todas as instâncias que rodam o mesmo programa.
+
+Uso:
+    python3 batch.py missoes/ -j 8 --engine vm -o resultados.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import main
+from sensors import StaticSensors
+from sinks import MemorySink
+
+# AST de cada programa já analisado neste worker
+_programs = {}
+
+
+def load_manifest(path):
+    if os.path.isdir(path):
+        return [{"program": os.path.join(path, name)}
+                for name in sorted(os.listdir(path)) if name.endswith(".rbt")]
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, "r") as f:
+        if path.endswith(".jsonl"):
+            entries = [json.loads(line) for line in f if line.strip()]
+        else:
+            entries = json.load(f)
+            if isinstance(entries, dict):
+                entries = entries["programs"]
+    for entry in entries:
+        if "program" not in entry:
+            raise ValueError(f"manifest entry without 'program': {entry}")
+        # valida as posições já na leitura do manifesto
+        StaticSensors(entry.get("sensors"))
+        entry["program"] = os.path.join(base, entry["program"])
+    return entries
+
+
+def _parse(path, optimize):
+    key = (path, optimize)
+    if key not in _programs:
+        with open(path, "r") as f:
+            program = main.Parser(main.Tokenizer(f.read())).parse()
+        if optimize:
+            import optimizer
+            program, _ = optimizer.optimize(program)
+        _programs[key] = program
+    return _programs[key]
+
+
+def run_entry(entry, engine="tree", optimize=False):
+    """Roda uma entrada do manifesto e devolve o resultado como dict."""
+    table = main.SymbolTable(sink=MemorySink(), sensors=StaticSensors(entry.get("sensors")))
+    result = {
+        "name": entry.get("name", os.path.basename(entry["program"])),
+        "program": entry["program"],
+        "exit_status": 0,
+        "error": None,
+    }
+    start = time.perf_counter()
+    try:
+        program = _parse(entry["program"], optimize)
+        main.run_program(program, table, engine)
+    except Exception as e:
+        result["exit_status"] = 1
+        result["error"] = str(e)
+    table.sink.close()
+    result["wall_time"] = time.perf_counter() - start
+    result["commands"] = table.sink.commands
+    return result
+
+
+def _run_chunk(args):
+    entries, engine, optimize = args
+    return [run_entry(entry, engine, optimize) for entry in entries]
+
+
+def run_batch(entries, workers=None, engine="tree", optimize=False, chunk_size=None):
+    """
+    Distribui `entries` entre `workers` processos e devolve os resultados
+    na mesma ordem. Entradas do mesmo programa vão juntas no mesmo pedaço
+    para aproveitar a AST já analisada no worker.
+    """
+    workers = workers or os.cpu_count() or 1
+    order = sorted(range(len(entries)), key=lambda i: entries[i]["program"])
+    if chunk_size is None:
+        chunk_size = max(1, len(entries) // (workers * 4))
+    chunks = [order[i:i + chunk_size] for i in range(0, len(order), chunk_size)]
+    results = [None] * len(entries)
+    if workers == 1:
+        outputs = map(_run_chunk, [([entries[i] for i in c], engine, optimize) for c in chunks])
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        outputs = pool.map(_run_chunk, [([entries[i] for i in c], engine, optimize) for c in chunks])
+    try:
+        for chunk, chunk_results in zip(chunks, outputs):
+            for index, result in zip(chunk, chunk_results):
+                results[index] = result
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return results
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description="Executa vários programas .rbt em paralelo")
+    argparser.add_argument("source", help="diretório com .rbt ou manifesto .json/.jsonl")
+    argparser.add_argument("-j", "--workers", type=int, default=None,
+                           help="número de processos (padrão: número de CPUs)")
+    argparser.add_argument("--engine", choices=main.ENGINES, default="tree")
+    argparser.add_argument("-O", "--optimize", action="store_true")
+    argparser.add_argument("-o", "--output", help="grava os resultados (JSON Lines) neste arquivo")
+    args = argparser.parse_args()
+
+    try:
+        entries = load_manifest(args.source)
+    except (OSError, ValueError) as e:
+        sys.stderr.write(f"Erro: {e}\n")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    results = run_batch(entries, args.workers, args.engine, args.optimize)
+    elapsed = time.perf_counter() - start
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for result in results:
+            out.write(json.dumps(result) + "\n")
+    finally:
+        if args.output:
+            out.close()
+
+    failed = sum(1 for r in results if r["exit_status"] != 0)
+    sys.stderr.write(f"{len(results)} programs, {failed} failed, {elapsed:.2f}s\n")
+    sys.exit(1 if failed else 0)
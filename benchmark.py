@@ -0,0 +1,263 @@
+"""
+Benchmarks do Tokenizer, do Parser e do interpretador sobre programas
+gerados por rbtgen.py, com baselines em JSON para pegar regressões.
+
+Cada carga de trabalho é medida em três fases separadas:
+
+* tokenize: só o Tokenizer, do primeiro token ao EOF;
+* parse:    Tokenizer + Parser até a AST;
+* evaluate: execução da AST já pronta no engine escolhido.
+
+O tempo é o melhor de `--repeat` execuções; o pico de memória de cada fase
+é medido numa execução à parte com tracemalloc (que deixaria o tempo mais
+lento). Com `--save` os resultados viram uma baseline; com `--baseline` a
+execução falha (código 1) se algum tempo ou pico de memória passar da
+baseline por mais de `--threshold` (fração, padrão 0.25).
+
+`--ast-memory` compara o tamanho da AST compacta (nós com __slots__ e
+folhas sem lista própria de filhos) com o mesmo programa em nós com
+__dict__ e uma lista de filhos por nó, como eram antes.
+
+Uso:
+    python3 benchmark.py --save baseline.json
+    python3 benchmark.py --baseline baseline.json --threshold 0.2
+    python3 benchmark.py --ast-memory commands nested
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import main
+import rbtgen
+from sensors import StaticSensors
+from sinks import MemorySink
+
+# nome -> argumentos de rbtgen.generate (o tamanho é multiplicado por --scale)
+WORKLOADS = {
+    "commands": dict(kind="commands", size=50000),
+    "nested": dict(kind="nested", size=4000, depth=40),
+    "loops": dict(kind="loops", size=200, iterations=500),
+    "sensors": dict(kind="sensors", size=200, iterations=500),
+    "mixed": dict(kind="mixed", size=1000, depth=5, iterations=50),
+}
+PHASES = ("tokenize", "parse", "evaluate")
+SENSORS = {"front": "wall", "left": "item"}
+DEFAULT_THRESHOLD = 0.25
+# tempos abaixo disso são ruído: não contam como regressão
+MIN_SECONDS = 0.005
+
+
+def tokenize(source):
+    tokenizer = main.Tokenizer(source)
+    count = 0
+    while tokenizer.next.type != main.EOF:
+        tokenizer.select_next()
+        count += 1
+    return count
+
+
+def parse(source):
+    return main.Parser(main.Tokenizer(source)).parse()
+
+
+def evaluate(program, engine):
+    table = main.SymbolTable(sink=MemorySink(), sensors=StaticSensors(SENSORS))
+    main.run_program(program, table, engine)
+    table.sink.close()
+    return table
+
+
+def measure(func, repeat):
+    """Melhor tempo de `repeat` chamadas e pico de memória (KiB) de uma chamada à parte."""
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak / 1024
+
+
+def run_workload(params, engine="tree", repeat=3, scale=1.0):
+    params = dict(params)
+    params["size"] = max(1, int(params["size"] * scale))
+    source = rbtgen.generate(**params)
+    tokens = tokenize(source)
+    metrics = {"bytes": len(source), "tokens": tokens}
+
+    seconds, peak = measure(lambda: tokenize(source), repeat)
+    metrics.update(tokenize_s=seconds, tokenize_peak_kib=peak, tokens_per_s=tokens / seconds)
+
+    seconds, peak = measure(lambda: parse(source), repeat)
+    metrics.update(parse_s=seconds, parse_peak_kib=peak, parse_bytes_per_s=len(source) / seconds)
+
+    # cada execução recebe uma AST nova: alguns engines anotam os nós
+    programs = [parse(source) for _ in range(repeat + 1)]
+    seconds, peak = measure(lambda: evaluate(programs.pop(), engine), repeat)
+    metrics.update(evaluate_s=seconds, evaluate_peak_kib=peak)
+    return metrics
+
+
+def run_suite(names=None, engine="tree", repeat=3, scale=1.0, log=None):
+    results = {}
+    for name in names or WORKLOADS:
+        results[name] = run_workload(WORKLOADS[name], engine, repeat, scale)
+        if log is not None:
+            log(format_metrics(name, results[name]))
+    return {
+        "version": main.VERSION,
+        "python": platform.python_version(),
+        "engine": engine,
+        "scale": scale,
+        "workloads": results,
+    }
+
+
+def format_metrics(name, m):
+    return (f"{name:<10} tokenize {m['tokenize_s'] * 1e3:8.1f} ms {m['tokenize_peak_kib']:9.0f} KiB | "
+            f"parse {m['parse_s'] * 1e3:8.1f} ms {m['parse_peak_kib']:9.0f} KiB | "
+            f"evaluate {m['evaluate_s'] * 1e3:8.1f} ms {m['evaluate_peak_kib']:9.0f} KiB")
+
+
+class _DictNode:
+    """Nó no formato antigo: atributos num __dict__ e lista própria de filhos."""
+
+
+def _node_attrs(node):
+    for cls in type(node).__mro__:
+        for name in getattr(cls, "__slots__", ()):
+            if hasattr(node, name):
+                yield name, getattr(node, name)
+
+
+def as_dict_nodes(program):
+    """Cópia de `program` com nós _DictNode, para comparar o tamanho."""
+    def copy(node):
+        clone = _DictNode()
+        for name, value in _node_attrs(node):
+            setattr(clone, name, value)
+        clone.children = []
+        return clone
+
+    root = copy(program)
+    # pilha explícita de (original, cópia): cada cópia recebe os filhos na ordem
+    stack = [(program, root)]
+    while stack:
+        node, clone = stack.pop()
+        for child in node.children:
+            child_clone = copy(child)
+            clone.children.append(child_clone)
+            stack.append((child, child_clone))
+    return root
+
+
+def ast_bytes(program):
+    """(número de nós, bytes dos nós e das listas de filhos); valores não entram."""
+    count = size = 0
+    stack = [program]
+    while stack:
+        node = stack.pop()
+        count += 1
+        size += sys.getsizeof(node)
+        if hasattr(node, "__dict__"):
+            size += sys.getsizeof(node.__dict__)
+        if node.children is not main.LEAF:
+            size += sys.getsizeof(node.children)
+        stack.extend(node.children)
+    return count, size
+
+
+def ast_memory(names=None, scale=1.0):
+    """Linhas do relatório de memória da AST, uma por carga."""
+    lines = [f"{'workload':<10} {'nodes':>9} {'compact':>12} {'dict':>12} {'B/node':>13}  ratio"]
+    for name in names or WORKLOADS:
+        params = dict(WORKLOADS[name])
+        params["size"] = max(1, int(params["size"] * scale))
+        program = parse(rbtgen.generate(**params))
+        count, compact = ast_bytes(program)
+        _, legacy = ast_bytes(as_dict_nodes(program))
+        lines.append(f"{name:<10} {count:9d} {compact:12d} {legacy:12d} "
+                     f"{compact / count:6.0f}/{legacy / count:<6.0f} {legacy / compact:5.2f}x")
+    return lines
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Lista de regressões de `results` em relação a `baseline` (vazia se nenhuma)."""
+    regressions = []
+    if results.get("engine") != baseline.get("engine") or results.get("scale") != baseline.get("scale"):
+        regressions.append("baseline was recorded with a different engine or scale")
+        return regressions
+    for name, metrics in results["workloads"].items():
+        old = baseline["workloads"].get(name)
+        if old is None:
+            continue
+        for phase in PHASES:
+            for key in (f"{phase}_s", f"{phase}_peak_kib"):
+                before, after = old.get(key), metrics[key]
+                if before is None:
+                    continue
+                if key.endswith("_s") and max(before, after) < MIN_SECONDS:
+                    continue
+                if after > before * (1 + threshold):
+                    regressions.append(f"{name}.{key}: {before:.4g} -> {after:.4g} "
+                                       f"({(after / before - 1) * 100:+.0f}%)")
+    return regressions
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description="Benchmarks de tokenize/parse/evaluate com baselines")
+    argparser.add_argument("workloads", nargs="*",
+                           help=f"cargas a rodar: {', '.join(WORKLOADS)} (padrão: todas)")
+    argparser.add_argument("--engine", choices=main.ENGINES, default="tree")
+    argparser.add_argument("--repeat", type=int, default=3, help="execuções por fase (vale a melhor)")
+    argparser.add_argument("--scale", type=float, default=1.0, help="multiplica o tamanho dos programas")
+    argparser.add_argument("--save", metavar="OUT", help="grava os resultados como baseline")
+    argparser.add_argument("--baseline", metavar="FILE", help="compara com uma baseline gravada")
+    argparser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                           help=f"piora relativa tolerada (padrão: {DEFAULT_THRESHOLD})")
+    argparser.add_argument("--ast-memory", action="store_true",
+                           help="só compara o tamanho da AST compacta com nós com __dict__")
+    args = argparser.parse_args()
+    for name in args.workloads:
+        if name not in WORKLOADS:
+            argparser.error(f"unknown workload: {name}")
+
+    if args.ast_memory:
+        print("\n".join(ast_memory(args.workloads, args.scale)))
+        sys.exit(0)
+
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline, "r") as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            sys.stderr.write(f"Erro: {e}\n")
+            sys.exit(1)
+
+    results = run_suite(args.workloads, args.engine, args.repeat, args.scale, log=print)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for msg in regressions:
+            sys.stderr.write(f"Regressão: {msg}\n")
+        if regressions:
+            sys.exit(1)
+        sys.stderr.write("sem regressões\n")
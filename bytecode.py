@@ -0,0 +1,399 @@
+"""
+Backend de bytecode: compila a AST para um vetor plano de instruções
+(opcode, argumento) com alvos de salto e executa num laço de despacho
+com um único contador de programa, sem recursão em Block.evaluate.
+
+As variáveis são resolvidas antes (ver resolver.py): LOAD/STORE/INIT/SET
+recebem o índice do slot no frame global, pré-alocado uma única vez.
+
+A VM pode ser pausada: run(fuel) devolve o controle quando o combustível
+(instruções) acaba e a próxima chamada continua do mesmo ponto. O consumo só
+é cobrado nos saltos para trás, uma vez por iteração de laço, com o tamanho
+estático do laço; código sem laço sempre termina, então isso basta para
+limitar qualquer programa (ver scheduler.py).
+
+O programa compilado pode ser salvo e carregado num formato binário
+compacto (ver Program.dump / Program.load) e inspecionado com disassemble.
+"""
+import marshal
+import struct
+import sys
+from array import array
+
+from main import trampoline
+from resolver import UNDEF, Frame, Resolver
+
+MAGIC = b"RBC\x00"
+FORMAT_VERSION = 2
+
+# opcodes -----------------------------------------------------------------
+OPNAMES = [
+    "HALT", "CONST", "LOAD", "CHECK", "STORE", "INIT", "SET",
+    "ADD", "SUB", "MUL", "DIV",
+    "EQ", "NE", "LT", "GT", "LE", "GE", "AND", "OR",
+    "POS", "NEG", "NOT",
+    "SENSOR", "CMD", "POP",
+    "JUMP", "JUMP_UNLESS_IF", "JUMP_UNLESS_WHILE",
+    "FOR_PREP", "FOR_ITER",
+]
+for _code, _name in enumerate(OPNAMES):
+    globals()[_name] = _code
+
+BINARY_OPS = {
+    "+": ADD, "-": SUB, "*": MUL, "/": DIV,
+    "==": EQ, "!=": NE, "<": LT, ">": GT, "<=": LE, ">=": GE,
+    "&&": AND, "||": OR,
+}
+UNARY_OPS = {"+": POS, "-": NEG, "!": NOT}
+OP_SYMBOLS = {code: sym for sym, code in BINARY_OPS.items()}
+UNARY_SYMBOLS = {code: sym for sym, code in UNARY_OPS.items()}
+
+# argumento de cada opcode: índice em consts, slot (nome em names), ou alvo de salto
+CONST_ARG = (CONST, SENSOR, CMD)
+NAME_ARG = (LOAD, CHECK, STORE, INIT, SET)
+JUMP_ARG = (JUMP, JUMP_UNLESS_IF, JUMP_UNLESS_WHILE, FOR_ITER)
+
+TYPE_NAMES = {int: "int", bool: "bool", str: "string"}
+# combustível de quem não quer pausar
+UNLIMITED = sys.maxsize
+DEFAULTS = {"int": 0, "bool": False, "string": ""}
+
+
+class Program:
+    """Instruções planas + tabela de constantes + nome de cada slot."""
+    def __init__(self, code, consts, names):
+        self.code = code
+        self.consts = consts
+        self.names = names
+
+    def dump(self):
+        payload = marshal.dumps((tuple(self.consts), tuple(self.names),
+                                 array("i", self.code).tobytes()))
+        return MAGIC + struct.pack("<H", FORMAT_VERSION) + payload
+
+    @classmethod
+    def load(cls, data):
+        if data[:4] != MAGIC:
+            raise Exception("Not a compiled robot program")
+        version, = struct.unpack_from("<H", data, 4)
+        if version != FORMAT_VERSION:
+            raise Exception(f"Unsupported bytecode version {version}")
+        consts, names, raw = marshal.loads(data[6:])
+        code = array("i")
+        code.frombytes(raw)
+        return cls(list(code), list(consts), list(names))
+
+
+class Compiler:
+    def __init__(self):
+        self.code = []
+        self.consts = []
+        self.names = []
+        self._const_index = {}
+
+    def compile(self, program):
+        self.names = Resolver().resolve(program)
+        trampoline(self.visit(program))
+        self.emit(HALT)
+        return Program(self.code, self.consts, self.names)
+
+    # tabelas ----------------------------------------------------------
+    def const(self, value):
+        key = (type(value), value)
+        if key not in self._const_index:
+            self._const_index[key] = len(self.consts)
+            self.consts.append(value)
+        return self._const_index[key]
+
+    def emit(self, op, arg=0):
+        self.code.append(op)
+        self.code.append(arg)
+        return len(self.code) - 2
+
+    def patch(self, at, target):
+        self.code[at + 1] = target
+
+    # nós --------------------------------------------------------------
+    # os visit_* de nós com filhos são geradores: `yield self.visit(filho)`
+    # compila o filho pela pilha explícita de main.trampoline, sem recursão
+    def visit(self, node):
+        method = getattr(self, "visit_" + type(node).__name__, None)
+        if method is None:
+            raise Exception(f"{type(node).__name__} is not supported by the vm engine")
+        return method(node)
+
+    def visit_Block(self, node):
+        for stmt in node.children:
+            yield self.visit(stmt)
+
+    def visit_VarInit(self, node):
+        if node.children:
+            yield self.visit(node.children[0])
+        else:
+            self.emit(CONST, self.const(DEFAULTS[node.var_type]))
+        self.emit(INIT, node.addr[1])
+
+    def visit_VarDec(self, node):
+        pass
+
+    def visit_Assignment(self, node):
+        # como Assignment.evaluate: a variável precisa existir antes da expressão
+        self.emit(CHECK, node.addr[1])
+        yield self.visit(node.children[0])
+        self.emit(STORE, node.addr[1])
+
+    def visit_CommandStmt(self, node):
+        self.emit(CMD, self.const(node.value))
+
+    def visit_If(self, node):
+        yield self.visit(node.children[0])
+        jump_else = self.emit(JUMP_UNLESS_IF)
+        yield self.visit(node.children[1])
+        if len(node.children) == 3:
+            jump_end = self.emit(JUMP)
+            self.patch(jump_else, len(self.code))
+            yield self.visit(node.children[2])
+            self.patch(jump_end, len(self.code))
+        else:
+            self.patch(jump_else, len(self.code))
+
+    def visit_WhileStmt(self, node):
+        top = len(self.code)
+        yield self.visit(node.children[0])
+        jump_end = self.emit(JUMP_UNLESS_WHILE)
+        yield self.visit(node.children[1])
+        self.emit(JUMP, top)
+        self.patch(jump_end, len(self.code))
+
+    visit_While = visit_WhileStmt
+
+    def visit_ForStmt(self, node):
+        # pilha durante o laço: [fim, próximo]
+        yield self.visit(node.children[0])
+        yield self.visit(node.children[1])
+        self.emit(FOR_PREP)
+        top = self.emit(FOR_ITER)
+        self.emit(SET, node.addr[1])
+        yield self.visit(node.children[2])
+        self.emit(JUMP, top)
+        self.patch(top, len(self.code))
+
+    def visit_IntVal(self, node):
+        self.emit(CONST, self.const(node.value))
+
+    visit_StrVal = visit_IntVal
+
+    def visit_BoolVal(self, node):
+        self.emit(CONST, self.const(bool(node.value)))
+
+    def visit_Variable(self, node):
+        self.emit(LOAD, node.addr[1])
+
+    def visit_SensorAccess(self, node):
+        self.emit(SENSOR, self.const(node.value))
+
+    def visit_BinOp(self, node):
+        yield self.visit(node.children[0])
+        yield self.visit(node.children[1])
+        self.emit(BINARY_OPS[node.value])
+
+    def visit_UnOp(self, node):
+        yield self.visit(node.children[0])
+        self.emit(UNARY_OPS[node.value])
+
+
+def compile_program(program):
+    return Compiler().compile(program)
+
+
+def _type_name(value):
+    return TYPE_NAMES[type(value)]
+
+
+def _to_str(value):
+    if type(value) is bool:
+        return "true" if value else "false"
+    return str(value)
+
+
+class VM:
+    """
+    Executa um Program. Os valores na pilha e nas variáveis são valores
+    Python crus; o tipo da linguagem sai de type(valor) (int, bool, str).
+    """
+    def __init__(self, program, symbol_table):
+        self.program = program
+        self.symbol_table = symbol_table
+        self.frame = Frame(len(program.names))
+        self.stack = []
+        self.pc = 0
+        # instruções cobradas até agora (só nos saltos para trás)
+        self.used = 0
+        self.halted = False
+
+    def run(self, fuel=None):
+        """
+        Executa até o HALT (devolve True) ou até gastar `fuel` instruções
+        (devolve False; a próxima chamada continua de onde parou).
+        """
+        fuel = UNLIMITED if fuel is None else fuel
+        budget = fuel
+        code = self.program.code
+        consts = self.program.consts
+        names = self.program.names
+        slots = self.frame.slots
+        stack = self.stack
+        push = stack.append
+        pop = stack.pop
+        command = self.symbol_table.command
+        read_sensor = self.symbol_table.read_sensor
+        pc = self.pc
+
+        while True:
+            op = code[pc]
+            arg = code[pc + 1]
+            pc += 2
+
+            if op == LOAD:
+                value = slots[arg]
+                if value is UNDEF:
+                    raise Exception(f"Undefined variable: {names[arg]}")
+                push(value)
+            elif op == CONST:
+                push(consts[arg])
+            elif op == JUMP_UNLESS_WHILE or op == JUMP_UNLESS_IF:
+                cond = pop()
+                if type(cond) is not bool:
+                    where = "while" if op == JUMP_UNLESS_WHILE else "if"
+                    raise Exception(f"Condition in {where} must be boolean")
+                if not cond:
+                    pc = arg
+            elif op == JUMP:
+                if arg < pc:
+                    # fim de uma iteração: cobra o laço inteiro de uma vez
+                    fuel -= (pc - arg) >> 1
+                    if fuel <= 0:
+                        self.pc = arg
+                        self.used += budget - fuel
+                        return False
+                pc = arg
+            elif op == CHECK:
+                if slots[arg] is UNDEF:
+                    raise Exception(f"Undefined variable: {names[arg]}")
+            elif op == STORE:
+                value = pop()
+                old = slots[arg]
+                if type(value) is not type(old):
+                    raise Exception(f"Incompatible types: expected {_type_name(old)}, got {_type_name(value)}")
+                slots[arg] = value
+            elif op == ADD:
+                right = pop()
+                left = stack[-1]
+                if type(left) is type(right):
+                    stack[-1] = left + right
+                elif type(left) is str or type(right) is str:
+                    stack[-1] = _to_str(left) + _to_str(right)
+                else:
+                    raise Exception("Type mismatch in operation: +")
+            elif op <= DIV and op >= SUB:
+                right = pop()
+                left = stack[-1]
+                if type(left) is not int or type(right) is not int:
+                    raise Exception(f"Type mismatch in operation: {OP_SYMBOLS[op]}")
+                if op == SUB:
+                    stack[-1] = left - right
+                elif op == MUL:
+                    stack[-1] = left * right
+                else:
+                    stack[-1] = left // right if right != 0 else 0
+            elif op <= GE and op >= EQ:
+                right = pop()
+                left = stack[-1]
+                if type(left) is not type(right):
+                    raise Exception(f"Type mismatch in operation: {OP_SYMBOLS[op]}")
+                if op == EQ:
+                    stack[-1] = left == right
+                elif op == NE:
+                    stack[-1] = left != right
+                elif op == LT:
+                    stack[-1] = left < right
+                elif op == GT:
+                    stack[-1] = left > right
+                elif op == LE:
+                    stack[-1] = left <= right
+                else:
+                    stack[-1] = left >= right
+            elif op == AND or op == OR:
+                right = pop()
+                left = stack[-1]
+                if type(left) is not bool or type(right) is not bool:
+                    raise Exception(f"Type mismatch in operation: {OP_SYMBOLS[op]}")
+                stack[-1] = (left and right) if op == AND else (left or right)
+            elif op == FOR_ITER:
+                current = stack[-1]
+                if current > stack[-2]:
+                    del stack[-2:]
+                    pc = arg
+                else:
+                    stack[-1] = current + 1
+                    push(current)
+            elif op == SET:
+                slots[arg] = pop()
+            elif op == CMD:
+                command(consts[arg])
+            elif op == SENSOR:
+                push(read_sensor(consts[arg]))
+            elif op == INIT:
+                slots[arg] = pop()
+            elif op == FOR_PREP:
+                end = stack[-1]
+                start = stack[-2]
+                if type(start) is not int or type(end) is not int:
+                    raise Exception("For bounds must be integers")
+                stack[-2] = end
+                stack[-1] = start
+            elif op == NOT or op == NEG or op == POS:
+                value = stack[-1]
+                expected = bool if op == NOT else int
+                if type(value) is not expected:
+                    raise Exception(f"Invalid unary operation {UNARY_SYMBOLS[op]} on type {_type_name(value)}")
+                if op == NOT:
+                    stack[-1] = not value
+                elif op == NEG:
+                    stack[-1] = -value
+            elif op == POP:
+                pop()
+            elif op == HALT:
+                self.pc = pc - 2
+                self.used += budget - fuel
+                self.halted = True
+                return True
+            else:
+                raise Exception(f"Invalid opcode {op} at {pc - 2}")
+
+
+def disassemble(program):
+    lines = []
+    targets = {program.code[i + 1] for i in range(0, len(program.code), 2)
+               if program.code[i] in JUMP_ARG}
+    for pc in range(0, len(program.code), 2):
+        op, arg = program.code[pc], program.code[pc + 1]
+        name = OPNAMES[op] if 0 <= op < len(OPNAMES) else f"<{op}>"
+        mark = ">>" if pc in targets else "  "
+        if op in CONST_ARG:
+            detail = f"{arg:<6}({program.consts[arg]!r})"
+        elif op in NAME_ARG:
+            detail = f"{arg:<6}({program.names[arg]})"
+        elif op in JUMP_ARG:
+            detail = f"{arg:<6}(to {arg})"
+        else:
+            detail = ""
+        lines.append(f"{mark} {pc:>6} {name:<18} {detail}".rstrip())
+    return "\n".join(lines)
+
+
+def run(program, symbol_table):
+    """Compila `program` (se ainda for uma AST) e executa na VM."""
+    if not isinstance(program, Program):
+        program = compile_program(program)
+    VM(program, symbol_table).run()
@@ -0,0 +1,194 @@
+"""
+Cache em disco de programas já analisados.
+
+A chave é o hash do código-fonte junto com a versão do interpretador, então
+qualquer mudança em um dos dois gera uma entrada nova. A AST é guardada num
+formato plano e compacto (tipos de nó, valores, posições no fonte e número de
+filhos em pós-ordem, serializados com marshal), o que permite pular Tokenizer e
+Parser por completo.
+
+Escritas vão para um arquivo temporário e entram no lugar com os.replace,
+então vários processos podem gravar ao mesmo tempo; entradas ilegíveis são
+tratadas como ausentes. Quando o diretório passa de `max_bytes`, as entradas
+usadas há mais tempo são removidas.
+"""
+import hashlib
+import marshal
+import os
+import tempfile
+import zlib
+
+import main
+
+CACHE_FORMAT = 2
+SUFFIX = ".rbtc"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+NODE_KINDS = (
+    "Block", "VarInit", "Assignment", "If", "WhileStmt", "ForStmt", "CommandStmt",
+    "IntVal", "StrVal", "BoolVal", "Variable", "BinOp", "UnOp", "SensorAccess",
+    "Print", "Read", "VarDec", "FuncDec", "FuncCall", "Return", "For", "While",
+)
+KIND_INDEX = {name: i for i, name in enumerate(NODE_KINDS)}
+# atributo extra guardado junto com o nó
+EXTRA_ATTR = {"VarInit": "var_type", "VarDec": "var_type", "FuncDec": "ret_type"}
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.environ.get("RBT_CACHE_DIR") or os.path.join(base, "robolang")
+
+
+def write_atomic(path, data):
+    """
+    Grava `data` (bytes) em `path` por um arquivo temporário no mesmo
+    diretório e os.replace: quem lê vê o arquivo antigo ou o novo inteiro,
+    nunca um pela metade. Também usado pelo índice do check e pelos
+    checkpoints da VM.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def encode(program):
+    """AST -> bytes, sem recursão (a profundidade não é limitada)."""
+    kinds = bytearray()
+    values = []
+    extras = []
+    positions = []
+    counts = []
+    stack = [(program, False)]
+    while stack:
+        node, visited = stack.pop()
+        if visited:
+            name = type(node).__name__
+            kinds.append(KIND_INDEX[name])
+            values.append(node.value)
+            extras.append(getattr(node, EXTRA_ATTR[name]) if name in EXTRA_ATTR else None)
+            positions.append(node.pos)
+            counts.append(len(node.children))
+            continue
+        stack.append((node, True))
+        for child in reversed(node.children):
+            stack.append((child, False))
+    payload = (CACHE_FORMAT, bytes(kinds), tuple(values), tuple(extras),
+               tuple(positions), tuple(counts))
+    return zlib.compress(marshal.dumps(payload), 1)
+
+
+def decode(data):
+    payload = marshal.loads(zlib.decompress(data))
+    if payload[0] != CACHE_FORMAT:
+        raise ValueError(f"unsupported cache format {payload[0]}")
+    _, kinds, values, extras, positions, counts = payload
+    classes = [getattr(main, name) for name in NODE_KINDS]
+    stack = []
+    for kind, value, extra, pos, count in zip(kinds, values, extras, positions, counts):
+        cls = classes[kind]
+        node = cls.__new__(cls)
+        node.value = value
+        node.pos = pos
+        if count:
+            node.children = stack[-count:]
+            del stack[-count:]
+        else:
+            node.children = main.LEAF
+        name = NODE_KINDS[kind]
+        if name in EXTRA_ATTR:
+            setattr(node, EXTRA_ATTR[name], extra)
+        stack.append(node)
+    if len(stack) != 1:
+        raise ValueError("corrupted cache entry")
+    # chamadas de função não são guardadas ligadas: refaz as ligações
+    main.link_functions(stack[0], {})
+    return stack[0]
+
+
+class ProgramCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, source):
+        digest = hashlib.sha256()
+        digest.update(f"{main.VERSION}\0{CACHE_FORMAT}\0".encode())
+        digest.update(source.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def path(self, source):
+        return os.path.join(self.directory, self.key(source) + SUFFIX)
+
+    def load(self, source):
+        """Devolve a AST guardada para `source`, ou None."""
+        path = self.path(source)
+        try:
+            with open(path, "rb") as f:
+                program = decode(f.read())
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            # entrada corrompida: descarta e trata como ausente
+            self._remove(path)
+            self.misses += 1
+            return None
+        try:
+            # marca como usada recentemente para a remoção por LRU
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return program
+
+    def store(self, source, program):
+        os.makedirs(self.directory, exist_ok=True)
+        write_atomic(self.path(source), encode(program))
+        self.evict()
+
+    def entries(self):
+        result = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return result
+        for name in names:
+            if not name.endswith(SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            result.append((st.st_mtime, st.st_size, path))
+        return result
+
+    def evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,254 @@
+"""
+Validação estática de muitos programas .rbt em paralelo, sem executar nada.
+
+Cada arquivo passa pelo Tokenizer, pelo Parser e pela checagem de tipos
+(typecheck.TypeChecker, que também confere chamadas de função e número de
+argumentos). Os erros saem como `arquivo:linha:coluna: mensagem`, ordenados
+por arquivo e posição. Um erro de sintaxe para a análise daquele arquivo
+(o Parser não se recupera); os erros de tipo aparecem todos. Uma falha do
+próprio checador não é um erro do programa: vai para o stderr e não é
+guardada no índice.
+
+Os arquivos são distribuídos num pool de processos, em pedaços de tamanho
+parecido (os maiores primeiro, para nenhum processo ficar com a cauda). O
+resultado de cada arquivo fica num índice em disco, chaveado pelo hash do
+conteúdo e pela versão do interpretador e do checador: na próxima rodada,
+só os arquivos alterados são analisados de novo.
+
+Uso:
+    python3 main.py check missoes/ -j 8
+    python3 check.py missoes/ outra.rbt --no-cache
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import main
+
+# mude ao alterar o que é checado ou o formato dos resultados
+# (2: falhas internas do checador deixaram de ser gravadas como erros)
+CHECK_VERSION = 2
+INDEX_NAME = "check-index.json"
+# entradas guardadas no índice (as gravadas primeiro saem primeiro)
+MAX_ENTRIES = 200000
+
+
+def find_files(paths):
+    """Arquivos .rbt de `paths` (arquivos ou diretórios, recursivamente)."""
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            files.extend(os.path.join(root, name) for name in sorted(names) if name.endswith(".rbt"))
+    return files
+
+
+class InternalError(Exception):
+    """Falha do próprio checador num arquivo: não é um erro do programa."""
+
+
+def locate(source, errors):
+    """[(pos, mensagem)] -> [(linha, coluna, mensagem)] ordenada, a partir de 1."""
+    if not errors:
+        return []
+    lines = [0]
+    lines.extend(match.end() for match in re.finditer("\n", source))
+    located = []
+    for pos, msg in errors:
+        if pos is None:
+            located.append((1, 1, msg))
+            continue
+        line = bisect.bisect_right(lines, pos)
+        located.append((line, pos - lines[line - 1] + 1, msg))
+    return sorted(located)
+
+
+def check_source(source):
+    """Lista de (linha, coluna, mensagem) com os erros de `source`."""
+    tokenizer = None
+    try:
+        tokenizer = main.Tokenizer(source)
+        parser = main.Parser(tokenizer)
+        # parse_program e não parse: a checagem abaixo já confere as funções
+        program = parser.parse_program()
+        if tokenizer.next.type != main.EOF:
+            raise Exception(f"Unexpected token {main.TOKEN_NAMES[tokenizer.next.type]}, expected EOF")
+    except Exception as e:
+        if type(e) is not Exception:
+            # os erros do programa são sempre Exception; o resto é falha interna
+            raise
+        # caractere inválido traz a própria posição; os outros erros param no token atual
+        pos = getattr(e, "pos", None)
+        if pos is None and tokenizer is not None:
+            pos = tokenizer.next.pos
+        return locate(source, [(pos, str(e))])
+    import typecheck
+    # o checador junta os erros do programa; uma exceção aqui é falha interna
+    checker = typecheck.TypeChecker()
+    checker.check(program)
+    return locate(source, checker.located)
+
+
+def _check_chunk(items):
+    results = []
+    for source in items:
+        try:
+            results.append(check_source(source))
+        except Exception as e:
+            # vai para o stderr e não para o índice: o arquivo é checado de novo na próxima rodada
+            results.append(InternalError(f"{type(e).__name__}: {e}"))
+    return results
+
+
+class CheckCache:
+    """Índice JSON hash do conteúdo -> erros, gravado de forma atômica."""
+    def __init__(self, directory=None):
+        import cache
+        self.directory = directory or cache.default_cache_dir()
+        self.path = os.path.join(self.directory, INDEX_NAME)
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(self.path, "r") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    @staticmethod
+    def key(source):
+        digest = hashlib.sha256()
+        digest.update(f"{main.VERSION}\0{CHECK_VERSION}\0".encode())
+        digest.update(source.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        errors = self.entries.get(key)
+        if errors is None:
+            return None
+        return [tuple(error) for error in errors]
+
+    def put(self, key, errors):
+        self.entries[key] = errors
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        while len(self.entries) > MAX_ENTRIES:
+            del self.entries[next(iter(self.entries))]
+        import cache
+        os.makedirs(self.directory, exist_ok=True)
+        cache.write_atomic(self.path, json.dumps(self.entries, separators=(",", ":")).encode())
+        self.dirty = False
+
+
+def check_files(files, workers=None, check_cache=None):
+    """
+    Checa `files` e devolve ({arquivo: [(linha, coluna, mensagem)]}, quantos
+    vieram do cache). Arquivos com o mesmo conteúdo são checados uma vez só;
+    arquivos ilegíveis viram um erro na posição 1:1. Se o checador falhar
+    num arquivo, o valor dele é a InternalError, que não vai para o cache.
+    """
+    results = {}
+    # conteúdo ainda não checado: hash -> (código, arquivos com esse código)
+    pending = {}
+    cached = 0
+    for path in files:
+        try:
+            with open(path, "r") as f:
+                source = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            results[path] = [(1, 1, str(e))]
+            continue
+        key = CheckCache.key(source)
+        errors = check_cache.get(key) if check_cache is not None else None
+        if errors is not None:
+            results[path] = errors
+            cached += 1
+        elif key in pending:
+            pending[key][1].append(path)
+        else:
+            pending[key] = (source, [path])
+
+    workers = workers or os.cpu_count() or 1
+    # maiores primeiro, em pedaços com quantidade de código parecida
+    items = sorted(pending.items(), key=lambda item: -len(item[1][0]))
+    total = sum(len(source) for _, (source, _) in items)
+    target = max(1, total // (workers * 4))
+    chunks, chunk, size = [], [], 0
+    for item in items:
+        chunk.append(item)
+        size += len(item[1][0])
+        if size >= target:
+            chunks.append(chunk)
+            chunk, size = [], 0
+    if chunk:
+        chunks.append(chunk)
+
+    sources = [[source for _, (source, _) in chunk] for chunk in chunks]
+    if workers == 1 or len(chunks) <= 1:
+        outputs = map(_check_chunk, sources)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        outputs = pool.map(_check_chunk, sources)
+    try:
+        for chunk, chunk_errors in zip(chunks, outputs):
+            for (key, (_, paths)), errors in zip(chunk, chunk_errors):
+                for path in paths:
+                    results[path] = errors
+                if check_cache is not None and not isinstance(errors, InternalError):
+                    check_cache.put(key, errors)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return results, cached
+
+
+def cli(argv=None):
+    argparser = argparse.ArgumentParser(prog="check", description="Valida programas .rbt sem executá-los")
+    argparser.add_argument("paths", nargs="+", help="arquivos .rbt ou diretórios")
+    argparser.add_argument("-j", "--workers", type=int, default=None,
+                           help="número de processos (padrão: número de CPUs)")
+    argparser.add_argument("--no-cache", action="store_true", help="analisa todos os arquivos de novo")
+    argparser.add_argument("--cache-dir", help="diretório do cache (padrão: ~/.cache/robolang)")
+    args = argparser.parse_args(argv)
+
+    files = find_files(args.paths)
+    check_cache = None if args.no_cache else CheckCache(args.cache_dir)
+    start = time.perf_counter()
+    results, cached = check_files(files, args.workers, check_cache)
+    if check_cache is not None:
+        try:
+            check_cache.save()
+        except OSError as e:
+            sys.stderr.write(f"Aviso: cache indisponível: {e}\n")
+    elapsed = time.perf_counter() - start
+
+    count = 0
+    internal = 0
+    for path in files:
+        if isinstance(results[path], InternalError):
+            sys.stderr.write(f"Erro: {path}: internal checker error: {results[path]}\n")
+            internal += 1
+            continue
+        for line, column, msg in results[path]:
+            print(f"{path}:{line}:{column}: {msg}")
+            count += 1
+    failed = sum(1 for path in files if results[path]) - internal
+    sys.stderr.write(f"{len(files)} files, {failed} with errors, {count} errors, "
+                     f"{internal} internal failures, {cached} cached, {elapsed:.2f}s\n")
+    return 1 if failed or internal else 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
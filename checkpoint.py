@@ -0,0 +1,209 @@
+"""
+Checkpoint e retomada de uma execução na VM de bytecode (ver bytecode.py).
+
+Toda a execução da VM cabe em poucos campos: o contador de programa, a pilha
+(que entre statements só guarda o par [fim, próximo] de cada `for` aberto),
+os slots do frame global e o combustível gasto. Um snapshot guarda isso
+junto com o programa compilado e o seu hash (a identidade do programa), os
+comandos ainda pendentes no sink (inclusive o que o peephole acumulou) e a
+última leitura de sensores, num blob binário versionado:
+
+    MAGIC "RBS\\0" | versão u16 | zlib(marshal(campos))
+
+A VM só pausa no fim de uma iteração de laço, que é sempre uma fronteira
+de statement; é aí que os snapshots são tirados. Outro processo carrega o
+blob com restore() e continua do mesmo ponto, sem reexecutar nada.
+
+Checkpointer roda a VM em fatias e grava o snapshot:
+
+* a cada `every` instruções (o sink é esvaziado antes, e a execução segue);
+* depois de `stop_after` instruções, ou quando stop() é chamado (SIGTERM /
+  SIGINT na linha de comando): os comandos pendentes vão para o snapshot,
+  e não para o robô, e a execução para.
+
+Uso:
+    python3 main.py missao.rbt --checkpoint missao.rbs --checkpoint-every 100000
+    python3 main.py missao.rbs                  # continua de onde parou
+    python3 checkpoint.py missao.rbs            # mostra o conteúdo
+"""
+import hashlib
+import marshal
+import os
+import signal
+import struct
+import zlib
+
+import bytecode
+import cache
+from resolver import UNDEF
+
+MAGIC = b"RBS\x00"
+FORMAT_VERSION = 1
+SUFFIX = ".rbs"
+# instruções por fatia entre duas verificações de parada
+DEFAULT_QUANTUM = 10000
+
+
+def program_digest(program_bytes):
+    return hashlib.sha256(program_bytes).hexdigest()
+
+
+def snapshot(vm, pending=()):
+    """
+    Estado completo de `vm` (pausada ou ainda não iniciada) -> bytes.
+    `pending` são os comandos que o processo novo ainda precisa enviar.
+    """
+    if vm.halted:
+        raise Exception("Program already finished: nothing to checkpoint")
+    program_bytes = vm.program.dump()
+    fields = (
+        program_digest(program_bytes),
+        program_bytes,
+        vm.pc,
+        vm.used,
+        tuple(vm.stack),
+        # None não é valor da linguagem: marca slot ainda não declarado
+        tuple(None if value is UNDEF else value for value in vm.frame.slots),
+        tuple(pending),
+        vm.symbol_table.sensors.snapshot,
+    )
+    return MAGIC + struct.pack("<H", FORMAT_VERSION) + zlib.compress(marshal.dumps(fields), 1)
+
+
+def load(data):
+    """bytes -> dicionário com os campos do snapshot."""
+    if data[:4] != MAGIC:
+        raise Exception("Not a robot checkpoint")
+    version, = struct.unpack_from("<H", data, 4)
+    if version != FORMAT_VERSION:
+        raise Exception(f"Unsupported checkpoint version {version}")
+    (digest, program_bytes, pc, used, stack, slots, pending,
+     sensors) = marshal.loads(zlib.decompress(data[6:]))
+    if program_digest(program_bytes) != digest:
+        raise Exception("Corrupted checkpoint: program hash mismatch")
+    return {
+        "digest": digest, "program": program_bytes, "pc": pc, "used": used,
+        "stack": stack, "slots": slots, "pending": pending,
+        "sensors": sensors,
+    }
+
+
+def restore(data, symbol_table, expected_program=None):
+    """
+    Recria a VM de um snapshot sobre `symbol_table` (sink e sensores do
+    processo novo). Com `expected_program` (bytecode.Program), recusa um
+    snapshot de outro programa.
+    """
+    state = load(data)
+    if expected_program is not None and program_digest(expected_program.dump()) != state["digest"]:
+        raise Exception("Checkpoint belongs to a different program")
+    vm = bytecode.VM(bytecode.Program.load(state["program"]), symbol_table)
+    if len(state["slots"]) != len(vm.frame.slots):
+        raise Exception("Corrupted checkpoint: frame size mismatch")
+    vm.pc = state["pc"]
+    vm.used = state["used"]
+    vm.stack.extend(state["stack"])
+    vm.frame.slots[:] = [UNDEF if value is None else value for value in state["slots"]]
+    # os pendentes passam pelo sink novo, que pode ter outras opções
+    # (repeat frames, peephole) que o sink do processo parado
+    sink = symbol_table.sink
+    for item in state["pending"]:
+        if isinstance(item, str):
+            sink.send(item)
+        else:
+            sink.repeat(*item)
+    symbol_table.sensors.snapshot = state["sensors"]
+    return vm
+
+
+class Checkpointer:
+    """Roda `vm` em fatias e grava snapshots em `path` (ver docstring do módulo)."""
+    def __init__(self, vm, path, every=None, stop_after=None, quantum=DEFAULT_QUANTUM):
+        if quantum <= 0:
+            raise ValueError("quantum must be positive")
+        self.vm = vm
+        self.path = path
+        self.every = every
+        # `stop_after` conta a partir daqui, não do início do programa
+        self.stop_at = None if stop_after is None else vm.used + stop_after
+        self.quantum = quantum
+        self.next_checkpoint = vm.used + every if every else None
+        self.stopping = False
+        self.checkpoints = 0
+
+    def stop(self, *_):
+        """Pede a parada com snapshot no próximo fim de iteração (serve de handler de sinal)."""
+        self.stopping = True
+
+    def write(self, pending=()):
+        # nunca um snapshot pela metade, nem se o processo morrer no meio
+        cache.write_atomic(self.path, snapshot(self.vm, pending))
+        self.checkpoints += 1
+
+    def run(self):
+        """True se o programa terminou; False se parou com um snapshot em `path`."""
+        vm = self.vm
+        sink = vm.symbol_table.sink
+        while True:
+            fuel = self.quantum
+            if self.stop_at is not None:
+                fuel = min(fuel, self.stop_at - vm.used)
+            if self.next_checkpoint is not None:
+                fuel = min(fuel, self.next_checkpoint - vm.used)
+            if not self.stopping and fuel > 0 and vm.run(fuel):
+                return True
+            if self.stopping or (self.stop_at is not None and vm.used >= self.stop_at):
+                # o que já foi despachado chega ao robô; o pendente fica no snapshot
+                self.write(sink.drain())
+                return False
+            if self.next_checkpoint is not None and vm.used >= self.next_checkpoint:
+                sink.flush()
+                self.write()
+                self.next_checkpoint = vm.used + self.every
+
+
+def run(vm, path, every=None, stop_after=None):
+    """
+    Roda `vm` com checkpoints em `path`; SIGTERM e SIGINT viram uma parada
+    com snapshot. Devolve True se o programa terminou (e aí apaga `path`).
+    """
+    checkpointer = Checkpointer(vm, path, every, stop_after)
+    previous = {}
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        try:
+            previous[signum] = signal.signal(signum, checkpointer.stop)
+        except ValueError:
+            # fora da thread principal não dá para instalar handlers
+            pass
+    try:
+        finished = checkpointer.run()
+        if finished and os.path.exists(path):
+            # retomar um snapshot de um programa que já terminou repetiria comandos
+            os.remove(path)
+        return finished
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    argparser = argparse.ArgumentParser(description="Mostra o conteúdo de um checkpoint (.rbs)")
+    argparser.add_argument("file")
+    args = argparser.parse_args()
+    try:
+        with open(args.file, "rb") as f:
+            state = load(f.read())
+        names = bytecode.Program.load(state["program"]).names
+    except Exception as e:
+        sys.stderr.write(f"Erro: {e}\n")
+        sys.exit(1)
+    print(f"program:      sha256 {state['digest']}")
+    print(f"pc:           {state['pc']}")
+    print(f"instructions: {state['used']}")
+    print(f"open loops:   {len(state['stack']) // 2}")
+    print(f"pending:      {len(state['pending'])} commands")
+    for name, value in zip(names, state["slots"]):
+        print(f"  {name} = {'<undeclared>' if value is None else repr(value)}")
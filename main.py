@@ -1,174 +1,238 @@
+import operator
+import re
 import sys
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from types import GeneratorType
+
+from sensors import SensorCache, StaticSensors
+from sinks import TextSink
+
+# entra na chave do cache de programas: mude ao alterar a AST ou o parser
+VERSION = "1.4"
+
+# tipos de token (inteiros: comparação barata no parser)
+(EOF, NUMBER, STRING, BOOL, IDENTIFIER, VAR, TYPE, IF, ELSE, FOR, WHILE, TO,
+ COMMAND, SENSOR, SENSOR_POS, SCAN, COLON, SEMICOLON, COMMA, DOT, LPAREN, RPAREN,
+ LBRACE, RBRACE, OPERATOR, ASSIGN, FUNC, RETURN) = range(28)
+
+TOKEN_NAMES = (
+    "EOF", "NUMBER", "STRING", "BOOL", "IDENTIFIER", "VAR", "TYPE", "IF", "ELSE",
+    "FOR", "WHILE", "TO", "COMMAND", "SENSOR", "SENSOR_POS", "SCAN", "COLON",
+    "SEMICOLON", "COMMA", "DOT", "LPAREN", "RPAREN", "LBRACE", "RBRACE",
+    "OPERATOR", "ASSIGN", "FUNC", "RETURN",
+)
+
+KEYWORDS = {
+    "true": BOOL, "false": BOOL,
+    "var": VAR,
+    "int": TYPE, "bool": TYPE, "string": TYPE,
+    "if": IF, "else": ELSE, "for": FOR, "while": WHILE, "to": TO,
+    "func": FUNC, "return": RETURN,
+    # comandos de movimento
+    "moveForward": COMMAND, "turnLeft": COMMAND, "turnRight": COMMAND,
+    "pick": COMMAND, "drop": COMMAND,
+    # acesso a sensor
+    "sensor": SENSOR,
+    "front": SENSOR_POS, "left": SENSOR_POS, "right": SENSOR_POS, "back": SENSOR_POS,
+}
+
+# precedência dos operadores binários (maior = liga mais forte)
+BINARY_PRECEDENCE = {
+    "||": 1, "&&": 2,
+    "==": 4, "!=": 4, ">": 4, "<": 4, ">=": 4, "<=": 4,
+    "+": 5, "-": 5, "*": 6, "/": 6, "%": 6,
+}
+RELATIONAL_PRECEDENCE = 4
+# "!" no início de um fator booleano: !a == b é !(a == b), mas !a && b é (!a) && b
+BANG_PRECEDENCE = 3
+UNARY_PRECEDENCE = 7
+# tipos de entrada na pilha de operadores do parser
+BINARY, UNARY, PAREN, CALL = range(4)
+
+PUNCTUATION = {
+    ":": COLON, ";": SEMICOLON, ",": COMMA, ".": DOT, "(": LPAREN, ")": RPAREN,
+    "{": LBRACE, "}": RBRACE, "=": ASSIGN,
+}
+
+# uma única regex: espaços e comentários // são pulados antes de cada token
+_SKIP = r"\s*(?://[^\n]*\s*)*"
+_TOKEN_RE = re.compile(_SKIP + r"""
+    (?:
+        (?P<WORD>[^\W\d_]\w*)
+      | (?P<NUMBER>\d+)
+      | "(?P<STRING>[^"]*)"?
+      | (?P<OPERATOR>[=!<>]=|&&|\|\||[-+*/<>!])
+      | (?P<PUNCT>[:;,.(){}=])
+      | (?P<EOF>\Z)
+    )
+""", re.VERBOSE)
+_SKIP_RE = re.compile(_SKIP)
 
 class Token:
-    def __init__(self, type, value):
+    __slots__ = ("type", "value", "pos")
+
+    def __init__(self, type, value, pos=0):
         self.type = type
         self.value = value
+        self.pos = pos
 
 class Tokenizer:
-    def __init__(self, source):
+    def __init__(self, source, start=0, end=None):
         self.source = source
-        self.position = 0
+        self.position = start
+        self.end = len(source) if end is None else end
+        self._lookahead = None
         self.next = Token(None, None)
         self.select_next()
 
+    def scan(self):
+        match = _TOKEN_RE.match(self.source, self.position, self.end)
+        if match is None:
+            # só sobra o caso de um caractere que nenhum token aceita
+            pos = _SKIP_RE.match(self.source, self.position, self.end).end()
+            error = Exception(f"Invalid character found: '{self.source[pos]}'")
+            # check.py usa a posição para o arquivo:linha:coluna
+            error.pos = pos
+            raise error
+        group = match.lastgroup
+        pos = match.start(group)
+        self.position = match.end()
+        if group == "WORD":
+            text = match.group(group)
+            return Token(KEYWORDS.get(text, IDENTIFIER), sys.intern(text), pos)
+        if group == "OPERATOR":
+            return Token(OPERATOR, match.group(group), pos)
+        if group == "PUNCT":
+            char = match.group(group)
+            return Token(PUNCTUATION[char], char, pos)
+        if group == "NUMBER":
+            return Token(NUMBER, match.group(group), pos)
+        if group == "STRING":
+            return Token(STRING, sys.intern(match.group(group)), pos - 1)
+        return Token(EOF, None, pos)
+
     def select_next(self):
-        # 1) pular apenas espaços e quebras de linha
-        while self.position < len(self.source) and self.source[self.position].isspace():
-            self.position += 1
-
-        # 2) fim de input?
-        if self.position >= len(self.source):
-            self.next = Token("EOF", None)
-            return
-
-        # 3) :, ; e operadores de tamanho 2
-        if self.source[self.position] == ':':
-            self.next = Token("COLON", ":")
-            self.position += 1
-            return
-        if self.source[self.position] == ';':
-            self.next = Token("SEMICOLON", ";")
-            self.position += 1
-            return
-
-        for op in ["==", "!=", "<=", ">=", "&&", "||"]:
-            if self.source.startswith(op, self.position):
-                self.next = Token("OPERATOR", op)
-                self.position += 2
-                return
+        if self._lookahead is not None:
+            self.next, self._lookahead = self._lookahead, None
+        else:
+            self.next = self.scan()
 
-        # 4) single-char
-        char = self.source[self.position]
-
-        if char.isdigit():
-            num = ""
-            while self.position < len(self.source) and self.source[self.position].isdigit():
-                num += self.source[self.position]
-                self.position += 1
-            self.next = Token("NUMBER", num)
-            return
-
-        if char == '"':
-            self.position += 1
-            s = ""
-            while self.position < len(self.source) and self.source[self.position] != '"':
-                s += self.source[self.position]
-                self.position += 1
-            self.position += 1
-            self.next = Token("STRING", s)
-            return
-
-        if char.isalpha():
-            ident = ""
-            while self.position < len(self.source) and (
-                self.source[self.position].isalnum() or self.source[self.position] == '_'
-            ):
-                ident += self.source[self.position]
-                self.position += 1
-
-            if ident in ("true", "false"):
-                self.next = Token("BOOL", ident)
-                return
+    def peek(self):
+        # o token seguinte fica guardado até o próximo select_next
+        if self._lookahead is None:
+            self._lookahead = self.scan()
+        return self._lookahead
 
-            # keywords da DSL
-            if ident == "var":
-                self.next = Token("VAR", ident)
-            elif ident in ("int", "bool", "string"):
-                self.next = Token("TYPE", ident)
-            elif ident == "if":
-                self.next = Token("IF", ident)
-            elif ident == "else":
-                self.next = Token("ELSE", ident)
-            elif ident == "for":
-                self.next = Token("FOR", ident)
-            elif ident == "while":
-                self.next = Token("WHILE", ident)
-
-            elif ident == "to":
-                self.next = Token("TO", ident)
-
-            # comandos de movimento
-            elif ident in ("moveForward", "turnLeft", "turnRight", "pick", "drop"):
-                self.next = Token("COMMAND", ident)
-
-            # acesso a sensor
-            elif ident == "sensor":
-                self.next = Token("SENSOR", ident)
-            elif ident in ("front", "left", "right", "back"):
-                self.next = Token("SENSOR_POS", ident)
-
-            # resto (identificador genérico)
-            else:
-                self.next = Token("IDENTIFIER", ident)
-            return
-
-        # parênteses, chaves, vírgula
-        if char == '(':
-            self.next = Token("LPAREN", char)
-        elif char == ')':
-            self.next = Token("RPAREN", char)
-        elif char == '{':
-            self.next = Token("LBRACE", char)
-        elif char == '}':
-            self.next = Token("RBRACE", char)
-        elif char == ',':
-            self.next = Token("COMMA", char)
-        elif char == '.':
-            self.next = Token("DOT", char)
-
-        # operadores simples
-        elif char in "+-*/<>!":
-            self.next = Token("OPERATOR", char)
-        elif char == '=':
-            self.next = Token("ASSIGN", char)
+class StreamTokenizer(Tokenizer):
+    """
+    Tokenizer que lê o programa aos poucos de um arquivo/pipe.
+    O buffer guarda só o texto ainda não consumido, e o próximo token só é
+    lido quando o parser realmente olha para ele (next é preguiçoso), então
+    uma sentença pode executar antes de o resto do programa chegar.
+    """
+    CHUNK = 65536
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.offset = 0
+        self.at_eof = False
+        self._next = None
+        super().__init__("")
+
+    @property
+    def next(self):
+        if self._next is None:
+            self._next = self.scan()
+        return self._next
+
+    @next.setter
+    def next(self, token):
+        self._next = token
+
+    def select_next(self):
+        if self._lookahead is not None:
+            self._next, self._lookahead = self._lookahead, None
         else:
-            raise Exception(f"Invalid character found: '{char}'")
+            self._next = None
 
-        self.position += 1
-    
     def peek(self):
-        # Salva estado
-        pos, nxt = self.position, self.next
-        self.select_next()
-        result = self.next
-        # Restaura estado
-        self.position, self.next = pos, nxt
-        return result
+        self.next
+        return super().peek()
+
+    def fill(self):
+        # descarta o que já foi consumido e lê mais uma linha (ou pedaço)
+        self.offset += self.position
+        data = self.stream.readline(self.CHUNK)
+        self.source = self.source[self.position:] + data
+        self.position = 0
+        self.end = len(self.source)
+        if not data:
+            self.at_eof = True
+
+    def scan(self):
+        while True:
+            match = _TOKEN_RE.match(self.source, self.position, self.end)
+            # um token que encosta no fim do buffer pode continuar no próximo pedaço
+            if self.at_eof or (match is not None and match.end() < self.end):
+                break
+            self.fill()
+        token = super().scan()
+        token.pos += self.offset
+        return token
+
+# filhos de todas as folhas (imutável, compartilhado)
+LEAF = ()
 
 class Node(ABC):
+    # __slots__ em todos os nós: sem __dict__ por instância, e folhas dividem
+    # a mesma tupla vazia de filhos. pos é o offset do primeiro token do nó no
+    # código-fonte (None se o nó não veio do parser); addr e static_type são
+    # preenchidos por resolver.py e typecheck.py.
+    __slots__ = ("value", "children", "pos", "addr", "static_type")
+
     def __init__(self, value=None, children=None):
         self.value = value
-        self.children = children if children is not None else []
+        self.children = children if children is not None else LEAF
+        self.pos = None
 
     @abstractmethod
     def evaluate(self, symbol_table):
         pass
 
 class IntVal(Node):
+    __slots__ = ()
+
     def __init__(self, value):
         super().__init__(value=value)
     def evaluate(self, symbol_table):
         return ("int", self.value)
 
 class StrVal(Node):
+    __slots__ = ()
+
     def __init__(self, value):
         super().__init__(value=value)
     def evaluate(self, symbol_table):
         return ("string", self.value)
 
 class BoolVal(Node):
+    __slots__ = ()
+
     def __init__(self, value):
         super().__init__(value=value)
     def evaluate(self, symbol_table):
         return ("bool", self.value)
 
 class Variable(Node):
+    __slots__ = ()
+
     def evaluate(self, symbol_table):
         return symbol_table.get(self.value)
 
 class Assignment(Node):
+    __slots__ = ()
+
     def __init__(self, name, expr):
         super().__init__(value=name, children=[expr])
     def evaluate(self, symbol_table):
@@ -186,24 +250,28 @@ class Assignment(Node):
         symbol_table.set(self.value, (var_type, var_value))
 
 class BinOp(Node):
+    __slots__ = ()
+
     def __init__(self, operator, left, right):
         super().__init__(value=operator, children=[left, right])
     def evaluate(self, symbol_table):
         # avalia recursivamente os operandos
-        left_type, left_val = self.children[0].evaluate(symbol_table)
-        right_type, right_val = self.children[1].evaluate(symbol_table)
-
-
+        left = self.children[0].evaluate(symbol_table)
+        right = self.children[1].evaluate(symbol_table)
+        return BinOp.apply(self.value, left, right)
 
-        op = self.value
-        # agora o seu código normal:
+    @staticmethod
+    def apply(op, left, right):
+        # regras de tipo de cada operador (também usadas pelo Interpreter)
+        left_type, left_val = left
+        right_type, right_val = right
         if op == '+':
             if left_type == right_type:
                 return (left_type, left_val + right_val)
             if left_type == "string" or right_type == "string":
                 def normalize(val, typ):
                     if typ == "bool":
-                        return "true" if val else "false"
+                        return bool_str(val)
                     return str(val)
                 return ("string",
                         normalize(left_val, left_type) +
@@ -224,27 +292,37 @@ class BinOp(Node):
             raise Exception(f"Type mismatch in operation: {op}")
 
 class UnOp(Node):
+    __slots__ = ()
+
     def __init__(self, operator, operand):
         super().__init__(value=operator, children=[operand])
     def evaluate(self, symbol_table):
-        typ, val = self.children[0].evaluate(symbol_table)
-        if self.value == '+' and typ == "int":
+        return UnOp.apply(self.value, self.children[0].evaluate(symbol_table))
+
+    @staticmethod
+    def apply(op, operand):
+        typ, val = operand
+        if op == '+' and typ == "int":
             return ("int", +val)
-        elif self.value == '-' and typ == "int":
+        elif op == '-' and typ == "int":
             return ("int", -val)
-        elif self.value == '!' and typ == "bool":
+        elif op == '!' and typ == "bool":
             return ("bool", not val)
         else:
-            raise Exception(f"Invalid unary operation {self.value} on type {typ}")
+            raise Exception(f"Invalid unary operation {op} on type {typ}")
 class CommandStmt(Node):
+    __slots__ = ()
+
     def __init__(self, name):
         super().__init__(value=name)
     def evaluate(self, symbol_table):
         # aqui você dispara a ação do robô
-        print(f"[ROBOT CMD] {self.value}()")  # placeholder
+        symbol_table.command(self.value)
     
 
 class SensorAccess(Node):
+    __slots__ = ()
+
     def __init__(self, pos):
         super().__init__(value=pos)
     def evaluate(self, symbol_table):
@@ -252,24 +330,37 @@ class SensorAccess(Node):
         return ("string", symbol_table.read_sensor(self.value))
 
 class Print(Node):
+    __slots__ = ()
+
     def __init__(self, expr):
         super().__init__(children=[expr])
 
     def evaluate(self, symbol_table):
         typ, val = self.children[0].evaluate(symbol_table)
         if typ == "bool":
-            print("true" if val else "false")
+            print(bool_str(val))
         else:
             print(val)
 
 class Read(Node):
+    __slots__ = ()
+
     def evaluate(self, symbol_table):
         return ("int", int(input()))
 
 class SymbolTable:
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, sink=None, sensors=None):
         self.parent = parent
         self.variables = {}
+        # todos os escopos compartilham o sink de comandos e os sensores da tabela raiz
+        if parent is not None:
+            self.sink = parent.sink
+            self.sensors = parent.sensors
+        else:
+            self.sink = sink if sink is not None else TextSink(batch_size=1)
+            self.sensors = SensorCache(sensors if sensors is not None else StaticSensors())
+            # chamadas de função ativas deste programa (ver FuncDec.invoke)
+            self.calls = 0
     
     def declare(self, name):
         self.offsets[name] = 4  # ou incrementa seu contador
@@ -289,19 +380,33 @@ class SymbolTable:
             return self.parent.get(name)
         raise Exception(f"Undefined variable: {name}")
     
+    def command(self, name):
+        # dispara a ação do robô (o sink decide quando enviar); o robô
+        # mudou de estado, então a última leitura de sensores não vale mais
+        self.sink.send(name)
+        self.sensors.invalidate()
+
+    def repeat_commands(self, count, names):
+        # laço cujo corpo só dispara comandos: o sink recebe a sequência uma vez
+        self.sink.repeat(count, names)
+        self.sensors.invalidate()
+
     def read_sensor(self, pos):
         """
         Retorna um valor de sensor para a posição `pos` ("front", "left", etc.).
-        Aqui você pode conectar ao seu simulador ou hardware; por enquanto,
-        vamos devolver um valor padrão.
+        As quatro posições são lidas de uma vez pelo provedor de sensores e
+        reaproveitadas até o próximo comando. Antes de uma leitura nova, os
+        comandos pendentes no sink precisam chegar ao robô (a leitura depende
+        da pose).
         """
-        # Exemplo de stub: nunca há wall à frente
-        # ou você pode implementar lógica real de leitura.
-        return "none"
+        return self.sensors.read(pos, self.sink.flush)
 
 
 
 class Block(Node):
+    # frame_size: preenchido por resolver.py no bloco do programa
+    __slots__ = ("frame_size",)
+
     def __init__(self, statements):
         super().__init__(children=statements)
 
@@ -311,13 +416,14 @@ class Block(Node):
         else:
             local_table = SymbolTable(parent=symbol_table)
 
+        # return dentro do bloco sobe como ReturnException até o FuncCall
         for stmt in self.children:
-            result = stmt.evaluate(local_table)
-            if isinstance(result, tuple):
-                return result
+            stmt.evaluate(local_table)
         return None
 
 class If(Node):
+    __slots__ = ()
+
     def __init__(self, condition, then_block, else_block=None):
         children = [condition, then_block]
         if else_block:
@@ -339,6 +445,8 @@ class If(Node):
         return None
 
 class For(Node):
+    __slots__ = ()
+
     def __init__(self, condition, block):
         super().__init__(children=[condition, block])
 
@@ -357,6 +465,8 @@ class For(Node):
             self.children[1].evaluate(symbol_table)
 
 class ForStmt(Node):
+    __slots__ = ()
+
     def __init__(self, var_name, start_expr, end_expr, block):
         # var_name: nome da variável de iteração
         # start_expr, end_expr: nós que avaliam para inteiros
@@ -369,6 +479,13 @@ class ForStmt(Node):
         end_type,   end_val   = self.children[1].evaluate(symbol_table)
         if start_type != "int" or end_type != "int":
             raise Exception("For bounds must be integers")
+        body = self.children[2].children
+        if end_val >= start_val and all(type(stmt) is CommandStmt for stmt in body):
+            # corpo só com comandos (não lê a variável de iteração): vira uma
+            # única repetição no sink; a variável termina com o último valor
+            symbol_table.set(self.value, ("int", end_val))
+            symbol_table.repeat_commands(end_val - start_val + 1, [stmt.value for stmt in body])
+            return None
         # loop inclusivo de start até end
         for i in range(start_val, end_val + 1):
             # atribui o índice na tabela
@@ -378,6 +495,8 @@ class ForStmt(Node):
         return None
 
 class While(Node):
+    __slots__ = ()
+
     def __init__(self, condition, block):
         # guarda [condição, bloco]
         super().__init__(children=[condition, block])
@@ -393,6 +512,8 @@ class While(Node):
             self.children[1].evaluate(symbol_table)
 
 class VarDec(Node):
+    __slots__ = ("var_type",)
+
     def __init__(self, name, var_type):
         super().__init__(value=name)
         self.var_type = var_type
@@ -401,103 +522,309 @@ class VarDec(Node):
         # declaração de parâmetro, não faz nada em tempo de execução
         pass
 
+# chamadas guardadas por função pura (LRU) e frames livres por função
+MEMO_SIZE = 256
+FRAME_POOL_SIZE = 64
+# chamadas de função ativas ao mesmo tempo (recursão)
+MAX_CALL_DEPTH = 1000
+# quadros do Python por chamada ativa, com folga para o profiler (que
+# embrulha value e call do Interpreter): enquanto há chamadas ativas, o
+# limite de recursão do Python acompanha
+_FRAMES_PER_CALL = 24
+
 class FuncDec(Node):
+    # params, pure, frames e memo são preenchidos por prepare(), chamado de
+    # novo por link_functions (os nós lidos do cache não passam por __init__)
+    __slots__ = ("ret_type", "params", "pure", "frames", "memo")
+
     def __init__(self, name, params, ret_type, body):
         super().__init__(value=name, children=params + [body])
         self.ret_type = ret_type
+        self.prepare()
+
+    def prepare(self):
+        self.params = tuple(param.value for param in self.children[:-1])
+        self.pure = False
+        self.frames = []
+        self.memo = OrderedDict()
 
     def evaluate(self, symbol_table):
         symbol_table.set(self.value, ("func", self, self.ret_type))
 
+    def check_args(self, args):
+        # só para chamadas montadas fora do parser: as do programa já foram
+        # checadas estaticamente (ver typecheck.py)
+        if len(args) != len(self.params):
+            raise Exception(f"Argument count mismatch: expected {len(self.params)}, got {len(args)}")
+        for param_node, (arg_type, _) in zip(self.children[:-1], args):
+            if arg_type != param_node.var_type:
+                raise Exception(f"Type mismatch for parameter '{param_node.value}': "
+                                f"expected {param_node.var_type}, got {arg_type}")
+
+    def invoke(self, args, symbol_table, run):
+        """
+        Chama a função com `args` (tuplas (tipo, valor) já checadas).
+        `run(statements, frame)` executa o corpo e devolve o valor do return
+        (ou None). O frame sai de um pool da função e volta para ele no fim;
+        funções puras guardam o resultado por argumentos num cache LRU.
+        """
+        memo = self.memo if self.pure else None
+        if memo is not None:
+            result = memo.get(args)
+            if result is not None:
+                memo.move_to_end(args)
+                return result
+        # o escopo da função fica logo abaixo do global, não de quem chamou;
+        # a profundidade de chamadas é contada na tabela global do programa
+        root = symbol_table
+        while root.parent is not None:
+            root = root.parent
+        if root.calls >= MAX_CALL_DEPTH:
+            raise Exception(f"Maximum call depth exceeded ({MAX_CALL_DEPTH})")
+        if self.frames:
+            frame = self.frames.pop()
+            frame.parent, frame.sink, frame.sensors = root, root.sink, root.sensors
+        else:
+            frame = SymbolTable(parent=root)
+        variables = frame.variables
+        for name, arg in zip(self.params, args):
+            variables[name] = arg
+        outermost = root.calls == 0
+        if outermost:
+            # só durante a chamada mais externa, sem mexer no processo depois
+            previous_limit = sys.getrecursionlimit()
+            sys.setrecursionlimit(max(previous_limit, MAX_CALL_DEPTH * _FRAMES_PER_CALL))
+        root.calls += 1
+        try:
+            result = run(self.children[-1].children, frame)
+        finally:
+            root.calls -= 1
+            if outermost:
+                sys.setrecursionlimit(previous_limit)
+            variables.clear()
+            if len(self.frames) < FRAME_POOL_SIZE:
+                self.frames.append(frame)
+        if self.ret_type is None:
+            return None
+        if result is None:
+            raise Exception(f"Function '{self.value}' ended without return")
+        if memo is not None:
+            memo[args] = result
+            if len(memo) > MEMO_SIZE:
+                memo.popitem(last=False)
+        return result
+
 
 class FuncCall(Node):
+    # func: a FuncDec chamada, ligada por link_functions
+    __slots__ = ("func",)
+
     def __init__(self, name, args):
         super().__init__(value=name, children=args)
+        self.func = None
 
-    def evaluate(self, symbol_table):
-        # busca a declaração da função
-        kind, func_node, ret_type = symbol_table.get(self.value)
-        if kind != "func":
+    def lookup(self, symbol_table, args):
+        # chamada sem ligação (ex.: main() chamada por run_program)
+        entry = symbol_table.get(self.value)
+        if entry[0] != "func":
             raise Exception(f"{self.value} is not a function")
+        entry[1].check_args(args)
+        return entry[1]
 
-        # checa número de argumentos
-        expected = len(func_node.children) - 1
-        if len(self.children) != expected:
-            raise Exception(f"Argument count mismatch: expected {expected}, got {len(self.children)}")
+    def evaluate(self, symbol_table):
+        args = tuple([arg.evaluate(symbol_table) for arg in self.children])
+        func = self.func if self.func is not None else self.lookup(symbol_table, args)
+        return func.invoke(args, symbol_table, _run_statements)
 
-        # monta novo escopo só para a execução da função
-        new_table = SymbolTable(parent=symbol_table)
-        # avalia e atribui cada parâmetro NO ESCOPO DA PRÓPRIA FUNÇÃO
-        for param_node, arg_node in zip(func_node.children[:-1], self.children):
-            arg_type, arg_val = arg_node.evaluate(symbol_table)
-            if arg_type != param_node.var_type:
-                raise Exception(f"Type mismatch for parameter '{param_node.value}': expected {param_node.var_type}, got {arg_type}")
-            # não propaga para o pai: só registra aqui dentro
-            new_table.variables[param_node.value] = (arg_type, arg_val)
 
-        # executa o corpo da função
-        result = func_node.children[-1].evaluate(new_table)
+class ReturnException(Exception):
+    def __init__(self, type_val):
+        super().__init__()
+        self.type_val = type_val
 
-        # se não há tipo de retorno declarado (void)
-        if ret_type is None:
-            # mas se houver return com valor, é inválido
-            if result is not None:
-                raise Exception("Invalid return in a void function")
-            return None
 
-        # se houve return explícito, result é uma tupla (tipo, valor)
-        if result is not None:
-            res_type, res_val = result
-            # —— TESTE 109: verifica compatibilidade entre tipo declarado e tipo retornado
-            if res_type != ret_type:
-                raise Exception(f"Incompatible types: expected {ret_type}, got {res_type}")
-            return result
+class Return(Node):
+    __slots__ = ()
 
-        # se não houve return explícito, devolve (ret_type, None)
-        return (ret_type, None)
+    def __init__(self, expr=None):
+        super().__init__(children=[expr] if expr is not None else None)
 
+    def evaluate(self, symbol_table):
+        # avalia a expressão e a entrega ao FuncCall, por cima dos blocos e laços
+        raise ReturnException(self.children[0].evaluate(symbol_table) if self.children else None)
 
-class Return(Node):
-    def __init__(self, expr):
-        super().__init__(children=[expr])
 
-    def evaluate(self, symbol_table):
-        # avalia a expressão e devolve (tipo, valor)
-        return self.children[0].evaluate(symbol_table)
-    
-# class ReturnException(Exception):
-#     def __init__(self, type_val):
-#         super().__init__()
-#         self.type_val = type_val
+def _run_statements(statements, symbol_table):
+    # corpo de função pelos evaluate recursivos
+    try:
+        for stmt in statements:
+            stmt.evaluate(symbol_table)
+    except ReturnException as e:
+        return e.type_val
+    return None
+
+
+# nós que tornam uma função impura onde quer que apareçam no corpo
+_IMPURE_NODES = ("CommandStmt", "SensorAccess", "Read", "Print")
+
+def _only_locals(statements, local, calls):
+    """
+    True se `statements` não têm efeitos no robô e só usam nomes de
+    `local` (parâmetros e variáveis declaradas antes, no mesmo escopo ou
+    num escopo de fora). Junta em `calls` os nomes das funções chamadas.
+    """
+    for stmt in statements:
+        kind = type(stmt).__name__
+        if kind == "VarInit":
+            if not _only_locals(stmt.children, local, calls):
+                return False
+            local.add(stmt.value)
+            continue
+        if kind == "Block":
+            # declarações de dentro do bloco somem quando ele termina
+            if not _only_locals(stmt.children, set(local), calls):
+                return False
+            continue
+        if kind in _IMPURE_NODES:
+            return False
+        if kind in ("Variable", "Assignment", "ForStmt") and stmt.value not in local:
+            # lê ou escreve uma variável global
+            return False
+        if kind == "FuncCall":
+            calls.add(stmt.value)
+        if not _only_locals([child for child in stmt.children if child is not None], local, calls):
+            return False
+    return True
+
+def mark_pure(functions):
+    """
+    Marca como puras (FuncDec.pure) as funções sem comandos, sensores,
+    Read/Print e variáveis globais no corpo e que só chamam funções puras.
+    """
+    calls = {}
+    candidates = set()
+    for name, func in functions.items():
+        calls[name] = set()
+        if func.ret_type is not None and _only_locals(func.children[-1].children, set(func.params), calls[name]):
+            candidates.add(name)
+    changed = True
+    while changed:
+        changed = False
+        for name in list(candidates):
+            if not calls[name] <= candidates:
+                candidates.discard(name)
+                changed = True
+    for name, func in functions.items():
+        func.pure = name in candidates
+
+def link_functions(program, functions):
+    """
+    Liga cada FuncCall de `program` à sua FuncDec (já em `functions` ou
+    declarada no próprio `program`, que as acrescenta) e confere o número
+    de argumentos. Devolve True se `program` declara ou chama funções.
+    """
+    decs = []
+    call_nodes = []
+    stack = [program]
+    while stack:
+        node = stack.pop()
+        cls = type(node)
+        if cls is FuncDec:
+            decs.append(node)
+        elif cls is FuncCall:
+            call_nodes.append(node)
+        stack.extend(child for child in node.children if child is not None)
+    for func in decs:
+        if func.value in functions:
+            raise Exception(f"Function '{func.value}' already declared")
+        func.prepare()
+        functions[func.value] = func
+    for call in call_nodes:
+        func = functions.get(call.value)
+        if func is None:
+            raise Exception(f"Undefined function: {call.value}")
+        if len(call.children) != len(func.params):
+            raise Exception(f"Argument count mismatch: expected {len(func.params)}, got {len(call.children)}")
+        call.func = func
+    if decs:
+        mark_pure(functions)
+    return bool(decs or call_nodes)
+
+def trampoline(visit):
+    """
+    Roda sem recursão um visitante escrito como gerador (optimizer.py,
+    typecheck.py, bytecode.py). Onde a versão recursiva chamaria
+    `self.visit(filho)`, o gerador faz `resultado = yield self.visit(filho)`:
+    o gerador do filho vai para uma pilha explícita e o valor que ele devolve
+    com return volta para o pai. Um valor que não é gerador (de um método
+    folha) volta direto. Exceções sobem pela pilha como numa chamada; a
+    profundidade só é limitada pela memória.
+    """
+    if type(visit) is not GeneratorType:
+        return visit
+    stack = [visit]
+    value = None
+    error = None
+    while stack:
+        try:
+            if error is None:
+                child = stack[-1].send(value)
+            else:
+                exc, error = error, None
+                child = stack[-1].throw(exc)
+        except StopIteration as stop:
+            stack.pop()
+            value = stop.value
+            continue
+        except Exception as exc:
+            stack.pop()
+            if not stack:
+                raise
+            error = exc
+            continue
+        if type(child) is GeneratorType:
+            stack.append(child)
+            value = None
+        else:
+            value = child
+    return value
 
 class PrePro:
+    # o Tokenizer já pula comentários; filter fica para quem só quer o texto limpo
+    _COMMENT_RE = re.compile(r'("[^"]*"?)|//[^\n]*')
+
     @staticmethod
     def filter(code):
-        lines = code.split('\n')
-        no_comments = []
-        for line in lines:
-            if '//' in line:
-                line = line.split('//')[0]
-            no_comments.append(line)
-        return '\n'.join(no_comments)
+        # "//" dentro de string literal não é comentário
+        return PrePro._COMMENT_RE.sub(lambda m: m.group(1) or '', code)
 
 class Parser:
-    def __init__(self, tokenizer):
+    def __init__(self, tokenizer, symbol_table=None):
         self.tokenizer    = tokenizer
-        self.symbol_table = SymbolTable()
+        self.symbol_table = symbol_table if symbol_table is not None else SymbolTable()
         self.declared_vars = set()
+        # funções declaradas (nome -> FuncDec) e a que está sendo lida
+        self.functions = {}
+        self.function = None
     
     def expect(self, typ):
         tok = self.tokenizer.next
         if tok.type != typ:
-            raise Exception(f"Expected {typ}, got {tok.type}")
+            raise Exception(f"Expected {TOKEN_NAMES[typ]}, got {TOKEN_NAMES[tok.type]}")
         self.tokenizer.select_next()
         return tok
 
     def parse(self):
         prog = self.parse_program()
-        if self.tokenizer.next.type != "EOF":
-            raise Exception(f"Unexpected token {self.tokenizer.next.type}, expected EOF")
+        if self.tokenizer.next.type != EOF:
+            raise Exception(f"Unexpected token {TOKEN_NAMES[self.tokenizer.next.type]}, expected EOF")
+        if link_functions(prog, self.functions):
+            # com funções, os tipos de argumentos e returns são checados
+            # aqui uma vez, e não a cada chamada
+            import typecheck
+            errors = typecheck.check(prog)
+            if errors:
+                raise typecheck.TypeCheckError(errors)
         return prog
 
     def parse_program(self):
@@ -505,280 +832,391 @@ class Parser:
         Agora o parser lê todas as statements (var, assignments,
         if, for, while, comandos etc.) até encontrar EOF.
         """
-        stmts = []
-        while self.tokenizer.next.type != "EOF":
-            stmts.append(self.parse_statement())
-        return Block(stmts)
+        return Block(list(self.iter_program()))
+
+    def iter_program(self):
+        # devolve cada statement de topo assim que termina de ser lida
+        while self.tokenizer.next.type != EOF:
+            yield self.parse_statement()
     
     def parse_func_declaration(self):
         # 1) consome o token 'func'
         self.tokenizer.select_next()
 
         # 2) nome da função
-        if self.tokenizer.next.type != "IDENTIFIER":
+        if self.tokenizer.next.type != IDENTIFIER:
             raise Exception("Expected function name after 'func'")
         name = self.tokenizer.next.value
         self.tokenizer.select_next()
 
         # 3) parâmetros entre parênteses
-        if self.tokenizer.next.type != "LPAREN":
+        if self.tokenizer.next.type != LPAREN:
             raise Exception("Expected '(' after function name")
         self.tokenizer.select_next()
 
         params = []
-        if self.tokenizer.next.type != "RPAREN":
+        if self.tokenizer.next.type != RPAREN:
             while True:
-                if self.tokenizer.next.type != "IDENTIFIER":
+                if self.tokenizer.next.type != IDENTIFIER:
                     raise Exception("Expected parameter name")
                 pid = self.tokenizer.next.value
                 self.tokenizer.select_next()
 
-                if self.tokenizer.next.type != "TYPE":
+                if self.tokenizer.next.type != TYPE:
                     raise Exception("Expected parameter type")
                 ptype = self.tokenizer.next.value
                 self.tokenizer.select_next()
 
                 params.append(VarDec(pid, ptype))
 
-                if self.tokenizer.next.type == "COMMA":
+                if self.tokenizer.next.type == COMMA:
                     self.tokenizer.select_next()
                     continue
                 break
 
         # 4) fecha ')'
-        if self.tokenizer.next.type != "RPAREN":
+        if self.tokenizer.next.type != RPAREN:
             raise Exception("Expected ')' after parameters")
         self.tokenizer.select_next()
 
         # 5) tipo de retorno opcional
-        if self.tokenizer.next.type == "TYPE":
+        if self.tokenizer.next.type == TYPE:
             ret_type = self.tokenizer.next.value
             self.tokenizer.select_next()
         else:
             ret_type = None
 
-        # ←── **AQUI**: Criamos o nodo FuncDec *sem* corpo ainda, e registramos
+        # ←── **AQUI**: Criamos o nodo FuncDec *sem* corpo ainda; as chamadas
+        # (inclusive recursivas) são ligadas a ele por link_functions
         fdec = FuncDec(name, params, ret_type, None)
-        # registra assinatura imediatamente para que chamadas dentro do corpo
-        # já encontrem 'fac', 'sum', etc.
-        self.symbol_table.set(name, ("func", fdec, ret_type))
 
         # 6) corpo da função
-        body = self.parse_block()
+        self.function = fdec
+        try:
+            body = self.parse_block()
+        finally:
+            self.function = None
         # agora que temos o body, completamos o FuncDec
         fdec.children[-1] = body
 
         return fdec
 
     def parse_block(self):
+        if self.tokenizer.next.type != LBRACE:
+            raise Exception("Expected '{'")
+        # um bloco "{ ... }" também é uma statement
+        return self.parse_statement()
+
+    def parse_statement(self):
+        """
+        Lê uma statement completa sem recursão: cada construção ainda aberta
+        (bloco, if, while, for) fica numa pilha explícita até o seu bloco
+        fechar, então a profundidade só é limitada pela memória.
+        """
+        tok = self.tokenizer
+        stack = []
+        while True:
+            if stack and stack[-1][0] == "block" and tok.next.type in (RBRACE, EOF):
+                if tok.next.type == EOF:
+                    raise Exception("Unclosed block")
+                # consome '}'
+                tok.select_next()
+                _, stmts, pos, outer_declared = stack.pop()
+                if not stmts:
+                    error = Exception("Empty block is not allowed")
+                    error.pos = pos
+                    raise error
+                # —— restauramos o contexto de variáveis do bloco pai
+                self.declared_vars = outer_declared
+                node = Block(stmts)
+                node.pos = pos
+            else:
+                node = self.parse_simple_statement(stack)
+                if node is None:
+                    # abriu um bloco: continua lendo as statements de dentro
+                    continue
+
+            # encaixa a statement pronta nas construções abertas
+            while True:
+                if not stack:
+                    return node
+                frame = stack[-1]
+                kind = frame[0]
+                if kind == "block":
+                    frame[1].append(node)
+                    break
+                if kind == "if" and frame[3] is None:
+                    frame[3] = node
+                    if tok.next.type == ELSE:
+                        tok.select_next()
+                        self.open_block(stack)
+                        break
+                    stack.pop()
+                    node = If(frame[1], node)
+                elif kind == "if":
+                    stack.pop()
+                    node = If(frame[1], frame[3], node)
+                elif kind == "while":
+                    stack.pop()
+                    node = WhileStmt(frame[1], node)
+                else:
+                    stack.pop()
+                    node = ForStmt(frame[1], frame[3], frame[4], node)
+                node.pos = frame[2]
+
+    def open_block(self, stack):
         # espera abrir chaves
-        if self.tokenizer.next.type != "LBRACE":
+        if self.tokenizer.next.type != LBRACE:
             raise Exception("Expected '{'")
+        pos = self.tokenizer.next.pos
         self.tokenizer.select_next()
-
         # —— salvamos o declarado do bloco pai e criamos um novo para este bloco
-        outer_declared = self.declared_vars
+        stack.append(["block", [], pos, self.declared_vars])
         self.declared_vars = set()
 
-        stmts = []
-        # parse statements até fechar chaves
-        while self.tokenizer.next.type != "RBRACE":
-            if self.tokenizer.next.type == "EOF":
-                raise Exception("Unclosed block")
-            stmts.append(self.parse_statement())
-
-        # consome '}'  
-        self.tokenizer.select_next()
-
-        if not stmts:
-            raise Exception("Empty block is not allowed")
-
-        # —— restauramos o contexto de variáveis do bloco pai
-        self.declared_vars = outer_declared
-
-        return Block(stmts)
-
-    def parse_statement(self):
+    def parse_simple_statement(self, stack):
+        """
+        Devolve a próxima statement sem bloco, ou None se ela abriu um bloco
+        (if/while/for/"{"): o cabeçalho vai para `stack` e o corpo é lido
+        por parse_statement.
+        """
         tok = self.tokenizer.next
+        pos = tok.pos
 
         # entrar num bloco "{ ... }" como statement
-        if tok.type == "LBRACE":
-            return self.parse_block()
+        if tok.type == LBRACE:
+            self.open_block(stack)
+            return None
 
         # var x: TYPE;
-        if tok.type == "VAR":
+        if tok.type == VAR:
             self.tokenizer.select_next()
-            name = self.expect("IDENTIFIER").value
-            self.expect("COLON")
-            vartype = self.expect("TYPE").value
-            self.expect("SEMICOLON")
+            name = self.expect(IDENTIFIER).value
+            self.expect(COLON)
+            vartype = self.expect(TYPE).value
+            self.expect(SEMICOLON)
             # aqui você deve DECLARAR e já inicializar na symbol_table
-            return VarInit(name, vartype)
+            node = VarInit(name, vartype)
 
-        # x = expr;
-        if tok.type == "IDENTIFIER":
+        # x = expr;  ou  f(args);
+        elif tok.type == IDENTIFIER:
             name = tok.value
             self.tokenizer.select_next()
-            self.expect("ASSIGN")
-            expr = self.parse_bexpr()
-            self.expect("SEMICOLON")
-            return Assignment(name, expr)
+            if self.tokenizer.next.type == LPAREN:
+                node = self.parse_funccall(name)
+                self.expect(SEMICOLON)
+            else:
+                self.expect(ASSIGN)
+                expr = self.parse_bexpr()
+                self.expect(SEMICOLON)
+                node = Assignment(name, expr)
+
+        # func nome(p tipo, ...) [tipo] {…}: só no nível de topo
+        elif tok.type == FUNC:
+            if stack or self.function is not None:
+                raise Exception("Functions must be declared at the top level")
+            node = self.parse_func_declaration()
+
+        # return [expr];
+        elif tok.type == RETURN:
+            if self.function is None:
+                raise Exception("Return outside of a function")
+            self.tokenizer.select_next()
+            expr = None
+            if self.tokenizer.next.type != SEMICOLON:
+                expr = self.parse_bexpr()
+            self.expect(SEMICOLON)
+            node = Return(expr)
 
         # if (cond) {…} [ else {…} ]
-        if tok.type == "IF":
+        elif tok.type == IF:
             self.tokenizer.select_next()
-            self.expect("LPAREN")
+            self.expect(LPAREN)
             cond = self.parse_bexpr()
-            self.expect("RPAREN")
-            then_blk = self.parse_block()
-            else_blk = None
-            if self.tokenizer.next.type == "ELSE":
-                self.tokenizer.select_next()
-                else_blk = self.parse_block()
-            return If(cond, then_blk, else_blk)
+            self.expect(RPAREN)
+            stack.append(["if", cond, pos, None])
+            self.open_block(stack)
+            return None
 
         # while (cond) {…}
-        if tok.type == "WHILE":
+        elif tok.type == WHILE:
             self.tokenizer.select_next()
-            self.expect("LPAREN")
+            self.expect(LPAREN)
             cond = self.parse_bexpr()
-            self.expect("RPAREN")
-            body = self.parse_block()
-            return WhileStmt(cond, body)
+            self.expect(RPAREN)
+            stack.append(["while", cond, pos])
+            self.open_block(stack)
+            return None
 
         # for i = start to end {…}
-        if tok.type == "FOR":
+        elif tok.type == FOR:
             self.tokenizer.select_next()
-            var = self.expect("IDENTIFIER").value
-            self.expect("ASSIGN")
+            var = self.expect(IDENTIFIER).value
+            self.expect(ASSIGN)
             start = self.parse_bexpr()
-            self.expect("TO")
+            self.expect(TO)
             end   = self.parse_bexpr()
-            body  = self.parse_block()
-            return ForStmt(var, start, end, body)
+            stack.append(["for", var, pos, start, end])
+            self.open_block(stack)
+            return None
 
         # moveForward(); turnLeft(); pick(); drop();
-        if tok.type == "COMMAND":
+        elif tok.type == COMMAND:
             cmd = tok.value
             self.tokenizer.select_next()
-            self.expect("LPAREN")
-            self.expect("RPAREN")
-            self.expect("SEMICOLON")
-            return CommandStmt(cmd)
+            self.expect(LPAREN)
+            self.expect(RPAREN)
+            self.expect(SEMICOLON)
+            node = CommandStmt(cmd)
 
-        raise Exception(f"Unexpected token in statement: {tok.type}")
+        else:
+            raise Exception(f"Unexpected token in statement: {TOKEN_NAMES[tok.type]}")
+        node.pos = pos
+        return node
     
     def parse_funccall_statement(self):
         call = self.parse_funccall()
-        if self.tokenizer.next.type == "SEMICOLON":
+        if self.tokenizer.next.type == SEMICOLON:
             self.tokenizer.select_next()
         return call
 
     def parse_bexpr(self):
-        node = self.parse_bterm()
-        while self.tokenizer.next.type == "OPERATOR" and self.tokenizer.next.value == "||":
-            op = self.tokenizer.next.value
-            self.tokenizer.select_next()
-            node = BinOp(op, node, self.parse_bterm())
-        return node
+        """
+        Expressão completa por precedência de operadores, sem recursão:
+        `operands` guarda os nós prontos e `ops` os operadores pendentes
+        (precedência, operador, posição, tipo), com marcadores para "(" e
+        chamadas de função. A árvore sai igual à da gramática em camadas
+        (bexpr > bterm > bfactor > relexpr > expression > term > factor).
+        """
+        tok = self.tokenizer
+        operands = []
+        ops = []
+        markers = []
+        # um "!" no início de um fator booleano abrange a comparação inteira
+        bfactor = True
+        while True:
+            # —— operando (com unários na frente) ——
+            t = tok.next
+            if t.type == OPERATOR and t.value in ("+", "-", "!"):
+                bang = t.value == "!" and bfactor
+                ops.append((BANG_PRECEDENCE if bang else UNARY_PRECEDENCE, t.value, t.pos, UNARY))
+                tok.select_next()
+                bfactor = bang
+                continue
+            if t.type == LPAREN:
+                tok.select_next()
+                ops.append((0, "(", t.pos, PAREN))
+                markers.append(ops[-1])
+                bfactor = True
+                continue
+            if t.type == NUMBER:
+                tok.select_next()
+                node = IntVal(int(t.value))
+            elif t.type == STRING:
+                tok.select_next()
+                node = StrVal(t.value)
+            elif t.type == BOOL:
+                tok.select_next()
+                node = BoolVal(t.value == "true")
+            # sensor.front
+            elif t.type == SENSOR:
+                tok.select_next()
+                self.expect(DOT)
+                node = SensorAccess(self.expect(SENSOR_POS).value)
+            # — Identificador ou chamada de função —
+            elif t.type == IDENTIFIER:
+                tok.select_next()
+                if tok.next.type == LPAREN:
+                    # consome '('
+                    tok.select_next()
+                    if tok.next.type != RPAREN:
+                        ops.append((0, t.value, t.pos, CALL, []))
+                        markers.append(ops[-1])
+                        bfactor = True
+                        continue
+                    tok.select_next()
+                    node = FuncCall(t.value, [])
+                else:
+                    node = Variable(t.value)
+            # — Scan() —
+            elif t.type == SCAN:
+                tok.select_next()
+                if tok.next.type != LPAREN:
+                    raise Exception("Expected '(' after Scan")
+                tok.select_next()
+                if tok.next.type != RPAREN:
+                    raise Exception("Expected ')' after Scan")
+                tok.select_next()
+                node = Read()
+            else:
+                raise Exception("Unexpected token in factor")
+            node.pos = t.pos
+            operands.append(node)
 
-    def parse_bterm(self):
-        node = self.parse_bfactor()
-        while self.tokenizer.next.type == "OPERATOR" and self.tokenizer.next.value == "&&":
-            op = self.tokenizer.next.value
-            self.tokenizer.select_next()
-            node = BinOp(op, node, self.parse_bfactor())
-        return node
+            # —— operadores depois do operando ——
+            while True:
+                t = tok.next
+                if t.type == OPERATOR and t.value in BINARY_PRECEDENCE:
+                    prec = BINARY_PRECEDENCE[t.value]
+                    while ops[-1:] and ops[-1][0] >= prec and not (prec == ops[-1][0] == RELATIONAL_PRECEDENCE):
+                        self.reduce(ops, operands)
+                    # a gramática só aceita uma comparação por fator: a segunda encerra a expressão
+                    if prec == RELATIONAL_PRECEDENCE and ops and ops[-1][0] == prec:
+                        t = None
+                    else:
+                        tok.select_next()
+                        ops.append((prec, t.value, t.pos, BINARY))
+                        bfactor = prec < RELATIONAL_PRECEDENCE
+                        break
+                elif t.type == RPAREN and markers:
+                    tok.select_next()
+                    self.close_marker(ops, operands, markers)
+                    continue
+                elif t.type == COMMA and markers and markers[-1][3] == CALL:
+                    tok.select_next()
+                    while ops[-1] is not markers[-1]:
+                        self.reduce(ops, operands)
+                    markers[-1][4].append(operands.pop())
+                    bfactor = True
+                    break
+                else:
+                    t = None
+                if t is None:
+                    # fim da expressão: tudo que sobrou é reduzido
+                    while ops:
+                        if ops[-1][3] == PAREN:
+                            raise Exception("Expected closing parenthesis")
+                        if ops[-1][3] == CALL:
+                            raise Exception("Expected ')' in function call")
+                        self.reduce(ops, operands)
+                    return operands[0]
 
-    def parse_bfactor(self):
-        if self.tokenizer.next.type == "OPERATOR" and self.tokenizer.next.value == "!":
-            self.tokenizer.select_next()
-            return UnOp("!", self.parse_bfactor())
+    @staticmethod
+    def reduce(ops, operands):
+        _, op, pos, kind = ops.pop()
+        if kind == UNARY:
+            node = UnOp(op, operands.pop())
+            node.pos = pos
         else:
-            return self.parse_relexpr()
-
-    def parse_relexpr(self):
-        node = self.parse_expression()
-        if self.tokenizer.next.type == "OPERATOR" and self.tokenizer.next.value in ["==", "!=", ">", "<", ">=", "<="]:
-            op = self.tokenizer.next.value
-            self.tokenizer.select_next()
-            node = BinOp(op, node, self.parse_expression())
-        return node
-
-    def parse_expression(self):
-        node = self.parse_term()
-        while self.tokenizer.next.type == "OPERATOR" and self.tokenizer.next.value in ("+", "-"):
-            op = self.tokenizer.next.value
-            self.tokenizer.select_next()
-            node = BinOp(op, node, self.parse_term())
-        return node
-
-    def parse_term(self):
-        node = self.parse_factor()
-        while self.tokenizer.next.type == "OPERATOR" and self.tokenizer.next.value in ("*", "/", "%"):
-            op = self.tokenizer.next.value
-            self.tokenizer.select_next()
-            node = BinOp(op, node, self.parse_factor())
-        return node
-
-    def parse_factor(self):
-        tok = self.tokenizer.next
-
-        # — Unário encadeado (+, -, !) —  
-        if tok.type == "OPERATOR" and tok.value in ("+", "-", "!"):
-            op = tok.value
-            self.tokenizer.select_next()
-            return UnOp(op, self.parse_factor())
+            right = operands.pop()
+            left = operands.pop()
+            node = BinOp(op, left, right)
+            node.pos = left.pos
+        operands.append(node)
+
+    def close_marker(self, ops, operands, markers):
+        # ")" fecha o marcador mais interno: parênteses devolvem o nó de
+        # dentro (que já tem a própria posição); chamadas viram FuncCall
+        marker = markers.pop()
+        while ops[-1] is not marker:
+            self.reduce(ops, operands)
+        ops.pop()
+        if marker[3] == CALL:
+            marker[4].append(operands.pop())
+            node = FuncCall(marker[1], marker[4])
+            node.pos = marker[2]
+            operands.append(node)
 
-        # — Literais —  
-        elif tok.type == "NUMBER":
-            self.tokenizer.select_next()
-            return IntVal(int(tok.value))
-        elif tok.type == "STRING":
-            self.tokenizer.select_next()
-            return StrVal(tok.value)
-        elif tok.type == "BOOL":
-            self.tokenizer.select_next()
-            return BoolVal(tok.value == "true")
-        
-        # sensor.front
-        if tok.type == "SENSOR":
-            self.tokenizer.select_next()
-            self.expect("DOT")
-            pos = self.expect("SENSOR_POS").value
-            return SensorAccess(pos)
-
-        # — Identificador ou chamada de função —  
-        elif tok.type == "IDENTIFIER":
-            name = tok.value
-            self.tokenizer.select_next()
-            if self.tokenizer.next.type == "LPAREN":
-                return self.parse_funccall(name)
-            return Variable(name)
-
-        # — Scan() —  
-        elif tok.type == "SCAN":
-            self.tokenizer.select_next()
-            if self.tokenizer.next.type != "LPAREN":
-                raise Exception("Expected '(' after Scan")
-            self.tokenizer.select_next()
-            if self.tokenizer.next.type != "RPAREN":
-                raise Exception("Expected ')' after Scan")
-            self.tokenizer.select_next()
-            return Read()
-
-        # — Parênteses —  
-        elif tok.type == "LPAREN":
-            self.tokenizer.select_next()
-            expr = self.parse_bexpr()
-            if self.tokenizer.next.type != "RPAREN":
-                raise Exception("Expected closing parenthesis")
-            self.tokenizer.select_next()
-            return expr
-
-        else:
-            raise Exception("Unexpected token in factor")
-    
     def parse_funccall(self, name=None):
         if name is None:
             name = self.tokenizer.next.value
@@ -786,12 +1224,12 @@ class Parser:
         # consome '('
         self.tokenizer.select_next()
         args = []
-        if self.tokenizer.next.type != "RPAREN":
+        if self.tokenizer.next.type != RPAREN:
             args.append(self.parse_bexpr())
-            while self.tokenizer.next.type == "COMMA":
+            while self.tokenizer.next.type == COMMA:
                 self.tokenizer.select_next()
                 args.append(self.parse_bexpr())
-        if self.tokenizer.next.type != "RPAREN":
+        if self.tokenizer.next.type != RPAREN:
             raise Exception("Expected ')' in function call")
         self.tokenizer.select_next()
         return FuncCall(name, args)
@@ -801,8 +1239,10 @@ class VarInit(Node):
     Declaração de variável com ou sem inicialização.
     Fica no escopo corrente apenas.
     """
+    __slots__ = ("var_type",)
+
     def __init__(self, name, var_type, expr=None):
-        super().__init__(value=name, children=[expr] if expr else [])
+        super().__init__(value=name, children=[expr] if expr else LEAF)
         self.var_type = var_type
 
     def evaluate(self, symbol_table):
@@ -821,6 +1261,8 @@ class VarInit(Node):
         symbol_table.variables[self.value] = (self.var_type, val)
 
 class WhileStmt(Node):
+    __slots__ = ()
+
     def __init__(self, cond, body):
         super().__init__(children=[cond, body])
     def evaluate(self, st):
@@ -830,26 +1272,533 @@ class WhileStmt(Node):
             if not v: break
             self.children[1].evaluate(st)
 
+# valor inicial de uma variável declarada sem inicialização
+DEFAULTS = {"int": 0, "bool": False, "string": ""}
+
+
+def bool_str(val):
+    # forma textual de um bool na linguagem (concatenação e Print)
+    return "true" if val else "false"
+
+# operadores int x int que o Interpreter resolve sem passar por BinOp.apply
+_INT_OPS = {
+    "+": ("int", operator.add), "-": ("int", operator.sub), "*": ("int", operator.mul),
+    "==": ("bool", operator.eq), "!=": ("bool", operator.ne),
+    "<": ("bool", operator.lt), ">": ("bool", operator.gt),
+    "<=": ("bool", operator.le), ">=": ("bool", operator.ge),
+}
+# instruções das expressões achatadas
+_LOAD, _CONST, _BINARY, _UNARY, _SENSOR, _CALL, _EVAL = range(7)
+_LITERALS = {IntVal: "int", StrVal: "string", BoolVal: "bool"}
+
+class Interpreter:
+    """
+    Executa a AST como os métodos evaluate, mas sem recursão: as statements
+    abertas ficam numa pilha explícita de iteradores (um por bloco ou laço)
+    e cada expressão é achatada uma única vez em instruções pós-fixas,
+    avaliadas com uma pilha de valores. A profundidade de blocos e
+    expressões só é limitada pela memória; só chamadas de função aninhadas
+    usam a pilha do Python (um run() por chamada ativa).
+
+    Nós que o parser não produz (Print, Read, For/While antigos) continuam
+    usando o próprio evaluate.
+
+    Subclasses instrumentam a execução pelos ganchos: iterate() a cada
+    iteração de laço, e enter()/leave() em volta de cada statement (ver
+    profiler.ProfiledInterpreter). Com enter None, run() não faz chamada
+    nenhuma a mais.
+    """
+    enter = None
+    leave = None
+
+    def __init__(self):
+        # id(expressão) -> (expressão, instruções); a referência ao nó
+        # impede que o id seja reaproveitado por outro objeto
+        self.postfix = {}
+
+    def flatten(self, expr):
+        # pré-ordem com o filho da direita visitado primeiro; invertida,
+        # vira a ordem pós-fixa da esquerda para a direita
+        code = []
+        append = code.append
+        stack = [expr]
+        while stack:
+            node = stack.pop()
+            cls = type(node)
+            if cls is BinOp or cls is UnOp:
+                append((_BINARY if cls is BinOp else _UNARY, node.value))
+                stack.extend(node.children)
+            elif cls is Variable:
+                append((_LOAD, node.value))
+            elif cls in _LITERALS:
+                # a tupla (tipo, valor) do literal é montada uma única vez
+                append((_CONST, (_LITERALS[cls], node.value)))
+            elif cls is SensorAccess:
+                append((_SENSOR, node.value))
+            elif cls is FuncCall:
+                append((_CALL, node))
+            else:
+                append((_EVAL, node))
+        code.reverse()
+        self.postfix[id(expr)] = (expr, code)
+        return code
+
+    def value(self, expr, table):
+        cls = type(expr)
+        if cls is Variable:
+            return table.get(expr.value)
+        if cls in _LITERALS:
+            return (_LITERALS[cls], expr.value)
+        entry = self.postfix.get(id(expr))
+        code = entry[1] if entry is not None else self.flatten(expr)
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        for op, arg in code:
+            if op == _LOAD:
+                push(table.get(arg))
+            elif op == _CONST:
+                push(arg)
+            elif op == _BINARY:
+                right = pop()
+                left = stack[-1]
+                fast = _INT_OPS.get(arg)
+                if fast is not None and left[0] == "int" and right[0] == "int":
+                    stack[-1] = (fast[0], fast[1](left[1], right[1]))
+                else:
+                    stack[-1] = BinOp.apply(arg, left, right)
+            elif op == _UNARY:
+                stack[-1] = UnOp.apply(arg, stack[-1])
+            elif op == _SENSOR:
+                push(("string", table.read_sensor(arg)))
+            elif op == _CALL:
+                push(self.call(arg, table))
+            else:
+                push(arg.evaluate(table))
+        return stack[0]
+
+    def iterate(self, loop, count=1):
+        # gancho: `loop` começa `count` iterações (count > 1 só no atalho
+        # do for que só tem comandos)
+        pass
+
+    @staticmethod
+    def body(block, table):
+        # no escopo global um bloco não cria escopo (ver Block.evaluate):
+        # as statements dele rodam direto no quadro de quem o abriu
+        if type(block) is Block and table.parent is None:
+            return block.children
+        return (block,)
+
+    def loop_while(self, node, table):
+        cond = node.children[0]
+        body = self.body(node.children[1], table)
+        value = self.value
+        iterate = self.iterate
+        while True:
+            cond_type, cond_val = value(cond, table)
+            if cond_type != "bool":
+                raise Exception("Condition in while must be boolean")
+            if not cond_val:
+                return
+            iterate(node)
+            yield from body
+
+    def loop_for(self, node, table, start_val, end_val):
+        name = node.value
+        body = self.body(node.children[2], table)
+        iterate = self.iterate
+        for i in range(start_val, end_val + 1):
+            table.set(name, ("int", i))
+            iterate(node)
+            yield from body
+
+    def call(self, node, table):
+        value = self.value
+        args = tuple([value(arg, table) for arg in node.children])
+        func = node.func if node.func is not None else node.lookup(table, args)
+        return func.invoke(args, table, self.run)
+
+    def execute(self, program, symbol_table):
+        self.run((program,), symbol_table)
+
+    def run(self, statements, symbol_table):
+        """Executa `statements` em `symbol_table`; devolve o valor de um return (ou None)."""
+        value = self.value
+        enter, leave = self.enter, self.leave
+        # cada quadro: (statements ainda por executar, tabela do escopo,
+        # quantas statements abertas com enter() ele fecha ao acabar)
+        frames = [(iter(statements), symbol_table, 0)]
+        while frames:
+            statements, table, opened = frames[-1]
+            for node in statements:
+                cls = type(node)
+                # enter() devolve se a statement fica aberta até leave()
+                entered = 1 if enter is not None and enter(node) else 0
+                if cls is If:
+                    cond_type, cond_val = value(node.children[0], table)
+                    if cond_type != "bool":
+                        raise Exception("Condition in if must be boolean")
+                    if cond_val:
+                        node = node.children[1]
+                    elif len(node.children) == 3:
+                        node = node.children[2]
+                    else:
+                        if entered:
+                            leave(entered)
+                        continue
+                    cls = type(node)
+                    if enter is not None and enter(node):
+                        entered += 1
+                if cls is Assignment:
+                    expected_type, _ = table.get(node.value)
+                    var_type, var_value = value(node.children[0], table)
+                    if var_type != expected_type:
+                        raise Exception(f"Incompatible types: expected {expected_type}, got {var_type}")
+                    table.set(node.value, (var_type, var_value))
+                elif cls is CommandStmt:
+                    table.command(node.value)
+                elif cls is FuncCall:
+                    self.call(node, table)
+                elif cls is Return:
+                    # descarta os quadros abertos (blocos e laços) de uma vez
+                    return value(node.children[0], table) if node.children else None
+                elif cls is Block:
+                    local = table if table.parent is None else SymbolTable(parent=table)
+                    frames.append((iter(node.children), local, entered))
+                    break
+                elif cls is WhileStmt:
+                    frames.append((self.loop_while(node, table), table, entered))
+                    break
+                elif cls is ForStmt:
+                    start_type, start_val = value(node.children[0], table)
+                    end_type, end_val = value(node.children[1], table)
+                    if start_type != "int" or end_type != "int":
+                        raise Exception("For bounds must be integers")
+                    body = node.children[2].children
+                    if end_val >= start_val and all(type(stmt) is CommandStmt for stmt in body):
+                        # mesmo atalho de ForStmt.evaluate
+                        table.set(node.value, ("int", end_val))
+                        self.iterate(node, end_val - start_val + 1)
+                        table.repeat_commands(end_val - start_val + 1, [stmt.value for stmt in body])
+                    else:
+                        frames.append((self.loop_for(node, table, start_val, end_val), table, entered))
+                        break
+                elif cls is VarInit:
+                    if node.children:
+                        _, val = value(node.children[0], table)
+                    else:
+                        val = DEFAULTS[node.var_type]
+                    table.variables[node.value] = (node.var_type, val)
+                else:
+                    node.evaluate(table)
+                if entered:
+                    leave(entered)
+            else:
+                # o quadro acabou (um break acima empilhou um quadro novo)
+                frames.pop()
+                if opened:
+                    leave(opened)
+
+ENGINES = ("tree", "py", "vm", "async", "typed")
+
+def run_program(ast, symbol_table, engine="tree"):
+    if engine == "py":
+        import transpiler
+        transpiler.run(ast, symbol_table)
+        return
+    if engine == "vm":
+        import bytecode
+        bytecode.run(ast, symbol_table)
+        return
+    if engine == "async":
+        import aio
+        aio.run_table(ast, symbol_table)
+        return
+    if engine == "typed":
+        import typecheck
+        typecheck.run(ast, symbol_table)
+        return
+    interpreter = Interpreter()
+    interpreter.execute(ast, symbol_table)
+    # só chama main se ela existir
+    if "main" in symbol_table.variables:
+        interpreter.call(FuncCall("main", []), symbol_table)
+
+def run_stream(stream, symbol_table=None):
+    """
+    Executa cada statement de topo assim que ela é lida de `stream`;
+    a memória fica limitada à maior statement, não ao programa inteiro.
+    """
+    import typecheck
+    parser = Parser(StreamTokenizer(stream), symbol_table)
+    # os tipos das globais vêm de todas as statements, mas só as que
+    # declaram ou chamam funções são checadas
+    checker = typecheck.TypeChecker()
+    for stmt in parser.iter_program():
+        # sem olhar adiante: uma função precisa ser declarada antes de ser chamada
+        if link_functions(stmt, parser.functions):
+            errors = checker.check_statement(stmt)
+            if errors:
+                raise typecheck.TypeCheckError(errors)
+        else:
+            checker.collect(stmt)
+        # um Interpreter por statement: o cache de expressões não acumula
+        Interpreter().execute(stmt, parser.symbol_table)
+        parser.symbol_table.sink.flush()
+        sys.stdout.flush()
+    if "main" in parser.symbol_table.variables:
+        Interpreter().call(FuncCall("main", []), parser.symbol_table)
+
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        sys.stderr.write("Usage: python3 main.py <arquivo.go>\n")
-        sys.exit(1)
+    import argparse
+    import sinks
+    from sensors import parse_sensor_spec
+    # os backends fazem "from main import ...": reaproveita este módulo
+    sys.modules["main"] = sys.modules[__name__]
+    if sys.argv[1:2] == ["check"]:
+        # main.py check ARQUIVOS...: só valida, sem executar (check.py)
+        import check
+        sys.exit(check.cli(sys.argv[2:]))
+
+    argparser = argparse.ArgumentParser(description="Interpretador da DSL de controle de robô")
+    argparser.add_argument("file", help="programa .rbt (\"-\" lê da entrada padrão com --stream)")
+    argparser.add_argument("--engine", choices=ENGINES, default="tree",
+                           help="tree: interpretador de árvore; py: transpila para Python; "
+                                "vm: máquina de pilha com bytecode; async: corrotina asyncio; "
+                                "typed: checa os tipos antes e executa sem tags de tipo")
+    argparser.add_argument("--typecheck", action="store_true",
+                           help="checa os tipos do programa inteiro antes de executar")
+    argparser.add_argument("--stream", action="store_true",
+                           help="lê o programa aos poucos e executa cada statement de topo assim que chega")
+    argparser.add_argument("--no-cache", action="store_true",
+                           help="não lê nem grava o cache de programas analisados")
+    argparser.add_argument("--clear-cache", action="store_true",
+                           help="apaga o cache de programas analisados antes de rodar")
+    argparser.add_argument("--cache-dir", help="diretório do cache (padrão: ~/.cache/robolang)")
+    argparser.add_argument("-O", "--optimize", action="store_true",
+                           help="dobra constantes, remove ramos mortos, simplifica identidades "
+                                "e tira dos laços o que não muda neles")
+    argparser.add_argument("--opt-report", action="store_true",
+                           help="com -O, mostra em stderr quantos nós foram removidos")
+    argparser.add_argument("--emit-bytecode", metavar="OUT",
+                           help="compila para bytecode (.rbc) em OUT e não executa")
+    argparser.add_argument("--disasm", action="store_true",
+                           help="mostra o bytecode desmontado e não executa")
+    argparser.add_argument("--sensors", default="", metavar="POS=VALOR,...",
+                           help="leituras fixas dos sensores, ex.: front=wall,left=item (padrão: none)")
+    argparser.add_argument("--sensor-stats", action="store_true",
+                           help="mostra em stderr acertos e faltas do cache de sensores")
+    argparser.add_argument("--sink", choices=sorted(sinks.SINKS), default="text",
+                           help="formato de saída dos comandos: linhas de texto ou quadros binários")
+    argparser.add_argument("--batch-size", type=int, default=64,
+                           help="comandos acumulados antes de cada envio (padrão: 64)")
+    argparser.add_argument("--window", type=int, default=0,
+                           help="lotes em trânsito despachados por uma thread (0 = envio síncrono)")
+    argparser.add_argument("--repeat-frames", action="store_true",
+                           help="laços for só com comandos saem como um único quadro de repetição")
+    argparser.add_argument("--peephole", action="store_true",
+                           help="corta giros que se desfazem antes de enviar (e, com --repeat-frames, "
+                                "junta moveForward() seguidos)")
+    argparser.add_argument("--sink-stats", action="store_true",
+                           help="mostra em stderr vazão e profundidade da fila de comandos "
+                                "(e, com --peephole, as idas ao atuador economizadas)")
+    argparser.add_argument("--profile", action="store_true",
+                           help="mede execuções e tempo por nó, laço, comando e sensor; relatório em stderr")
+    argparser.add_argument("--profile-stacks", metavar="OUT",
+                           help="com --profile, arquivo de pilhas colapsadas (padrão: <arquivo>.folded)")
+    argparser.add_argument("--checkpoint", metavar="OUT",
+                           help="roda na VM gravando snapshots retomáveis (.rbs) em OUT; SIGTERM/SIGINT param com snapshot")
+    argparser.add_argument("--checkpoint-every", type=int, metavar="N",
+                           help="com --checkpoint, grava um snapshot a cada N instruções")
+    argparser.add_argument("--stop-after", type=int, metavar="N",
+                           help="com --checkpoint, para depois de N instruções deixando o snapshot")
+    argparser.add_argument("--watch", action="store_true",
+                           help="reexecuta o programa a cada gravação do arquivo, reanalisando só o trecho editado")
+    argparser.add_argument("--watch-interval", type=float, default=0.2, metavar="SEG",
+                           help="com --watch, intervalo entre as verificações do arquivo (padrão: 0.2)")
+    args = argparser.parse_args()
+    if args.watch and (args.stream or args.profile or args.optimize or args.emit_bytecode or args.disasm
+                       or args.checkpoint or not args.file.endswith(".rbt")):
+        argparser.error("--watch only runs a .rbt file, without --stream/--profile/-O/--disasm/--emit-bytecode/--checkpoint")
+    resuming = args.file.endswith(".rbs")
+    if (args.checkpoint_every or args.stop_after is not None) and not (args.checkpoint or resuming):
+        argparser.error("--checkpoint-every and --stop-after need --checkpoint")
+    if (args.checkpoint or resuming) and (args.engine not in ("tree", "vm") or args.stream or args.profile
+                                          or args.emit_bytecode or args.disasm):
+        argparser.error("checkpoints only run on the vm engine, without --stream/--profile/--disasm/--emit-bytecode")
+    if args.checkpoint_every is not None and args.checkpoint_every <= 0:
+        argparser.error("--checkpoint-every must be positive")
+    if args.stop_after is not None and args.stop_after < 0:
+        argparser.error("--stop-after must not be negative")
+    if args.profile and (args.engine != "tree" or args.stream or args.file.endswith(".rbc")):
+        argparser.error("--profile only runs the tree engine on a .rbt file, without --stream")
+    if args.stream and (args.engine != "tree" or args.optimize or args.emit_bytecode or args.disasm):
+        argparser.error("--stream only runs the tree engine, without -O/--disasm/--emit-bytecode")
 
-    with open(sys.argv[1], 'r') as f:
+    try:
+        provider = parse_sensor_spec(args.sensors)
+    except ValueError as e:
+        argparser.error(str(e))
+    def make_sink():
+        return sinks.SINKS[args.sink](batch_size=args.batch_size, window=args.window,
+                                      repeat_frames=args.repeat_frames, peephole=args.peephole)
+
+    def print_errors(error):
+        sys.stdout.flush()
+        # a checagem de tipos reporta todos os erros de uma vez
+        for msg in getattr(error, "errors", None) or [error]:
+            sys.stderr.write(f"Erro: {msg}\n")
+
+    if args.watch:
+        import watch
+
+        def run_watched(ast):
+            # cada execução começa com sink e sensores novos
+            sink = make_sink()
+            table = SymbolTable(sink=sink, sensors=provider)
+            error = None
+            try:
+                if args.typecheck:
+                    import typecheck
+                    errors = typecheck.check(ast)
+                    if errors:
+                        raise typecheck.TypeCheckError(errors)
+                run_program(ast, table, args.engine)
+            except Exception as e:
+                error = e
+            try:
+                sink.close()
+            except Exception as e:
+                error = error or e
+            if args.sink_stats:
+                sys.stderr.write(sink.report() + "\n")
+            if args.sensor_stats:
+                sys.stderr.write(table.sensors.report() + "\n")
+            if error is not None:
+                print_errors(error)
+            sys.stdout.flush()
+
+        watch.watch(args.file, run_watched, args.watch_interval)
+        sys.exit(0)
+
+    sink = make_sink()
+    symbol_table = SymbolTable(sink=sink, sensors=provider)
+
+    profile = None
+
+    def finish(error=None):
+        # comandos já emitidos saem antes da mensagem de erro
+        try:
+            sink.close()
+        except Exception as e:
+            error = error or e
+        if profile is not None:
+            sys.stderr.write(profile.report() + "\n")
+            profile.write_stacks(args.profile_stacks or args.file + ".folded")
+        if args.sink_stats:
+            sys.stderr.write(sink.report() + "\n")
+        if args.sensor_stats:
+            sys.stderr.write(symbol_table.sensors.report() + "\n")
+        if error is not None:
+            print_errors(error)
+            sys.exit(1)
+        sys.exit(0)
+
+    if args.stream:
+        try:
+            if args.file == "-":
+                run_stream(sys.stdin, symbol_table)
+            else:
+                with open(args.file, 'r') as f:
+                    run_stream(f, symbol_table)
+        except Exception as e:
+            finish(e)
+        finish()
+
+    def run_checkpointed(vm):
+        import checkpoint
+        if not checkpoint.run(vm, args.checkpoint or args.file, args.checkpoint_every, args.stop_after):
+            sys.stderr.write(f"checkpoint: parado em {vm.used} instruções, retome com {args.checkpoint or args.file}\n")
+
+    if resuming:
+        # snapshot de uma execução parada: continua na VM (e, por padrão,
+        # os próximos snapshots sobrescrevem o mesmo arquivo)
+        import checkpoint
+        try:
+            with open(args.file, 'rb') as f:
+                vm = checkpoint.restore(f.read(), symbol_table)
+            run_checkpointed(vm)
+        except Exception as e:
+            finish(e)
+        finish()
+
+    if args.file.endswith(".rbc"):
+        # programa já compilado: só a VM executa
+        import bytecode
+        try:
+            with open(args.file, 'rb') as f:
+                compiled = bytecode.Program.load(f.read())
+            if args.disasm:
+                print(bytecode.disassemble(compiled))
+            elif args.checkpoint:
+                run_checkpointed(bytecode.VM(compiled, symbol_table))
+            else:
+                bytecode.run(compiled, symbol_table)
+        except Exception as e:
+            finish(e)
+        finish()
+
+    program_cache = None
+    if args.clear_cache or not args.no_cache:
+        import cache
+        program_cache = cache.ProgramCache(args.cache_dir)
+        if args.clear_cache:
+            program_cache.clear()
+        if args.no_cache:
+            program_cache = None
+
+    with open(args.file, 'r') as f:
         raw_code = f.read()
 
-    clean_code = PrePro.filter(raw_code)
-
-    tokenizer = Tokenizer(clean_code)
-    
-    parser = Parser(tokenizer)
+    ast = program_cache.load(raw_code) if program_cache else None
 
     try:
-        ast = parser.parse()
-        ast.evaluate(parser.symbol_table)
-        # só chama main se ela existir
-        if "main" in parser.symbol_table.variables:
-            FuncCall("main", []).evaluate(parser.symbol_table)
+        if ast is None:
+            # comentários são tratados pelo próprio Tokenizer
+            ast = Parser(Tokenizer(raw_code), symbol_table).parse()
+            if program_cache:
+                try:
+                    program_cache.store(raw_code, ast)
+                except OSError as e:
+                    sys.stderr.write(f"Aviso: cache indisponível: {e}\n")
+        if args.typecheck:
+            import typecheck
+            errors = typecheck.check(ast)
+            if errors:
+                raise typecheck.TypeCheckError(errors)
+        if args.optimize:
+            import optimizer
+            ast, stats = optimizer.optimize(ast)
+            if args.opt_report:
+                sys.stderr.write(stats.report() + "\n")
+        if args.emit_bytecode or args.disasm:
+            import bytecode
+            compiled = bytecode.compile_program(ast)
+            if args.disasm:
+                print(bytecode.disassemble(compiled))
+            if args.emit_bytecode:
+                with open(args.emit_bytecode, 'wb') as f:
+                    f.write(compiled.dump())
+        elif args.profile:
+            import profiler
+            profile = profiler.Profiler(ast, raw_code)
+            profile.run(symbol_table)
+        elif args.checkpoint:
+            import bytecode
+            run_checkpointed(bytecode.VM(bytecode.compile_program(ast), symbol_table))
+        else:
+            run_program(ast, symbol_table, args.engine)
     except Exception as e:
-        sys.stderr.write(f"Erro: {e}\n")
-        sys.exit(1)
\ No newline at end of file
+        finish(e)
+    finish()
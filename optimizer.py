@@ -0,0 +1,545 @@
+"""
+Passo de otimização sobre a AST, executado entre Parser.parse() e a
+execução (qualquer engine):
+
+* dobra subárvores BinOp/UnOp só com literais em IntVal/StrVal/BoolVal;
+* remove ramos inalcançáveis de If/WhileStmt (e ForStmt com limites
+  literais vazios);
+* simplifica identidades como x * 1, x + 0, x && true quando o tipo de x
+  é conhecido;
+* tira de laços while/for as expressões que não mudam dentro deles
+  (`limite * 2 + offset`), calculadas uma vez numa variável antes do laço;
+* troca `i * c` repetido no corpo de um for pela variável de indução
+  derivada, que soma `c` a cada iteração.
+
+As dobras usam as regras de operador do interpretador (BinOp.apply e
+UnOp.apply), então a semântica é a mesma (inclusive divisão por zero = 0).
+Uma operação que falharia em tempo de execução não é dobrada: o erro
+continua acontecendo na hora certa.
+
+Pela mesma razão, só sai de um laço uma expressão que não pode falhar nem
+ter efeito: literais e variáveis com tipo conhecido, já declaradas com
+certeza antes do laço e não escritas dentro dele, combinadas por operadores
+cujos tipos batem. Ela pode então ser calculada antes do laço mesmo que ele
+não rode nenhuma vez. Sensores, Read e chamadas de função nunca são
+invariantes; uma chamada de função impura no laço (que pode escrever em
+globais) impede qualquer movimento de variáveis globais.
+"""
+from main import (Assignment, BinOp, Block, BoolVal, ForStmt, FuncCall,
+                  FuncDec, If, IntVal, StrVal, UnOp, Variable,
+                  VarInit, WhileStmt, trampoline)
+
+LITERALS = (IntVal, StrVal, BoolVal)
+LITERAL_FOR_TYPE = {"int": IntVal, "string": StrVal, "bool": BoolVal}
+LITERAL_TYPES = {cls: typ for typ, cls in LITERAL_FOR_TYPE.items()}
+
+# identidades: (operador, literal neutro, tipo exigido do outro operando, lados)
+# lados: "right" = só x op n; "both" = x op n e n op x
+IDENTITIES = [
+    ("+", ("int", 0), "int", "both"),
+    ("-", ("int", 0), "int", "right"),
+    ("*", ("int", 1), "int", "both"),
+    ("/", ("int", 1), "int", "right"),
+    ("+", ("string", ""), "string", "both"),
+    ("&&", ("bool", True), "bool", "both"),
+    ("||", ("bool", False), "bool", "both"),
+]
+
+
+# tipos dos operandos com que cada operador nunca falha
+# (divisão por zero dá 0; "+" com string converte o outro lado)
+SAFE_BINARY = {
+    "-": ("int",), "*": ("int",), "/": ("int",),
+    "&&": ("bool",), "||": ("bool",),
+}
+SAFE_UNARY = {"-": "int", "+": "int", "!": "bool"}
+RELATIONAL = ("==", "!=", ">", "<", ">=", "<=")
+# usos de i * c no corpo a partir dos quais a variável derivada compensa:
+# ela custa uma soma e uma atribuição por iteração
+MIN_REDUCED_USES = 2
+
+
+def count_nodes(node):
+    total = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        total += 1
+        stack.extend(child for child in node.children if child is not None)
+    return total
+
+
+class Optimizer:
+    def __init__(self):
+        self.var_types = {}
+        self.folded = 0
+        self.simplified = 0
+        self.branches = 0
+        self.removed = 0
+        self.hoisted = 0
+        self.reduced = 0
+        self.temps = 0
+        # id(expressão) -> (expressão, tipo estático); a referência ao nó
+        # impede que o id seja reaproveitado, como em Interpreter.postfix
+        self.types = {}
+
+    def optimize(self, program):
+        # os passos recursivos são geradores rodados por main.trampoline:
+        # `yield self.visit_expr(filho)` otimiza o filho sem usar a pilha do
+        # Python, então a profundidade do programa só é limitada pela memória
+        before = count_nodes(program)
+        self.collect_types(program)
+        program = trampoline(self.visit_stmt(program))
+        if program is None:
+            program = Block([])
+        self.removed = before - count_nodes(program)
+        trampoline(self.loops_Block(program, set(), False))
+        return program
+
+    def report(self):
+        return (f"optimizer: {self.removed} nodes removed "
+                f"({self.folded} folded, {self.simplified} simplified, "
+                f"{self.branches} dead branches), "
+                f"{self.hoisted} loop invariants hoisted, "
+                f"{self.reduced} induction expressions reduced")
+
+    # ------------------------------------------------------------------
+    # tipos estáticos
+    # ------------------------------------------------------------------
+    def collect_types(self, program):
+        # tipo de uma variável só é conhecido se todas as declarações concordam
+        stack = [program]
+        while stack:
+            node = stack.pop()
+            kind = type(node).__name__
+            if kind in ("VarInit", "VarDec"):
+                self.add_type(node.value, node.var_type)
+            elif kind == "ForStmt":
+                self.add_type(node.value, "int")
+            stack.extend(child for child in node.children if child is not None)
+
+    def add_type(self, name, var_type):
+        if self.var_types.get(name, var_type) != var_type:
+            var_type = None
+        self.var_types[name] = var_type
+
+    def static_type(self, node):
+        # só o tipo de "+" depende dos operandos: as cadeias de "+" são
+        # resolvidas de baixo para cima com uma pilha, e cada nó uma vez só
+        entry = self.types.get(id(node))
+        if entry is not None:
+            return entry[1]
+        stack = [node]
+        while stack:
+            top = stack[-1]
+            if type(top) is BinOp and top.value == "+":
+                pending = [child for child in top.children if id(child) not in self.types]
+                if pending:
+                    stack.extend(pending)
+                    continue
+            stack.pop()
+            self.types[id(top)] = (top, self.node_type(top))
+        return self.types[id(node)][1]
+
+    def node_type(self, node):
+        # tipo de `node` com os operandos de "+" já em self.types
+        kind = type(node).__name__
+        if kind == "IntVal" or kind == "Read":
+            return "int"
+        if kind == "StrVal" or kind == "SensorAccess":
+            return "string"
+        if kind == "BoolVal":
+            return "bool"
+        if kind == "Variable":
+            return self.var_types.get(node.value)
+        if kind == "UnOp":
+            return "bool" if node.value == "!" else "int"
+        if kind == "BinOp":
+            if node.value in ("-", "*", "/"):
+                return "int"
+            if node.value == "+":
+                left = self.types[id(node.children[0])][1]
+                right = self.types[id(node.children[1])][1]
+                if left == "string" or right == "string":
+                    return "string"
+                if left == right == "int":
+                    return "int"
+                return None
+            return "bool"
+        return None
+
+    # ------------------------------------------------------------------
+    # statements: devolvem o nó (possivelmente novo) ou None para remover
+    # ------------------------------------------------------------------
+    def visit_stmt(self, node):
+        method = getattr(self, "stmt_" + type(node).__name__, None)
+        if method is None:
+            yield self.visit_children(node)
+            return node
+        return (yield method(node))
+
+    def visit_children(self, node):
+        for i, child in enumerate(node.children):
+            if child is not None:
+                node.children[i] = yield self.visit_expr(child)
+
+    def stmt_Block(self, node):
+        stmts = []
+        for stmt in node.children:
+            stmt = yield self.visit_stmt(stmt)
+            if stmt is not None:
+                stmts.append(stmt)
+        node.children = stmts
+        return node
+
+    def stmt_If(self, node):
+        cond = yield self.visit_expr(node.children[0])
+        node.children[0] = cond
+        node.children[1] = yield self.visit_stmt(node.children[1])
+        if len(node.children) == 3:
+            node.children[2] = yield self.visit_stmt(node.children[2])
+        if isinstance(cond, BoolVal):
+            self.branches += 1
+            if cond.value:
+                return node.children[1]
+            if len(node.children) == 3:
+                return node.children[2]
+            return None
+        return node
+
+    def stmt_WhileStmt(self, node):
+        cond = yield self.visit_expr(node.children[0])
+        node.children[0] = cond
+        if isinstance(cond, BoolVal) and not cond.value:
+            self.branches += 1
+            return None
+        node.children[1] = yield self.visit_stmt(node.children[1])
+        return node
+
+    def stmt_ForStmt(self, node):
+        start = node.children[0] = yield self.visit_expr(node.children[0])
+        end = node.children[1] = yield self.visit_expr(node.children[1])
+        if isinstance(start, IntVal) and isinstance(end, IntVal) and start.value > end.value:
+            # laço vazio: nem a variável de iteração é atribuída
+            self.branches += 1
+            return None
+        node.children[2] = yield self.visit_stmt(node.children[2])
+        return node
+
+    def stmt_FuncDec(self, node):
+        node.children[-1] = (yield self.visit_stmt(node.children[-1])) or Block([])
+        return node
+
+    # ------------------------------------------------------------------
+    # expressões
+    # ------------------------------------------------------------------
+    def visit_expr(self, node):
+        if isinstance(node, BinOp):
+            return (yield self.fold_binop(node))
+        if isinstance(node, UnOp):
+            return (yield self.fold_unop(node))
+        yield self.visit_children(node)
+        return node
+
+    def literal(self, node):
+        # filhos já são literais: as mesmas regras de BinOp/UnOp, sem tabela
+        operands = [(LITERAL_TYPES[type(child)], child.value) for child in node.children]
+        try:
+            if type(node) is BinOp:
+                typ, val = BinOp.apply(node.value, *operands)
+            else:
+                typ, val = UnOp.apply(node.value, *operands)
+        except Exception:
+            # falharia em tempo de execução: mantém para o erro acontecer lá
+            return node
+        self.folded += 1
+        return LITERAL_FOR_TYPE[typ](val)
+
+    def fold_binop(self, node):
+        yield self.visit_children(node)
+        left, right = node.children
+        if isinstance(left, LITERALS) and isinstance(right, LITERALS):
+            return self.literal(node)
+        for op, (lit_type, neutral), other_type, sides in IDENTITIES:
+            if node.value != op:
+                continue
+            if self.is_literal(right, lit_type, neutral) and self.static_type(left) == other_type:
+                self.simplified += 1
+                return left
+            if (sides == "both" and self.is_literal(left, lit_type, neutral)
+                    and self.static_type(right) == other_type):
+                self.simplified += 1
+                return right
+        return node
+
+    def fold_unop(self, node):
+        yield self.visit_children(node)
+        operand = node.children[0]
+        if isinstance(operand, LITERALS):
+            return self.literal(node)
+        # !!x == x e -(-x) == x quando o tipo já é o exigido pelo operador
+        if isinstance(operand, UnOp) and operand.value == node.value and node.value in ("!", "-"):
+            inner = operand.children[0]
+            if self.static_type(inner) == ("bool" if node.value == "!" else "int"):
+                self.simplified += 1
+                return inner
+        if node.value == "+" and self.static_type(operand) == "int":
+            self.simplified += 1
+            return operand
+        return node
+
+    @staticmethod
+    def is_literal(node, typ, value):
+        cls = LITERAL_FOR_TYPE[typ]
+        return type(node) is cls and node.value == value and type(node.value) is type(value)
+
+    # ------------------------------------------------------------------
+    # laços: código invariante e redução de força
+    # ------------------------------------------------------------------
+    # `defined`: variáveis declaradas com certeza no ponto atual (VarInit
+    # fora de if/laço, ou parâmetros dentro de funções). Ao descer para um
+    # bloco o conjunto é copiado: o que é declarado lá dentro não vale fora.
+    def loops_Block(self, block, defined, in_function):
+        stmts = []
+        for stmt in block.children:
+            cls = type(stmt)
+            if cls is WhileStmt or cls is ForStmt:
+                stmts.extend((yield self.move_invariants(stmt, defined, in_function)))
+                inner = set(defined)
+                if cls is ForStmt and (not in_function or stmt.value in defined):
+                    # numa função, a variável de iteração não declarada
+                    # antes é global (uma chamada pode escrever nela)
+                    inner.add(stmt.value)
+                yield self.loops_Block(stmt.children[-1], inner, in_function)
+                continue
+            if cls is If:
+                for branch in stmt.children[1:]:
+                    yield self.loops_Block(branch, set(defined), in_function)
+            elif cls is Block:
+                yield self.loops_Block(stmt, set(defined), in_function)
+            elif cls is FuncDec:
+                yield self.loops_Block(stmt.children[-1], set(stmt.params), True)
+            elif cls is VarInit:
+                defined.add(stmt.value)
+            stmts.append(stmt)
+        block.children = stmts
+
+    def move_invariants(self, loop, defined, in_function):
+        """Devolve as declarações a pôr antes de `loop`, seguidas do próprio laço."""
+        written, impure = self.writes(loop)
+        if impure and not in_function:
+            # a função chamada pode mudar qualquer global
+            return [loop]
+        # com impure dentro de uma função, `defined` só tem locais, que a
+        # função chamada não alcança
+        invariant = defined - written
+        temps = {}
+        # o for avalia os limites uma vez só: só o corpo importa
+        first = len(loop.children) - 1 if type(loop) is ForStmt else 0
+        for i in range(first, len(loop.children)):
+            part = loop.children[i]
+            if (yield self.lift(part, invariant, temps)) and type(part) in (BinOp, UnOp):
+                # a condição inteira do while não muda
+                loop.children[i] = self.temp_for(part, temps)
+        decs = list(temps.values())
+        for dec in decs:
+            defined.add(dec.value)
+        if type(loop) is ForStmt and not impure:
+            decs.extend((yield self.reduce_induction(loop, defined, written)))
+        decs.append(loop)
+        return decs
+
+    def writes(self, node):
+        """(nomes escritos em `node`, se há chamada de função impura)."""
+        written = set()
+        impure = False
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            cls = type(node)
+            if cls is Assignment or cls is VarInit or cls is ForStmt:
+                written.add(node.value)
+            elif cls is FuncCall and (node.func is None or not node.func.pure):
+                impure = True
+            stack.extend(child for child in node.children if child is not None)
+        return written, impure
+
+    def lift(self, node, invariant, temps):
+        """
+        True se `node` é uma expressão invariante segura; senão troca os
+        filhos invariantes (BinOp/UnOp) por variáveis temporárias.
+        """
+        cls = type(node)
+        if cls in LITERALS:
+            return True
+        if cls is Variable:
+            return node.value in invariant and self.var_types.get(node.value) is not None
+        flags = []
+        for child in node.children:
+            flags.append(child is not None and (yield self.lift(child, invariant, temps)))
+        if (cls is BinOp or cls is UnOp) and all(flags) and self.safe_type(node) is not None:
+            return True
+        for i, child in enumerate(node.children):
+            if flags[i] and type(child) in (BinOp, UnOp):
+                node.children[i] = self.temp_for(child, temps)
+        return False
+
+    def safe_type(self, node):
+        """Tipo de uma BinOp/UnOp de operandos invariantes, ou None se ela pode falhar."""
+        if type(node) is UnOp:
+            typ = SAFE_UNARY.get(node.value)
+            return typ if typ is not None and self.static_type(node.children[0]) == typ else None
+        left = self.static_type(node.children[0])
+        right = self.static_type(node.children[1])
+        if left is None or right is None:
+            return None
+        op = node.value
+        if op == "+":
+            if left == right == "int" or "string" in (left, right):
+                return self.static_type(node)
+            return None
+        if op in RELATIONAL:
+            return "bool" if left == right else None
+        if left == right and left in SAFE_BINARY.get(op, ()):
+            return left
+        return None
+
+    def temp_for(self, expr, temps):
+        # expressões iguais no mesmo laço dividem a mesma variável
+        key = self.shape(expr)
+        dec = temps.get(key)
+        if dec is None:
+            dec = self.declare_temp("_inv", self.safe_type(expr), expr)
+            temps[key] = dec
+            self.hoisted += 1
+        var = Variable(dec.value)
+        var.pos = expr.pos
+        return var
+
+    def declare_temp(self, prefix, var_type, expr):
+        # o Tokenizer não aceita nomes começando com "_": não colide com o programa
+        self.temps += 1
+        dec = VarInit(f"{prefix}{self.temps}", var_type, expr)
+        dec.pos = expr.pos
+        self.var_types[dec.value] = var_type
+        return dec
+
+    @staticmethod
+    def shape(node):
+        # pré-ordem com o número de filhos: uma tupla plana, sem aninhar
+        key = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            children = [child for child in node.children if child is not None]
+            key.append((type(node).__name__, node.value, len(children)))
+            stack.extend(reversed(children))
+        return tuple(key)
+
+    def reduce_induction(self, loop, defined, written):
+        """
+        i * c (ou c * i) com c invariante, repetido no corpo do for, vira uma
+        variável que começa em início * c e soma c no fim de cada iteração.
+        Devolve as declarações dessas variáveis.
+        """
+        name = loop.value
+        start, _, body = loop.children
+        if name in self.writes(body)[0]:
+            return []
+        # o início é avaliado de novo antes do laço: não pode falhar nem ter efeito
+        if self.static_type(start) != "int" or not self.speculable(start, defined):
+            return []
+        invariant = defined - written
+        uses = {}
+        stack = [body]
+        while stack:
+            node = stack.pop()
+            for i, child in enumerate(node.children):
+                if child is None:
+                    continue
+                step = self.induction_step(child, name, invariant)
+                if step is not None:
+                    uses.setdefault(self.shape(step), []).append((node, i, step))
+                else:
+                    stack.append(child)
+        decs = []
+        for found in uses.values():
+            if len(found) < MIN_REDUCED_USES:
+                continue
+            step = found[0][2]
+            dec = self.declare_temp("_iv", "int", BinOp("*", self.copy_expr(start), self.copy_expr(step)))
+            dec.children[0] = yield self.fold_binop(dec.children[0])
+            for node, i, _ in found:
+                var = Variable(dec.value)
+                var.pos = node.children[i].pos
+                node.children[i] = var
+            update = Assignment(dec.value, BinOp("+", Variable(dec.value), self.copy_expr(step)))
+            update.pos = loop.pos
+            body.children.append(update)
+            decs.append(dec)
+            self.reduced += len(found)
+        return decs
+
+    def induction_step(self, node, name, invariant):
+        """`c` se `node` é i * c ou c * i com c literal ou variável invariante int."""
+        if type(node) is not BinOp or node.value != "*":
+            return None
+        left, right = node.children
+        if type(left) is Variable and left.value == name:
+            step = right
+        elif type(right) is Variable and right.value == name:
+            step = left
+        else:
+            return None
+        if type(step) is IntVal or (type(step) is Variable and step.value in invariant
+                                    and self.var_types.get(step.value) == "int"):
+            return step
+        return None
+
+    def speculable(self, node, names):
+        """Como lift, sem trocar nada: `node` não falha e só lê `names`?"""
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            cls = type(node)
+            if cls in LITERALS:
+                continue
+            if cls is Variable:
+                if node.value not in names or self.var_types.get(node.value) is None:
+                    return False
+            elif (cls is BinOp or cls is UnOp) and self.safe_type(node) is not None:
+                stack.extend(node.children)
+            else:
+                return False
+        return True
+
+    @staticmethod
+    def copy_expr(expr):
+        # pré-ordem com o filho da direita primeiro; invertida, é a pós-ordem
+        # (como em Interpreter.flatten) e as cópias dos filhos ficam na pilha
+        order = []
+        stack = [expr]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(node.children)
+        copies = []
+        for node in reversed(order):
+            cls = type(node)
+            if cls is BinOp:
+                right = copies.pop()
+                copy = BinOp(node.value, copies.pop(), right)
+            elif cls is UnOp:
+                copy = UnOp(node.value, copies.pop())
+            else:
+                # Variable ou literal
+                copy = cls(node.value)
+            copy.pos = node.pos
+            copies.append(copy)
+        return copies[0]
+
+
+def optimize(program):
+    """Otimiza `program` no lugar; devolve (programa, Optimizer com estatísticas)."""
+    optimizer = Optimizer()
+    return optimizer.optimize(program), optimizer
@@ -0,0 +1,260 @@
+"""
+Profiler de execução para o interpretador de árvore (--profile).
+
+Conta execuções e tempo (total e próprio) de cada statement e de cada
+expressão avaliada, iterações de cada laço, chamadas de função e cada
+comando/leitura de sensor, usando as posições que o parser guarda em
+`Node.pos`. No fim gera um relatório de pontos quentes ordenado por tempo
+total e um arquivo de pilhas colapsadas ("a;b;c 123"), o formato lido por
+flamegraph.pl, speedscope e afins.
+
+O programa roda no mesmo main.Interpreter do tree engine, por uma subclasse
+(ProfiledInterpreter) que só implementa os ganchos do Interpreter: o laço de
+despacho é o mesmo, sem recursão, então a profundidade do programa continua
+limitada só pela memória. As expressões são medidas inteiras (o Interpreter as achata em
+instruções pós-fixas), não por subexpressão. Com --profile desligado nada
+disso é usado: o tree engine roda o Interpreter sem nenhuma checagem a mais,
+e o custo é só o atributo `pos` nos nós.
+
+Uso:
+    prof = Profiler(program, source)
+    prof.run(table)
+    sys.stderr.write(prof.report())
+    prof.write_stacks("programa.folded")
+"""
+import bisect
+import time
+
+import main
+
+class NodeStats:
+    __slots__ = ("label", "count", "total", "own", "iterations", "active")
+
+    def __init__(self, label):
+        self.label = label
+        self.count = 0
+        self.total = 0      # ns, sem contar chamadas recursivas duas vezes
+        self.own = 0        # ns, descontando os filhos
+        self.iterations = 0
+        self.active = 0
+
+
+class ProfiledInterpreter(main.Interpreter):
+    """
+    main.Interpreter com um ponto de medição por statement, expressão e
+    chamada. As statements compostas (Block, If, laços) ficam abertas no
+    profiler enquanto o quadro delas estiver na pilha do run().
+    """
+    def __init__(self, profiler):
+        super().__init__()
+        self.profiler = profiler
+
+    def value(self, expr, table):
+        if type(expr) is main.FuncCall:
+            # medida em call()
+            return super().value(expr, table)
+        prof = self.profiler
+        prof.enter(prof.node_stats(expr))
+        try:
+            return super().value(expr, table)
+        finally:
+            prof.leave()
+
+    def call(self, node, table):
+        prof = self.profiler
+        prof.enter(prof.node_stats(node))
+        try:
+            return super().call(node, table)
+        finally:
+            prof.leave()
+
+    def iterate(self, loop, count=1):
+        self.profiler.node_stats(loop).iterations += count
+
+    def enter(self, node):
+        if type(node) is main.FuncCall:
+            # medida em call()
+            return False
+        prof = self.profiler
+        prof.enter(prof.node_stats(node))
+        return True
+
+    def leave(self, count):
+        for _ in range(count):
+            self.profiler.leave()
+
+    def run(self, statements, symbol_table):
+        """Interpreter.run, fechando no fim o que um return ou erro deixou aberto."""
+        prof = self.profiler
+        opened = len(prof.frames)
+        try:
+            return super().run(statements, symbol_table)
+        finally:
+            # return, ou erro no meio de blocos e laços abertos
+            while len(prof.frames) > opened:
+                prof.leave()
+
+
+class Profiler:
+    def __init__(self, program, source=None, clock=time.perf_counter_ns):
+        self.program = program
+        self.source = source
+        self.clock = clock
+        self.stats = {}
+        self.stacks = {}
+        # pilha de [stats, início, tempo dos filhos, chave da pilha colapsada]
+        self.frames = []
+        self.originals = {}
+        self.lines = None
+        if source is not None:
+            self.lines = [0]
+            self.lines.extend(i + 1 for i, char in enumerate(source) if char == "\n")
+
+    # ------------------------------------------------------------------
+    # rótulos
+    # ------------------------------------------------------------------
+    def location(self, pos):
+        if pos is None:
+            return None
+        if self.lines is None:
+            return f"@{pos}"
+        line = bisect.bisect_right(self.lines, pos)
+        return f"{line}:{pos - self.lines[line - 1] + 1}"
+
+    def label(self, node):
+        kind = type(node).__name__
+        if node is self.program:
+            return "<program>"
+        if kind in ("CommandStmt", "SensorAccess", "Variable", "Assignment",
+                    "VarInit", "ForStmt", "BinOp", "UnOp", "FuncDec", "FuncCall"):
+            kind = f"{kind}({node.value})"
+        where = self.location(node.pos)
+        return f"{kind} {where}" if where else kind
+
+    def stats_for(self, key, label):
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = NodeStats(label)
+        return stats
+
+    def node_stats(self, node):
+        stats = self.stats.get(id(node))
+        if stats is None:
+            stats = self.stats[id(node)] = NodeStats(self.label(node))
+        return stats
+
+    # ------------------------------------------------------------------
+    # medição
+    # ------------------------------------------------------------------
+    def enter(self, stats):
+        stats.count += 1
+        stats.active += 1
+        parent = self.frames[-1][3] if self.frames else ()
+        self.frames.append([stats, self.clock(), 0, parent + (stats.label,)])
+
+    def leave(self):
+        stats, start, children, key = self.frames.pop()
+        elapsed = self.clock() - start
+        stats.active -= 1
+        if not stats.active:
+            stats.total += elapsed
+        stats.own += elapsed - children
+        self.stacks[key] = self.stacks.get(key, 0) + elapsed - children
+        if self.frames:
+            self.frames[-1][2] += elapsed
+
+    def wrap_call(self, method, kind):
+        prof = self
+
+        def call_profiled(table, *args):
+            if kind == "repeat":
+                # o atalho do for só com comandos: as iterações acontecem no
+                # sink e são contadas em ProfiledInterpreter.iterate
+                count, names = args
+                label = f"repeat {count}x({','.join(names)})"
+            else:
+                label = f"{kind}:{args[0]}"
+            prof.enter(prof.stats_for(label, label))
+            try:
+                return method(table, *args)
+            finally:
+                prof.leave()
+        return call_profiled
+
+    # ------------------------------------------------------------------
+    # instalação
+    # ------------------------------------------------------------------
+    def install(self):
+        for name, kind in (("command", "command"), ("read_sensor", "sensor"),
+                           ("repeat_commands", "repeat")):
+            method = main.SymbolTable.__dict__[name]
+            self.originals[main.SymbolTable, name] = method
+            setattr(main.SymbolTable, name, self.wrap_call(method, kind))
+
+    def uninstall(self):
+        for (cls, name), method in self.originals.items():
+            setattr(cls, name, method)
+        self.originals.clear()
+
+    def run(self, symbol_table):
+        """Roda o programa como main.run_program, no ProfiledInterpreter."""
+        with self:
+            interpreter = ProfiledInterpreter(self)
+            interpreter.execute(self.program, symbol_table)
+            if "main" in symbol_table.variables:
+                interpreter.call(main.FuncCall("main", []), symbol_table)
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *exc):
+        self.uninstall()
+        return False
+
+    # ------------------------------------------------------------------
+    # saída
+    # ------------------------------------------------------------------
+    def report(self, limit=20):
+        """Relatório de pontos quentes (tempos em ms), pronto para stderr."""
+        def ms(ns):
+            return f"{ns / 1e6:10.3f}"
+
+        rows = sorted(self.stats.values(), key=lambda s: (-s.total, s.label))
+        lines = ["profile: pontos quentes (por tempo total)",
+                 f"{'count':>10} {'total ms':>10} {'own ms':>10}  node"]
+        for stats in rows[:limit]:
+            lines.append(f"{stats.count:10d} {ms(stats.total)} {ms(stats.own)}  {stats.label}")
+
+        loops = sorted((s for s in self.stats.values() if s.iterations),
+                       key=lambda s: (-s.total, s.label))
+        if loops:
+            lines.append("profile: laços")
+            lines.append(f"{'iters':>10} {'total ms':>10} {'us/iter':>10}  loop")
+            for stats in loops:
+                per_iteration = stats.total / stats.iterations / 1e3
+                lines.append(f"{stats.iterations:10d} {ms(stats.total)} {per_iteration:10.3f}  {stats.label}")
+
+        calls = sorted((s for key, s in self.stats.items() if isinstance(key, str)),
+                       key=lambda s: (-s.total, s.label))
+        if calls:
+            lines.append("profile: comandos e sensores")
+            lines.append(f"{'count':>10} {'total ms':>10}  call")
+            for stats in calls:
+                lines.append(f"{stats.count:10d} {ms(stats.total)}  {stats.label}")
+        return "\n".join(lines)
+
+    def collapsed_stacks(self):
+        """Linhas "quadro;quadro;... tempo_us" (tempo próprio de cada pilha)."""
+        lines = []
+        for key, ns in sorted(self.stacks.items()):
+            us = ns // 1000
+            if us:
+                frames = ";".join(label.replace(";", ",") for label in key)
+                lines.append(f"{frames} {us}")
+        return lines
+
+    def write_stacks(self, path):
+        with open(path, "w") as f:
+            for line in self.collapsed_stacks():
+                f.write(line + "\n")
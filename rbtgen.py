@@ -0,0 +1,281 @@
+"""
+Gerador de programas .rbt sintéticos para benchmarks e testes de estresse.
+
+Os programas saem da própria gramática (ver README): cada produção vira uma
+função que sorteia uma alternativa com um `random.Random` semeado, então a
+mesma semente gera sempre o mesmo programa. Os programas gerados são
+válidos e bem tipados, e todo laço termina:
+
+* commands: uma lista longa de comandos em linha reta;
+* nested:   blocos, ifs e expressões aninhados em profundidade;
+* loops:    laços for/while longos com aritmética no corpo;
+* sensors:  laços que leem os sensores a cada iteração e decidem por eles;
+* mixed:    sentenças sorteadas livremente da gramática.
+
+O crescimento dos inteiros fica limitado: `*` só aparece entre literais e
+`/` só divide por literais, então nenhum laço gera inteiros enormes.
+
+Uso:
+    python3 rbtgen.py commands --size 100000 --seed 1 -o grande.rbt
+    python3 rbtgen.py nested --depth 40 | python3 main.py --stream -
+"""
+import argparse
+import random
+import sys
+
+COMMANDS = ("moveForward", "turnLeft", "turnRight", "pick", "drop")
+SENSOR_POSITIONS = ("front", "left", "right", "back")
+SENSOR_VALUES = ("wall", "item", "none")
+RELATIONAL = ("==", "!=", "<", ">", "<=", ">=")
+TYPES = ("int", "bool", "string")
+
+
+class Generator:
+    """
+    Gera o texto de um programa. `size` controla o número de sentenças,
+    `depth` a profundidade de blocos/expressões e `iterations` quantas vezes
+    cada laço roda.
+    """
+    def __init__(self, seed=0, size=1000, depth=8, iterations=100, variables=4):
+        self.rng = random.Random(seed)
+        self.size = size
+        self.depth = depth
+        self.iterations = iterations
+        self.variables = {typ: [f"{typ[0]}{i}" for i in range(variables)] for typ in TYPES}
+        self.counters = []
+        self.loop_depth = 0
+        self.lines = []
+        self.indent = 0
+
+    # ------------------------------------------------------------------
+    # saída
+    # ------------------------------------------------------------------
+    def emit(self, text):
+        self.lines.append("    " * self.indent + text)
+
+    def open_block(self, header):
+        self.emit(header + " {")
+        self.indent += 1
+
+    def close_block(self, suffix=""):
+        self.indent -= 1
+        self.emit("}" + suffix)
+
+    def text(self):
+        header = [f"var {name}: int;" for name in self.counters]
+        return "\n".join(header + self.lines) + "\n"
+
+    def declarations(self):
+        for typ, names in self.variables.items():
+            for name in names:
+                self.emit(f"var {name}: {typ};")
+
+    def counter(self):
+        # variável de controle de laço: nenhum outro código a altera
+        name = f"k{len(self.counters)}"
+        self.counters.append(name)
+        return name
+
+    # ------------------------------------------------------------------
+    # expressões
+    # ------------------------------------------------------------------
+    def expr(self, typ, depth):
+        return getattr(self, "expr_" + typ)(depth)
+
+    def expr_int(self, depth):
+        rng = self.rng
+        if depth <= 0:
+            return rng.choice((str(rng.randint(0, 99)), rng.choice(self.variables["int"])))
+        choice = rng.randrange(5)
+        if choice == 0:
+            return f"({self.expr_int(depth - 1)} + {self.expr_int(depth - 1)})"
+        if choice == 1:
+            return f"({self.expr_int(depth - 1)} - {self.expr_int(depth - 1)})"
+        if choice == 2:
+            return f"({rng.randint(0, 9)} * {rng.randint(0, 9)})"
+        if choice == 3:
+            return f"({self.expr_int(depth - 1)} / {rng.randint(1, 9)})"
+        return f"-{self.expr_int(depth - 1)}"
+
+    def expr_bool(self, depth):
+        rng = self.rng
+        if depth <= 0:
+            return rng.choice(("true", "false", rng.choice(self.variables["bool"])))
+        choice = rng.randrange(5)
+        if choice == 0:
+            return f"{self.expr_int(depth - 1)} {rng.choice(RELATIONAL)} {self.expr_int(depth - 1)}"
+        if choice == 1:
+            op = rng.choice(("&&", "||"))
+            return f"({self.expr_bool(depth - 1)} {op} {self.expr_bool(depth - 1)})"
+        if choice == 2:
+            return f"!({self.expr_bool(depth - 1)})"
+        if choice == 3:
+            return f"{self.expr_string(0)} {rng.choice(('==', '!='))} \"{rng.choice(SENSOR_VALUES)}\""
+        return f"({self.expr_bool(depth - 1)})"
+
+    def chain_int(self, depth):
+        # expressão com `depth` níveis de parênteses, mas tamanho linear
+        expr = self.expr_int(0)
+        for _ in range(depth):
+            op = self.rng.choice(("+", "-", "/"))
+            operand = str(self.rng.randint(1, 9)) if op == "/" else self.expr_int(0)
+            expr = f"({expr} {op} {operand})" if self.rng.random() < 0.8 else f"-({expr})"
+        return expr
+
+    def expr_string(self, depth):
+        rng = self.rng
+        if depth <= 0:
+            choice = rng.randrange(3)
+            if choice == 0:
+                return f"\"{rng.choice(SENSOR_VALUES)}\""
+            if choice == 1:
+                return f"sensor.{rng.choice(SENSOR_POSITIONS)}"
+            return rng.choice(self.variables["string"])
+        # o lado esquerdo nunca é variável: strings não crescem dentro de laços
+        left = rng.choice((f"\"{rng.choice(SENSOR_VALUES)}\"", f"sensor.{rng.choice(SENSOR_POSITIONS)}"))
+        return f"{left} + {self.expr(rng.choice(TYPES), 0)}"
+
+    # ------------------------------------------------------------------
+    # sentenças
+    # ------------------------------------------------------------------
+    def command(self):
+        self.emit(f"{self.rng.choice(COMMANDS)}();")
+
+    def assignment(self, depth):
+        typ = self.rng.choice(TYPES)
+        if typ == "string":
+            depth = min(depth, 1)
+        self.emit(f"{self.rng.choice(self.variables[typ])} = {self.expr(typ, depth)};")
+
+    def if_stmt(self, depth):
+        self.open_block(f"if ({self.expr_bool(min(depth, 3))})")
+        self.statements(self.rng.randint(1, 3), depth - 1)
+        if self.rng.random() < 0.5:
+            self.close_block(" else {")
+            self.indent += 1
+            self.statements(self.rng.randint(1, 3), depth - 1)
+        self.close_block()
+
+    def for_stmt(self, depth, iterations=None):
+        iterations = iterations or self.rng.randint(1, max(1, self.iterations))
+        self.open_block(f"for {self.counter()} = 1 to {iterations}")
+        self.loop_depth += 1
+        self.statements(self.rng.randint(1, 3), depth - 1)
+        self.loop_depth -= 1
+        self.close_block()
+
+    def while_stmt(self, depth, iterations=None):
+        iterations = iterations or self.rng.randint(1, max(1, self.iterations))
+        name = self.counter()
+        self.emit(f"{name} = 0;")
+        self.open_block(f"while ({name} < {iterations})")
+        self.emit(f"{name} = {name} + 1;")
+        self.loop_depth += 1
+        self.statements(self.rng.randint(1, 3), depth - 1)
+        self.loop_depth -= 1
+        self.close_block()
+
+    def statement(self, depth):
+        choice = self.rng.randrange(6) if depth > 0 else self.rng.randrange(2)
+        if choice >= 4 and self.loop_depth:
+            # laços aninhados multiplicam as iterações: só um nível de laço
+            choice = self.rng.randrange(2)
+        if choice == 0:
+            self.command()
+        elif choice == 1:
+            self.assignment(min(depth, 3))
+        elif choice == 2:
+            self.if_stmt(depth)
+        elif choice == 3:
+            self.emit("{")
+            self.indent += 1
+            self.statements(self.rng.randint(1, 3), depth - 1)
+            self.close_block()
+        elif choice == 4:
+            self.for_stmt(depth)
+        else:
+            self.while_stmt(depth)
+
+    def statements(self, count, depth):
+        for _ in range(count):
+            self.statement(depth)
+
+    # ------------------------------------------------------------------
+    # formatos de programa
+    # ------------------------------------------------------------------
+    def commands(self):
+        for _ in range(self.size):
+            self.command()
+        return self.text()
+
+    def nested(self):
+        self.declarations()
+        for _ in range(max(1, self.size // (self.depth * 2))):
+            for level in range(self.depth):
+                self.open_block(f"if ({self.expr_bool(2)} || true)" if level % 2 else f"for {self.counter()} = 1 to 1")
+            self.emit(f"i0 = {self.chain_int(self.depth)};")
+            self.emit(f"b0 = {self.chain_int(self.depth)} < {self.chain_int(self.depth)};")
+            self.command()
+            for _ in range(self.depth):
+                self.close_block()
+        return self.text()
+
+    def loops(self):
+        self.declarations()
+        for _ in range(max(1, self.size // 10)):
+            if self.rng.random() < 0.5:
+                self.for_stmt(2, self.iterations)
+            else:
+                self.while_stmt(2, self.iterations)
+        return self.text()
+
+    def sensors(self):
+        self.declarations()
+        for _ in range(max(1, self.size // 10)):
+            name = self.counter()
+            self.emit(f"{name} = 0;")
+            self.open_block(f"while ({name} < {self.iterations})")
+            self.emit(f"{name} = {name} + 1;")
+            pos = self.rng.choice(SENSOR_POSITIONS)
+            self.emit(f"s0 = sensor.{pos};")
+            self.open_block(f"if (s0 == \"wall\" || sensor.{self.rng.choice(SENSOR_POSITIONS)} == \"item\")")
+            self.emit(f"{self.rng.choice(('turnLeft', 'turnRight'))}();")
+            self.close_block(" else {")
+            self.indent += 1
+            self.emit("moveForward();")
+            self.close_block()
+            self.close_block()
+        return self.text()
+
+    def mixed(self):
+        self.declarations()
+        self.statements(self.size, self.depth)
+        return self.text()
+
+
+KINDS = ("commands", "nested", "loops", "sensors", "mixed")
+
+
+def generate(kind, seed=0, size=1000, depth=8, iterations=100):
+    """Texto de um programa do formato `kind` (ver KINDS)."""
+    if kind not in KINDS:
+        raise ValueError(f"unknown program kind: {kind}")
+    return getattr(Generator(seed, size, depth, iterations), kind)()
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description="Gera programas .rbt sintéticos")
+    argparser.add_argument("kind", choices=KINDS)
+    argparser.add_argument("--seed", type=int, default=0)
+    argparser.add_argument("--size", type=int, default=1000, help="número aproximado de sentenças")
+    argparser.add_argument("--depth", type=int, default=8, help="profundidade de blocos e expressões")
+    argparser.add_argument("--iterations", type=int, default=100, help="iterações de cada laço")
+    argparser.add_argument("-o", "--output", help="arquivo de saída (padrão: saída padrão)")
+    args = argparser.parse_args()
+
+    source = generate(args.kind, args.seed, args.size, args.depth, args.iterations)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(source)
+    else:
+        sys.stdout.write(source)
@@ -0,0 +1,71 @@
+"""
+Passo de resolução executado depois de Parser.parse(): cada VarInit,
+Variable, Assignment e ForStmt recebe um endereço fixo (depth, slot).
+
+`depth` é quantos frames acima do atual a variável vive e `slot` é o índice
+dentro do frame. Em tempo de execução as variáveis ficam em Frames com
+vetores pré-alocados, então ler ou escrever uma variável é um acesso por
+índice, sem percorrer a cadeia de SymbolTable nem criar escopos por iteração.
+"""
+
+
+class _Undefined:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "UNDEF"
+
+
+# valor de um slot ainda não declarado (leitura gera "Undefined variable")
+UNDEF = _Undefined()
+
+
+class Frame:
+    __slots__ = ("slots", "parent")
+
+    def __init__(self, size, parent=None):
+        self.slots = [UNDEF] * size
+        self.parent = parent
+
+
+class Resolver:
+    """
+    Atribui slots às variáveis do programa principal.
+
+    Block.evaluate reaproveita a tabela raiz para todo bloco avaliado com ela,
+    então fora de funções existe um único escopo: toda ocorrência de um nome
+    resolve para o mesmo slot do frame global, independente da ordem textual.
+    Se a declaração ainda não executou, o slot continua UNDEF e a leitura
+    falha como em SymbolTable.get.
+    """
+    def __init__(self):
+        self.names = []
+        self.slots = {}
+
+    def resolve(self, program):
+        self.visit(program)
+        program.frame_size = len(self.names)
+        return self.names
+
+    def slot(self, name):
+        if name not in self.slots:
+            self.slots[name] = len(self.names)
+            self.names.append(name)
+        return self.slots[name]
+
+    def visit(self, program):
+        # pré-ordem com pilha explícita: os slots saem na ordem textual
+        stack = [program]
+        while stack:
+            node = stack.pop()
+            kind = type(node).__name__
+            if kind in ("FuncDec", "FuncCall", "Return"):
+                raise Exception("Functions are not supported by the resolver")
+            if kind in ("VarInit", "Variable", "Assignment", "ForStmt"):
+                node.addr = (0, self.slot(node.value))
+            stack.extend(child for child in reversed(node.children) if child is not None)
+
+
+def resolve(program):
+    """Resolve `program` e devolve o nome de cada slot do frame global."""
+    return Resolver().resolve(program)
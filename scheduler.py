@@ -0,0 +1,209 @@
+"""
+Escalonador cooperativo: roda muitos programas no mesmo processo,
+alternando entre eles a cada `quantum` instruções da VM (ver bytecode.py).
+
+Cada programa vira uma Task com a sua própria VM, sink e sensores. As tasks
+se revezam em round-robin ou por prioridade (maior primeiro; empates em
+round-robin). Uma task pode ter um limite total de instruções (`budget`) e
+um prazo em segundos (`deadline`, contado a partir do início do run); ao
+estourar qualquer um dos dois ela é abortada com um erro e as outras seguem.
+Um `while` que nunca termina deixa de travar o processo: no pior caso ele
+consome o próprio orçamento. As instruções são contadas como na VM, por
+iteração de laço; código sem laço não consome orçamento.
+
+Uso:
+    python3 scheduler.py a.rbt b.rbt --quantum 500 --budget 1000000
+    python3 scheduler.py frota.json --policy priority --deadline 2.5
+"""
+import argparse
+import heapq
+import itertools
+import json
+import os
+import sys
+import time
+
+import bytecode
+import main
+from sensors import StaticSensors
+from sinks import MemorySink
+
+POLICIES = ("round-robin", "priority")
+DEFAULT_QUANTUM = 1000
+
+
+class TaskAborted(Exception):
+    """Task interrompida pelo escalonador (orçamento ou prazo)."""
+
+
+class Task:
+    """
+    Um programa com a sua VM. Como na VM, só os saltos para trás são
+    cobrados (o tamanho do laço, uma vez por iteração): código em linha reta
+    é de graça, então `budget` limita na prática as iterações de laço, não
+    cada instrução executada. Uma task que gasta exatamente `budget` termina;
+    só passar dele a aborta.
+    """
+    def __init__(self, name, program, symbol_table=None, priority=0, budget=None, deadline=None):
+        if not isinstance(program, bytecode.Program):
+            program = bytecode.compile_program(program)
+        self.name = name
+        self.symbol_table = symbol_table if symbol_table is not None else main.SymbolTable(sink=MemorySink())
+        self.vm = bytecode.VM(program, self.symbol_table)
+        self.priority = priority
+        self.budget = budget
+        self.deadline = deadline
+        self.deadline_at = None
+        self.error = None
+        self.slices = 0
+        self.wall_time = 0.0
+
+    @property
+    def instructions(self):
+        return self.vm.used
+
+    @property
+    def done(self):
+        return self.vm.halted or self.error is not None
+
+    def result(self):
+        sink = self.symbol_table.sink
+        return {
+            "name": self.name,
+            "exit_status": 0 if self.error is None else 1,
+            "error": None if self.error is None else str(self.error),
+            "instructions": self.instructions,
+            "slices": self.slices,
+            "wall_time": self.wall_time,
+            "commands": getattr(sink, "commands", None),
+        }
+
+
+class Scheduler:
+    def __init__(self, quantum=DEFAULT_QUANTUM, policy="round-robin", clock=time.monotonic):
+        if quantum <= 0:
+            raise ValueError("quantum must be positive")
+        if policy not in POLICIES:
+            raise ValueError(f"unknown policy: {policy}")
+        self.quantum = quantum
+        self.policy = policy
+        self.clock = clock
+        self.tasks = []
+        self._ready = []
+        self._order = itertools.count()
+
+    def add(self, name, program, symbol_table=None, priority=0, budget=None, deadline=None):
+        task = Task(name, program, symbol_table, priority, budget, deadline)
+        self.tasks.append(task)
+        self._push(task)
+        return task
+
+    def _push(self, task):
+        # round-robin: a ordem de chegada decide; prioridade: maior primeiro
+        rank = -task.priority if self.policy == "priority" else 0
+        heapq.heappush(self._ready, (rank, next(self._order), task))
+
+    def _abort(self, task, message):
+        task.error = TaskAborted(message)
+
+    def step(self):
+        """Roda uma fatia da próxima task pronta; devolve False se não há nenhuma."""
+        if not self._ready:
+            return False
+        _, _, task = heapq.heappop(self._ready)
+        now = self.clock()
+        if task.deadline is not None and task.deadline_at is None:
+            task.deadline_at = now + task.deadline
+        fuel = self.quantum
+        if task.budget is not None:
+            fuel = min(fuel, task.budget - task.instructions)
+        task.slices += 1
+        try:
+            finished = task.vm.run(fuel)
+        except Exception as e:
+            task.error = e
+            finished = True
+        end = self.clock()
+        task.wall_time += end - now
+        if not finished:
+            # com o orçamento gasto exatamente a VM pausa no último salto, mas
+            # ainda pode terminar: a próxima fatia (com combustível 0) só
+            # pausa de novo se houver mais uma iteração
+            if task.budget is not None and task.instructions > task.budget:
+                self._abort(task, f"Instruction budget exceeded ({task.budget} instructions)")
+            elif task.deadline_at is not None and end >= task.deadline_at:
+                self._abort(task, f"Deadline exceeded ({task.deadline}s)")
+            else:
+                self._push(task)
+        if task.done:
+            try:
+                task.symbol_table.sink.close()
+            except Exception as e:
+                task.error = task.error or e
+        return True
+
+    def run(self):
+        """Roda todas as tasks até terminarem (ou serem abortadas)."""
+        while self.step():
+            pass
+        return self.tasks
+
+
+if __name__ == "__main__":
+    import batch
+
+    argparser = argparse.ArgumentParser(description="Roda vários programas .rbt num único processo, em fatias")
+    argparser.add_argument("sources", nargs="+",
+                           help="arquivos .rbt, diretórios ou manifestos .json/.jsonl "
+                                "(entradas aceitam \"priority\", \"budget\" e \"deadline\")")
+    argparser.add_argument("--quantum", type=int, default=DEFAULT_QUANTUM,
+                           help=f"instruções por fatia (padrão: {DEFAULT_QUANTUM})")
+    argparser.add_argument("--policy", choices=POLICIES, default="round-robin")
+    argparser.add_argument("--budget", type=int, default=None,
+                           help="limite de instruções por programa (padrão do manifesto)")
+    argparser.add_argument("--deadline", type=float, default=None,
+                           help="prazo em segundos por programa (padrão do manifesto)")
+    argparser.add_argument("-o", "--output", help="grava os resultados (JSON Lines) neste arquivo")
+    args = argparser.parse_args()
+
+    try:
+        entries = []
+        for source in args.sources:
+            if source.endswith(".rbt"):
+                entries.append({"program": source})
+            else:
+                entries.extend(batch.load_manifest(source))
+        scheduler = Scheduler(args.quantum, args.policy)
+    except (OSError, ValueError) as e:
+        sys.stderr.write(f"Erro: {e}\n")
+        sys.exit(1)
+
+    failed_to_load = []
+    for entry in entries:
+        name = entry.get("name", os.path.basename(entry["program"]))
+        table = main.SymbolTable(sink=MemorySink(), sensors=StaticSensors(entry.get("sensors")))
+        try:
+            with open(entry["program"], "r") as f:
+                program = main.Parser(main.Tokenizer(f.read())).parse()
+            scheduler.add(name, program, table,
+                          priority=entry.get("priority", 0),
+                          budget=entry.get("budget", args.budget),
+                          deadline=entry.get("deadline", args.deadline))
+        except Exception as e:
+            failed_to_load.append({"name": name, "exit_status": 1, "error": str(e)})
+
+    start = time.perf_counter()
+    results = failed_to_load + [task.result() for task in scheduler.run()]
+    elapsed = time.perf_counter() - start
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for result in results:
+            out.write(json.dumps(result) + "\n")
+    finally:
+        if args.output:
+            out.close()
+
+    failed = sum(1 for r in results if r["exit_status"] != 0)
+    sys.stderr.write(f"{len(results)} programs, {failed} failed, {elapsed:.2f}s\n")
+    sys.exit(1 if failed else 0)
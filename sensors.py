@@ -0,0 +1,71 @@
+"""
+Provedores de sensor.
+
+Um SensorProvider lê as quatro posições (front/left/right/back) numa única
+chamada. O interpretador guarda essa leitura como um snapshot (SensorCache)
+que vale até o próximo comando do robô: várias leituras seguidas, como
+`sensor.front != "wall" && sensor.left != "wall"`, custam uma única ida ao
+hardware.
+"""
+from abc import ABC, abstractmethod
+
+POSITIONS = ("front", "left", "right", "back")
+
+
+class SensorProvider(ABC):
+    """Interface: read_all() devolve {posição: valor} para todas as posições."""
+    @abstractmethod
+    def read_all(self):
+        pass
+
+
+class StaticSensors(SensorProvider):
+    """Leituras fixas; posições não informadas leem "none"."""
+    def __init__(self, values=None):
+        values = values or {}
+        unknown = set(values) - set(POSITIONS)
+        if unknown:
+            raise ValueError(f"unknown sensor positions: {', '.join(sorted(unknown))}")
+        self.values = {pos: values.get(pos, "none") for pos in POSITIONS}
+
+    def read_all(self):
+        return dict(self.values)
+
+
+def parse_sensor_spec(spec):
+    """'front=wall,left=item' -> StaticSensors."""
+    values = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        pos, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"invalid sensor setting '{item}', expected pos=value")
+        values[pos.strip()] = value.strip()
+    return StaticSensors(values)
+
+
+class SensorCache:
+    """Snapshot das leituras, invalidado quando o robô executa um comando."""
+    def __init__(self, provider):
+        self.provider = provider
+        self.snapshot = None
+        self.hits = 0
+        self.misses = 0
+
+    def read(self, pos, before_read=None):
+        snapshot = self.snapshot
+        if snapshot is None:
+            self.misses += 1
+            if before_read is not None:
+                before_read()
+            snapshot = self.snapshot = self.provider.read_all()
+        else:
+            self.hits += 1
+        return snapshot[pos]
+
+    def invalidate(self):
+        self.snapshot = None
+
+    def report(self):
+        total = self.hits + self.misses
+        rate = 100.0 * self.hits / total if total else 0.0
+        return f"sensors: {total} reads, {self.hits} cache hits, {self.misses} misses ({rate:.1f}% hit rate)"
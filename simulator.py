@@ -0,0 +1,441 @@
+"""
+Simulador de mundo em grade com NumPy: um mesmo programa roda sobre N robôs
+(cada um na sua arena) ao mesmo tempo.
+
+O mundo guarda arenas, itens, poses e inventários como arrays; os comandos
+(moveForward/turnLeft/turnRight/pick/drop) são atualizações vetorizadas e
+`sensor.*` é uma leitura indexada dos arrays. O BatchInterpreter percorre a
+AST uma única vez para todos os robôs, com uma máscara dos robôs ativos:
+nos ramos divergentes de If/WhileStmt/ForStmt cada lado roda só com os
+robôs que o seguem, então 10k robôs custam mais ou menos um passo vetorial
+por nó, e não 10k execuções do interpretador.
+
+Um erro de execução (variável indefinida, tipos incompatíveis) derruba só os
+robôs em que aconteceu; os demais continuam.
+
+Uso:
+    python3 simulator.py programa.rbt --robots 10000 --size 16x16 --seed 1
+"""
+import argparse
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - dependência opcional
+    np = None
+
+import main
+from sensors import POSITIONS, SensorProvider
+from sinks import CommandSink
+
+# direções: 0 = norte, 1 = leste, 2 = sul, 3 = oeste
+DY = (-1, 0, 1, 0)
+DX = (0, 1, 0, -1)
+# deslocamento de cada sensor em relação à direção do robô
+SENSOR_OFFSET = {"front": 0, "right": 1, "back": 2, "left": 3}
+SENSOR_NONE, SENSOR_ITEM, SENSOR_WALL = 0, 1, 2
+SENSOR_VALUES = ("none", "item", "wall")
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("simulator.py requires numpy (pip install numpy)")
+
+
+class GridWorld:
+    """
+    Estado de N robôs, cada um numa arena H x W:
+    walls (N,H,W) bool, items (N,H,W) int, y/x/heading/inventory (N,).
+    A borda da arena é sempre parede.
+    """
+    def __init__(self, walls, items, y, x, heading=None):
+        _require_numpy()
+        self.walls = np.asarray(walls, dtype=bool).copy()
+        self.walls[:, 0, :] = self.walls[:, -1, :] = True
+        self.walls[:, :, 0] = self.walls[:, :, -1] = True
+        self.items = np.asarray(items, dtype=np.int32).copy()
+        self.n = self.walls.shape[0]
+        self.y = np.asarray(y, dtype=np.intp).copy()
+        self.x = np.asarray(x, dtype=np.intp).copy()
+        self.heading = (np.zeros(self.n, dtype=np.intp) if heading is None
+                        else np.asarray(heading, dtype=np.intp).copy())
+        self.inventory = np.zeros(self.n, dtype=np.int32)
+        self.commands = np.zeros(self.n, dtype=np.int64)
+        self.robots = np.arange(self.n)
+        self._dy = np.array(DY, dtype=np.intp)
+        self._dx = np.array(DX, dtype=np.intp)
+        self._sensor_values = np.array(SENSOR_VALUES, dtype=object)
+
+    @classmethod
+    def random(cls, n, height=16, width=16, wall_density=0.15, item_density=0.1, seed=None):
+        """N arenas aleatórias, cada robô numa célula livre com direção aleatória."""
+        _require_numpy()
+        rng = np.random.default_rng(seed)
+        walls = rng.random((n, height, width)) < wall_density
+        items = (rng.random((n, height, width)) < item_density).astype(np.int32)
+        # posição inicial: uma célula interna, que é liberada
+        y = rng.integers(1, height - 1, n)
+        x = rng.integers(1, width - 1, n)
+        robots = np.arange(n)
+        walls[robots, y, x] = False
+        items[robots, y, x] = 0
+        return cls(walls, items, y, x, rng.integers(0, 4, n))
+
+    # comandos ---------------------------------------------------------
+    def command(self, name, mask):
+        self.commands += mask
+        if name == "moveForward":
+            ty = self.y + self._dy[self.heading]
+            tx = self.x + self._dx[self.heading]
+            free = mask & ~self.walls[self.robots, ty, tx]
+            self.y = np.where(free, ty, self.y)
+            self.x = np.where(free, tx, self.x)
+        elif name == "turnLeft":
+            self.heading = np.where(mask, (self.heading + 3) % 4, self.heading)
+        elif name == "turnRight":
+            self.heading = np.where(mask, (self.heading + 1) % 4, self.heading)
+        elif name == "pick":
+            here = self.items[self.robots, self.y, self.x]
+            take = mask & (here > 0)
+            self.items[self.robots, self.y, self.x] = here - take
+            self.inventory += take
+        elif name == "drop":
+            give = mask & (self.inventory > 0)
+            self.items[self.robots, self.y, self.x] += give
+            self.inventory -= give
+        else:
+            raise Exception(f"Unknown command: {name}")
+
+    # sensores ---------------------------------------------------------
+    def sense(self, pos):
+        """Leitura de `pos` para todos os robôs (array de strings)."""
+        direction = (self.heading + SENSOR_OFFSET[pos]) % 4
+        ty = self.y + self._dy[direction]
+        tx = self.x + self._dx[direction]
+        code = np.where(self.items[self.robots, ty, tx] > 0, SENSOR_ITEM, SENSOR_NONE)
+        code = np.where(self.walls[self.robots, ty, tx], SENSOR_WALL, code)
+        return self._sensor_values[code]
+
+
+class WorldSensors(SensorProvider):
+    """Provedor de sensores para o interpretador comum, lendo o robô `robot`."""
+    def __init__(self, world, robot=0):
+        self.world = world
+        self.robot = robot
+
+    def read_all(self):
+        return {pos: self.world.sense(pos)[self.robot] for pos in POSITIONS}
+
+
+class WorldSink(CommandSink):
+    """Sink que aplica os comandos do interpretador comum ao robô `robot`."""
+    def __init__(self, world, robot=0, batch_size=64, window=0):
+        self.world = world
+        self.mask = np.arange(world.n) == robot
+        super().__init__(batch_size, window)
+
+    def write_batch(self, commands):
+        for name in commands:
+            self.world.command(name, self.mask)
+
+
+class RobotFault(Exception):
+    """Erro de execução que atinge só os robôs em `mask`."""
+    def __init__(self, message, mask):
+        super().__init__(message)
+        self.mask = mask
+
+
+def _to_str(value, typ):
+    if typ == "string":
+        return value
+    if typ == "bool":
+        return np.where(value, "true", "false").astype(object)
+    return np.asarray(value).astype(str).astype(object)
+
+
+class BatchInterpreter:
+    """
+    Executa um programa sobre todos os robôs de um GridWorld com execução
+    mascarada. Valores são pares (tipo, array de tamanho N) — ou escalares,
+    que o NumPy expande quando necessário.
+    """
+    def __init__(self, program, world, max_iterations=None):
+        _require_numpy()
+        self.program = program
+        self.world = world
+        self.n = world.n
+        self.max_iterations = max_iterations
+        self.variables = {}
+        self.defined = {}
+        self.alive = np.ones(self.n, dtype=bool)
+        self.errors = np.full(self.n, None, dtype=object)
+
+    def run(self):
+        """
+        Como main.Interpreter.run, sem recursão: cada statement composta
+        (bloco, if, laço) é um gerador de pares (statement, máscara), e os
+        abertos ficam numa pilha explícita.
+        """
+        frames = [iter(((self.program, self.alive.copy()),))]
+        while frames:
+            for node, mask in frames[-1]:
+                steps = self.exec_stmt(node, mask)
+                if steps is not None:
+                    frames.append(steps)
+                    break
+            else:
+                frames.pop()
+        return self
+
+    def fail(self, mask, message):
+        mask = mask & self.alive
+        self.errors[mask] = message
+        self.alive &= ~mask
+
+    # statements: as compostas devolvem um gerador com as statements
+    # internas (e a máscara de cada uma), que run() executa em seguida
+    # -------------------------------------------------------------------
+    def exec_stmt(self, node, mask):
+        method = getattr(self, "stmt_" + type(node).__name__, None)
+        if method is None:
+            raise Exception(f"{type(node).__name__} is not supported by the simulator")
+        return method(node, mask)
+
+    def stmt_Block(self, node, mask):
+        for stmt in node.children:
+            mask = mask & self.alive
+            if not mask.any():
+                return
+            yield stmt, mask
+
+    def stmt_VarDec(self, node, mask):
+        pass
+
+    def stmt_VarInit(self, node, mask):
+        if node.children:
+            result = self.evaluate(node.children[0], mask)
+            if result is None:
+                return
+            mask, (typ, value) = result
+        else:
+            typ, value = node.var_type, main.DEFAULTS[node.var_type]
+        self.store(node.value, node.var_type, value, mask, declare=True)
+
+    def stmt_Assignment(self, node, mask):
+        name = node.value
+        missing = mask & ~self.defined.get(name, False)
+        if missing.any():
+            self.fail(missing, f"Undefined variable: {name}")
+            mask = mask & ~missing
+            if not mask.any():
+                return
+        result = self.evaluate(node.children[0], mask)
+        if result is None:
+            return
+        mask, (typ, value) = result
+        expected = self.variables[name][0]
+        if typ != expected:
+            self.fail(mask, f"Incompatible types: expected {expected}, got {typ}")
+            return
+        self.store(name, typ, value, mask)
+
+    def stmt_CommandStmt(self, node, mask):
+        self.world.command(node.value, mask)
+
+    def stmt_If(self, node, mask):
+        result = self.condition(node.children[0], mask, "Condition in if must be boolean")
+        if result is None:
+            return
+        mask, cond = result
+        then_mask = mask & cond
+        if then_mask.any():
+            yield node.children[1], then_mask
+        if len(node.children) == 3:
+            else_mask = mask & ~cond
+            if else_mask.any():
+                yield node.children[2], else_mask
+
+    def stmt_WhileStmt(self, node, mask):
+        iterations = 0
+        while True:
+            mask = mask & self.alive
+            result = self.condition(node.children[0], mask, "Condition in while must be boolean")
+            if result is None:
+                return
+            mask, cond = result
+            mask = mask & cond
+            if not mask.any():
+                return
+            if self.max_iterations is not None and iterations >= self.max_iterations:
+                self.fail(mask, "Iteration limit exceeded")
+                return
+            iterations += 1
+            yield node.children[1], mask
+
+    stmt_While = stmt_WhileStmt
+
+    def stmt_ForStmt(self, node, mask):
+        result = self.evaluate(node.children[0], mask)
+        if result is None:
+            return
+        mask, (start_type, start) = result
+        result = self.evaluate(node.children[1], mask)
+        if result is None:
+            return
+        mask, (end_type, end) = result
+        if start_type != "int" or end_type != "int":
+            self.fail(mask, "For bounds must be integers")
+            return
+        start = np.broadcast_to(start, (self.n,))
+        end = np.broadcast_to(end, (self.n,))
+        first = int(start[mask].min())
+        last = int(end[mask].max())
+        for i in range(first, last + 1):
+            active = mask & self.alive & (start <= i) & (i <= end)
+            if not active.any():
+                if not (mask & self.alive & (i < end)).any():
+                    return
+                continue
+            # como SymbolTable.set: cria (ou redefine) a variável nos robôs ativos
+            self.store(node.value, "int", i, active, declare=True)
+            yield node.children[2], active
+
+    def store(self, name, typ, value, mask, declare=False):
+        current = self.variables.get(name)
+        if current is None or (declare and current[0] != typ):
+            # primeira declaração (ou redeclaração com outro tipo)
+            base = np.full(self.n, main.DEFAULTS[typ], dtype=object if typ == "string" else None)
+            self.variables[name] = (typ, np.where(mask, value, base))
+            self.defined[name] = mask.copy()
+            return
+        self.variables[name] = (typ, np.where(mask, value, current[1]))
+        if declare:
+            self.defined[name] = self.defined[name] | mask
+
+    def condition(self, expr, mask, message):
+        result = self.evaluate(expr, mask)
+        if result is None:
+            return None
+        mask, (typ, value) = result
+        if typ != "bool":
+            self.fail(mask, message)
+            return None
+        return mask, np.broadcast_to(value, (self.n,))
+
+    # expressões -------------------------------------------------------
+    def evaluate(self, expr, mask):
+        """
+        Avalia `expr` para os robôs de `mask`. Robôs com erro são removidos
+        e a expressão é reavaliada para o resto (expressões não têm efeitos
+        colaterais). Devolve (máscara restante, (tipo, valor)) ou None.
+        """
+        while mask.any():
+            try:
+                return mask, main.trampoline(self.eval_expr(expr, mask))
+            except RobotFault as fault:
+                self.fail(fault.mask & mask, str(fault))
+                mask = mask & ~fault.mask
+        return None
+
+    def eval_expr(self, node, mask):
+        # UnOp e BinOp são geradores: `yield self.eval_expr(filho, mask)`
+        # avalia o filho pela pilha explícita de main.trampoline
+        return getattr(self, "expr_" + type(node).__name__)(node, mask)
+
+    def expr_IntVal(self, node, mask):
+        return "int", node.value
+
+    def expr_StrVal(self, node, mask):
+        return "string", node.value
+
+    def expr_BoolVal(self, node, mask):
+        return "bool", bool(node.value)
+
+    def expr_Variable(self, node, mask):
+        name = node.value
+        missing = mask & ~self.defined.get(name, False)
+        if missing.any():
+            raise RobotFault(f"Undefined variable: {name}", missing)
+        return self.variables[name]
+
+    def expr_SensorAccess(self, node, mask):
+        return "string", self.world.sense(node.value)
+
+    def expr_UnOp(self, node, mask):
+        typ, value = yield self.eval_expr(node.children[0], mask)
+        op = node.value
+        if op == "+" and typ == "int":
+            return "int", value
+        if op == "-" and typ == "int":
+            return "int", -np.asarray(value)
+        if op == "!" and typ == "bool":
+            return "bool", np.logical_not(value)
+        raise RobotFault(f"Invalid unary operation {op} on type {typ}", mask)
+
+    def expr_BinOp(self, node, mask):
+        lt, left = yield self.eval_expr(node.children[0], mask)
+        rt, right = yield self.eval_expr(node.children[1], mask)
+        op = node.value
+        if op == "+":
+            if lt == rt:
+                return lt, np.add(left, right, dtype=object) if lt == "string" else np.add(left, right)
+            if lt == "string" or rt == "string":
+                return "string", np.add(_to_str(left, lt), _to_str(right, rt), dtype=object)
+        elif lt == rt == "int" and op in ("-", "*", "/"):
+            if op == "-":
+                return "int", np.subtract(left, right)
+            if op == "*":
+                return "int", np.multiply(left, right)
+            safe = np.where(np.equal(right, 0), 1, right)
+            return "int", np.where(np.equal(right, 0), 0, np.floor_divide(left, safe))
+        elif op in ("==", "!=", "<", ">", "<=", ">=") and lt == rt:
+            func = {"==": np.equal, "!=": np.not_equal, "<": np.less, ">": np.greater,
+                    "<=": np.less_equal, ">=": np.greater_equal}[op]
+            return "bool", np.asarray(func(left, right), dtype=bool)
+        elif op == "&&" and lt == rt == "bool":
+            return "bool", np.logical_and(left, right)
+        elif op == "||" and lt == rt == "bool":
+            return "bool", np.logical_or(left, right)
+        raise RobotFault(f"Type mismatch in operation: {op}", mask)
+
+
+def simulate(program, world, max_iterations=None):
+    """Roda `program` em todos os robôs de `world` e devolve o BatchInterpreter."""
+    return BatchInterpreter(program, world, max_iterations).run()
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description="Roda um programa .rbt em N robôs simulados")
+    argparser.add_argument("file", help="programa .rbt")
+    argparser.add_argument("--robots", type=int, default=1000)
+    argparser.add_argument("--size", default="16x16", help="altura x largura de cada arena")
+    argparser.add_argument("--walls", type=float, default=0.15, help="densidade de paredes")
+    argparser.add_argument("--items", type=float, default=0.1, help="densidade de itens")
+    argparser.add_argument("--seed", type=int, default=None)
+    argparser.add_argument("--max-iterations", type=int, default=100000,
+                           help="limite de iterações por laço (robôs acima dele falham)")
+    args = argparser.parse_args()
+
+    try:
+        height, width = (int(v) for v in args.size.lower().split("x"))
+        with open(args.file, "r") as f:
+            program = main.Parser(main.Tokenizer(f.read())).parse()
+        world = GridWorld.random(args.robots, height, width, args.walls, args.items, args.seed)
+        start = time.perf_counter()
+        result = simulate(program, world, args.max_iterations)
+        elapsed = time.perf_counter() - start
+    except Exception as e:
+        sys.stderr.write(f"Erro: {e}\n")
+        sys.exit(1)
+
+    failed = int((~result.alive).sum())
+    print(f"robots: {world.n}, failed: {failed}, time: {elapsed:.3f}s "
+          f"({world.n / elapsed if elapsed else 0:.0f} robots/s)")
+    print(f"commands: mean {world.commands.mean():.1f}, max {world.commands.max()}")
+    print(f"inventory: mean {world.inventory.mean():.2f}, max {world.inventory.max()}")
+    if failed:
+        messages, counts = np.unique(result.errors[~result.alive].astype(str), return_counts=True)
+        for message, count in zip(messages, counts):
+            print(f"  {count} x {message}")
@@ -0,0 +1,417 @@
+"""
+Destinos (sinks) para os comandos do robô.
+
+CommandStmt não escreve mais direto na saída: o comando vai para o sink da
+tabela de símbolos, que acumula os comandos e os envia em lotes. Com
+`window` > 0 os lotes são despachados por uma thread própria, com no máximo
+`window` lotes em trânsito, e o interpretador continua executando enquanto
+o atuador recebe os comandos anteriores.
+
+O sink só é esvaziado à força (flush) antes de uma leitura de sensor, pois
+a leitura depende da pose do robô, e no fim do programa.
+
+Laços `for` cujo corpo só tem comandos chegam ao sink por repeat(count,
+names). Por padrão a sequência é expandida em comandos comuns; com
+`repeat_frames=True` ela vai como um único item (count, names) no lote, e o
+sink a escreve como um quadro "repetir N vezes" para firmwares que o
+entendem.
+
+Com `peephole=True` os comandos passam antes por um otimizador de janela
+(Peephole) que corta giros que se desfazem e junta movimentos seguidos.
+"""
+import queue
+import struct
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+
+COMMANDS = ("moveForward", "turnLeft", "turnRight", "pick", "drop")
+COMMAND_CODES = {name: i + 1 for i, name in enumerate(COMMANDS)}
+
+
+class Peephole:
+    """
+    Otimiza a sequência de comandos antes do lote, sem mudar o que o robô
+    faz entre dois pontos observáveis:
+
+    * uma sequência de giros vira o giro líquido (módulo 4): turnLeft e
+      turnRight se anulam e quatro giros iguais somem;
+    * com `merge_moves` (o sink tem repeat_frames), moveForward() seguidos
+      viram um único movimento contado, que sai como o item de repetição
+      (count, ("moveForward",)) do lote; sem a opção cada movimento sai
+      como um comando comum, porque o firmware pode não entender o quadro
+      de repetição.
+
+    Repetições de `for` em quadro único só de giros ou só de movimentos
+    entram na conta; pick/drop, as outras repetições, o flush antes de uma
+    leitura de sensor e o fim do programa são barreiras: o que estiver
+    acumulado sai antes deles. `emit(item)` recebe cada item que sobrou.
+    """
+    TURNS = {"turnLeft": 1, "turnRight": -1}
+
+    def __init__(self, emit, merge_moves=True):
+        self.emit = emit
+        self.merge_moves = merge_moves
+        self.rotation = 0   # giro líquido pendente, em quartos de volta à esquerda
+        self.turns = 0      # giros recebidos desde a última barreira
+        self.moves = 0
+        self.received = 0
+        self.emitted = 0
+
+    def send(self, name):
+        self.received += 1
+        delta = self.TURNS.get(name)
+        if delta is not None:
+            if self.moves:
+                self._emit_moves()
+            self.rotation = (self.rotation + delta) % 4
+            self.turns += 1
+        elif name == "moveForward":
+            if self.turns:
+                self._emit_turns()
+            if self.merge_moves:
+                self.moves += 1
+            else:
+                self._emit(name)
+        else:
+            self.barrier()
+            self._emit(name)
+
+    def repeat(self, count, names):
+        """
+        Absorve uma repetição só de giros ou só de moveForward() e devolve
+        True; qualquer outra repetição é uma barreira (devolve False).
+        """
+        if all(name in self.TURNS for name in names):
+            if self.moves:
+                self._emit_moves()
+            self.rotation = (self.rotation + count * sum(self.TURNS[name] for name in names)) % 4
+            self.turns += count * len(names)
+        elif all(name == "moveForward" for name in names):
+            if self.turns:
+                self._emit_turns()
+            self.moves += count * len(names)
+        else:
+            self.barrier()
+            return False
+        self.received += count * len(names)
+        return True
+
+    def barrier(self):
+        if self.turns:
+            self._emit_turns()
+        if self.moves:
+            self._emit_moves()
+
+    def _emit(self, item):
+        self.emitted += 1
+        self.emit(item)
+
+    def _emit_turns(self):
+        rotation, self.rotation, self.turns = self.rotation, 0, 0
+        if rotation == 3:
+            self._emit("turnRight")
+        else:
+            for _ in range(rotation):
+                self._emit("turnLeft")
+
+    def _emit_moves(self):
+        moves, self.moves = self.moves, 0
+        self._emit("moveForward" if moves == 1 else (moves, ("moveForward",)))
+
+    @property
+    def saved(self):
+        """Idas ao atuador economizadas (exato depois de uma barreira)."""
+        return self.received - self.emitted
+
+
+class CommandSink(ABC):
+    """
+    Interface dos sinks: send(name), repeat(count, names), flush(), close()
+    e stats(). Subclasses só implementam write_batch(commands); com
+    repeat_frames, `commands` pode conter itens (count, names).
+    """
+    # maior `count` de um item de repetição (None = sem limite)
+    MAX_REPEAT = None
+
+    def __init__(self, batch_size=64, window=0, repeat_frames=False, peephole=False):
+        self.batch_size = max(1, batch_size)
+        self.window = window
+        self.repeat_frames = repeat_frames
+        self.peephole = Peephole(self._append, merge_moves=repeat_frames) if peephole else None
+        self.pending = []
+        self.sent = 0
+        self.repeats = 0
+        self.batches = 0
+        self.flushes = 0
+        self.max_queue_depth = 0
+        self.max_in_flight = 0
+        self.started = time.perf_counter()
+        self.error = None
+        self._queue = None
+        self._thread = None
+        if window > 0:
+            self._queue = queue.Queue(maxsize=window)
+            self._thread = threading.Thread(target=self._worker, daemon=True)
+            self._thread.start()
+
+    @abstractmethod
+    def write_batch(self, commands):
+        pass
+
+    def send(self, name):
+        if self.peephole is not None:
+            self.peephole.send(name)
+            return
+        pending = self.pending
+        pending.append(name)
+        if len(pending) > self.max_queue_depth:
+            self.max_queue_depth = len(pending)
+        if len(pending) >= self.batch_size:
+            self._dispatch()
+
+    def _append(self, item):
+        # item que saiu do Peephole: um nome ou um movimento contado (só
+        # com repeat_frames), dividido em itens de até MAX_REPEAT
+        if isinstance(item, str):
+            self._queue_item(item)
+            return
+        count, names = item
+        limit = self.MAX_REPEAT
+        while limit is not None and count > limit:
+            self._queue_repeat(limit, names)
+            count -= limit
+            # cada pedaço é mais uma ida ao atuador
+            self.peephole.emitted += 1
+        self._queue_repeat(count, names)
+
+    def _queue_repeat(self, count, names):
+        # a repetição ocupa uma única posição no lote (que _dispatch conta
+        # como um comando enviado)
+        self.repeats += 1
+        self.sent += count * len(names) - 1
+        self._queue_item((count, names))
+
+    def _queue_item(self, item):
+        pending = self.pending
+        pending.append(item)
+        if len(pending) > self.max_queue_depth:
+            self.max_queue_depth = len(pending)
+        if len(pending) >= self.batch_size:
+            self._dispatch()
+
+    def repeat(self, count, names):
+        """Envia a sequência `names` `count` vezes seguidas."""
+        if count <= 0 or not names:
+            return
+        if not self.repeat_frames:
+            for _ in range(count):
+                for name in names:
+                    self.send(name)
+            return
+        if self.peephole is not None and self.peephole.repeat(count, names):
+            return
+        self._queue_repeat(count, tuple(names))
+
+    def flush(self):
+        """Envia o que estiver pendente e espera o atuador receber tudo."""
+        self.flushes += 1
+        if self.peephole is not None:
+            self.peephole.barrier()
+        if self.pending:
+            self._dispatch()
+        if self._queue is not None:
+            self._queue.join()
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def drain(self):
+        """
+        Espera os lotes já despachados chegarem e devolve, sem enviar, os
+        itens ainda pendentes (nomes ou (count, names)), esvaziando o sink.
+        """
+        if self.peephole is not None:
+            self.peephole.barrier()
+        if self._queue is not None:
+            self._queue.join()
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+        pending, self.pending = self.pending, []
+        return pending
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+                self._thread = None
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "commands": self.sent,
+            "repeat_frames": self.repeats,
+            "batches": self.batches,
+            "flushes": self.flushes,
+            "avg_batch": self.sent / self.batches if self.batches else 0.0,
+            "max_queue_depth": self.max_queue_depth,
+            "max_in_flight": self.max_in_flight,
+            "elapsed": elapsed,
+            "throughput": self.sent / elapsed if elapsed > 0 else 0.0,
+            "peephole_in": self.peephole.received if self.peephole else 0,
+            "peephole_out": self.peephole.emitted if self.peephole else 0,
+            "round_trips_saved": self.peephole.saved if self.peephole else 0,
+        }
+
+    def report(self):
+        s = self.stats()
+        text = (f"sink: {s['commands']} commands in {s['batches']} batches "
+                f"(avg {s['avg_batch']:.1f}), {s['repeat_frames']} repeat frames, {s['flushes']} flushes, "
+                f"max queue depth {s['max_queue_depth']}, max in flight {s['max_in_flight']}, "
+                f"{s['throughput']:.0f} cmd/s")
+        if self.peephole is not None:
+            text += (f"\npeephole: {s['peephole_in']} commands in, {s['peephole_out']} sent, "
+                     f"{s['round_trips_saved']} actuator round trips saved")
+        return text
+
+    def _dispatch(self):
+        batch = self.pending
+        self.pending = []
+        self.sent += len(batch)
+        self.batches += 1
+        if self._queue is None:
+            self.write_batch(batch)
+            return
+        self._queue.put(batch)
+        in_flight = self._queue.qsize()
+        if in_flight > self.max_in_flight:
+            self.max_in_flight = in_flight
+
+    def _worker(self):
+        while True:
+            batch = self._queue.get()
+            try:
+                if batch is None:
+                    return
+                if self.error is None:
+                    self.write_batch(batch)
+            except Exception as e:
+                self.error = e
+            finally:
+                self._queue.task_done()
+
+
+class MemorySink(CommandSink):
+    """Guarda os comandos numa lista (testes, execução em lote)."""
+    def __init__(self, batch_size=64, window=0, repeat_frames=False, peephole=False):
+        self.commands = []
+        super().__init__(batch_size, window, repeat_frames, peephole)
+
+    def write_batch(self, commands):
+        self.commands.extend(expand(commands))
+
+
+class TextSink(CommandSink):
+    """Uma linha "[ROBOT CMD] nome()" por comando, escrita por lote."""
+    def __init__(self, stream=None, batch_size=64, window=0, repeat_frames=False, peephole=False):
+        self.stream = stream
+        super().__init__(batch_size, window, repeat_frames, peephole)
+
+    def write_batch(self, commands):
+        stream = self.stream or sys.stdout
+        stream.write("".join(self.format(item) for item in commands))
+        stream.flush()
+
+    @staticmethod
+    def format(item):
+        if isinstance(item, str):
+            return f"[ROBOT CMD] {item}()\n"
+        count, names = item
+        return f"[ROBOT REPEAT] {count} x {', '.join(name + '()' for name in names)}\n"
+
+
+class BinarySink(CommandSink):
+    """
+    Quadros binários compactos: cada sequência de comandos de um lote vira um
+    quadro <tipo:u8=1><quantidade:u16><um byte por comando (COMMAND_CODES)>
+    e cada repetição um quadro
+    <tipo:u8=2><vezes:u32><quantidade:u16><um byte por comando>.
+    """
+    FRAME_COMMANDS = 1
+    FRAME_REPEAT = 2
+    MAX_FRAME = 0xFFFF
+    MAX_REPEAT = 0xFFFFFFFF
+
+    def __init__(self, stream=None, batch_size=64, window=0, repeat_frames=False, peephole=False):
+        self.stream = stream
+        super().__init__(min(batch_size, self.MAX_FRAME), window, repeat_frames, peephole)
+
+    def repeat(self, count, names):
+        if len(names) > self.MAX_FRAME:
+            # a sequência não cabe num quadro: expande
+            for _ in range(count):
+                for name in names:
+                    self.send(name)
+            return
+        while count > self.MAX_REPEAT:
+            super().repeat(self.MAX_REPEAT, names)
+            count -= self.MAX_REPEAT
+        super().repeat(count, names)
+
+    def write_batch(self, commands):
+        stream = self.stream or sys.stdout.buffer
+        frames = []
+        run = bytearray()
+        for item in commands:
+            if isinstance(item, str):
+                run.append(COMMAND_CODES[item])
+                continue
+            if run:
+                frames.append(struct.pack("<BH", self.FRAME_COMMANDS, len(run)) + run)
+                run = bytearray()
+            count, names = item
+            codes = bytes(COMMAND_CODES[name] for name in names)
+            frames.append(struct.pack("<BIH", self.FRAME_REPEAT, count, len(codes)) + codes)
+        if run:
+            frames.append(struct.pack("<BH", self.FRAME_COMMANDS, len(run)) + run)
+        stream.write(b"".join(frames))
+        stream.flush()
+
+
+def decode_frames(data):
+    """Inverso de BinarySink: bytes -> lista de nomes de comando."""
+    names = []
+    pos = 0
+    while pos < len(data):
+        kind = data[pos]
+        if kind == BinarySink.FRAME_COMMANDS:
+            times = 1
+            _, count = struct.unpack_from("<BH", data, pos)
+            pos += 3
+        elif kind == BinarySink.FRAME_REPEAT:
+            _, times, count = struct.unpack_from("<BIH", data, pos)
+            pos += 7
+        else:
+            raise ValueError(f"unknown frame type {kind}")
+        names.extend([COMMANDS[code - 1] for code in data[pos:pos + count]] * times)
+        pos += count
+    return names
+
+
+def expand(commands):
+    """Itens de um lote -> nomes de comando, com as repetições expandidas."""
+    for item in commands:
+        if isinstance(item, str):
+            yield item
+        else:
+            count, names = item
+            for _ in range(count):
+                yield from names
+
+
+SINKS = {"text": TextSink, "binary": BinarySink}
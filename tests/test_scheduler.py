@@ -0,0 +1,57 @@
+"""
+Orçamento de instruções do escalonador (scheduler.py).
+
+Uso (da raiz do repositório):
+    python3 -m unittest tests.test_scheduler
+"""
+import unittest
+
+import main
+import scheduler
+
+# 3 iterações de um laço de 10 instruções: 30 cobradas no total
+PROGRAM = """var i: int;
+i = 0;
+while (i < 3) {
+    i = i + 1;
+}
+"""
+
+
+def run_task(budget, quantum=scheduler.DEFAULT_QUANTUM):
+    sched = scheduler.Scheduler(quantum=quantum)
+    task = sched.add("programa", main.Parser(main.Tokenizer(PROGRAM)).parse(), budget=budget)
+    sched.run()
+    return task
+
+
+class BudgetTest(unittest.TestCase):
+    def test_cost_without_budget(self):
+        task = run_task(None)
+        self.assertIsNone(task.error)
+        self.assertEqual(task.instructions, 30)
+
+    def test_exact_budget_finishes(self):
+        for quantum in (scheduler.DEFAULT_QUANTUM, 7):
+            task = run_task(30, quantum)
+            self.assertIsNone(task.error)
+            self.assertEqual(task.instructions, 30)
+            self.assertEqual(task.vm.frame.slots[0], 3)
+
+    def test_budget_exceeded_aborts(self):
+        for quantum in (scheduler.DEFAULT_QUANTUM, 7):
+            task = run_task(29, quantum)
+            self.assertIsInstance(task.error, scheduler.TaskAborted)
+            self.assertEqual(str(task.error), "Instruction budget exceeded (29 instructions)")
+
+    def test_straight_line_code_is_free(self):
+        sched = scheduler.Scheduler()
+        program = main.Parser(main.Tokenizer("var i: int;\ni = 1;\nmoveForward();\n")).parse()
+        task = sched.add("linha", program, budget=0)
+        sched.run()
+        self.assertIsNone(task.error)
+        self.assertEqual(task.instructions, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,303 @@
+"""
+Backend que traduz a AST (o Block devolvido por Parser.parse) para código
+Python, compila uma única vez com compile() e executa o resultado.
+
+Os tipos das variáveis são conhecidos pelas declarações (VarInit), então cada
+operação é especializada na tradução: não há tuplas (tipo, valor) nem eval()
+em tempo de execução, e os laços viram for/while nativos do Python.
+"""
+import re
+
+from main import Node, bool_str
+
+
+class CompileError(Exception):
+    pass
+
+
+def _div(a, b):
+    # mesma regra de BinOp: divisão inteira, e divisão por zero dá 0
+    return a // b if b != 0 else 0
+
+
+def _fail(msg, *operands):
+    # os operandos já foram avaliados (efeitos colaterais preservados)
+    raise Exception(msg)
+
+
+_UNDEFINED = re.compile(r"'v_(\w+)'")
+
+RELATIONAL = ("==", "!=", ">", "<", ">=", "<=")
+
+
+class PyTranspiler:
+    """
+    Gera o código-fonte de uma função Python equivalente ao programa.
+    Todas as variáveis do programa principal vivem num único escopo
+    (o mesmo comportamento de Block.evaluate com a tabela raiz), então
+    cada variável vira um local da função gerada.
+    """
+    def __init__(self, program, asynchronous=False):
+        self.program = program
+        # modo assíncrono: gera uma corrotina em que comandos e sensores são
+        # aguardados e os laços cedem a vez ao event loop periodicamente
+        self.asynchronous = asynchronous
+        self.types = {}
+        self.defined = set()
+        self.lines = []
+        self.indent = 1
+        self.branch_depth = 0
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+    def transpile(self):
+        self.collect_types(self.program)
+        if self.asynchronous:
+            self.lines = ["async def _programa(_cmd, _sensor, _pause, _quantum, "
+                          "_div=_div, _fail=_fail, _bool_str=_bool_str):"]
+            self.emit("_ticks = 0")
+        else:
+            self.lines = ["def _programa(_cmd, _sensor, _div=_div, _fail=_fail, _bool_str=_bool_str):"]
+        start = len(self.lines)
+        self.visit_stmt(self.program)
+        if len(self.lines) == start:
+            self.emit("pass")
+        return "\n".join(self.lines) + "\n"
+
+    def compile(self, filename="<rbt>"):
+        try:
+            # a tradução e o compile() do Python recursam pela profundidade do programa
+            return compile(self.transpile(), filename, "exec")
+        except (SyntaxError, RecursionError, MemoryError) as e:
+            raise CompileError(f"Program too deeply nested for the py engine: {e}")
+
+    # ------------------------------------------------------------------
+    # pré-passo: tipo de cada variável
+    # ------------------------------------------------------------------
+    def declare(self, name, var_type):
+        known = self.types.get(name)
+        if known is not None and known != var_type:
+            raise CompileError(
+                f"Variable '{name}' declared as both {known} and {var_type} "
+                "(not supported by the py engine)")
+        self.types[name] = var_type
+
+    def collect_types(self, node):
+        # pilha explícita de (nó, saindo): o VarInit é visto na entrada e o
+        # ForStmt na saída, depois de todo o corpo, como na versão recursiva
+        stack = [(node, False)]
+        while stack:
+            node, leaving = stack.pop()
+            kind = type(node).__name__
+            if leaving:
+                if node.value not in self.types:
+                    # ForStmt cria a variável de iteração no escopo raiz se necessário
+                    self.types[node.value] = "int"
+                elif self.types[node.value] != "int":
+                    raise CompileError(
+                        f"Loop variable '{node.value}' declared as {self.types[node.value]} "
+                        "(not supported by the py engine)")
+                continue
+            if kind == "VarInit":
+                self.declare(node.value, node.var_type)
+            elif kind in ("FuncDec", "FuncCall", "Return"):
+                raise CompileError("Functions are not supported by the py engine")
+            if kind == "ForStmt":
+                stack.append((node, True))
+            stack.extend((child, False) for child in reversed(node.children)
+                         if isinstance(child, Node))
+
+    # ------------------------------------------------------------------
+    # statements
+    # ------------------------------------------------------------------
+    def emit(self, line):
+        self.lines.append("    " * self.indent + line)
+
+    def emit_body(self, block):
+        start = len(self.lines)
+        self.indent += 1
+        self.visit_stmt(block)
+        if len(self.lines) == start:
+            self.emit("pass")
+        self.indent -= 1
+
+    def emit_loop_body(self, block):
+        if self.asynchronous:
+            # a cada `_quantum` iterações o laço devolve o controle ao event
+            # loop, para que um while apertado não segure os outros robôs
+            self.indent += 1
+            self.emit("_ticks += 1")
+            self.emit("if _ticks >= _quantum:")
+            self.emit("    _ticks = 0")
+            self.emit("    await _pause(0)")
+            self.indent -= 1
+        self.emit_body(block)
+
+    def visit_stmt(self, node):
+        return getattr(self, "stmt_" + type(node).__name__)(node)
+
+    def stmt_Block(self, node):
+        for stmt in node.children:
+            self.visit_stmt(stmt)
+
+    def stmt_VarInit(self, node):
+        if node.children:
+            src, typ = self.visit_expr(node.children[0])
+            if typ != node.var_type:
+                src = f"_fail('Incompatible types: expected {node.var_type}, got {typ}', {src})"
+        else:
+            src = {"int": "0", "bool": "False", "string": "''"}[node.var_type]
+        self.emit(f"v_{node.value} = {src}")
+        if self.branch_depth == 0:
+            self.defined.add(node.value)
+
+    def stmt_Assignment(self, node):
+        name = node.value
+        expected = self.types.get(name)
+        if expected is None:
+            self.emit(f"_fail('Undefined variable: {name}')")
+            return
+        if name not in self.defined:
+            # a variável pode ainda não existir: a leitura dispara o erro
+            self.emit(f"v_{name}")
+        src, typ = self.visit_expr(node.children[0])
+        if typ != expected:
+            src = f"_fail('Incompatible types: expected {expected}, got {typ}', {src})"
+        self.emit(f"v_{name} = {src}")
+
+    def stmt_If(self, node):
+        cond = self.condition(node.children[0], "Condition in if must be boolean")
+        self.branch_depth += 1
+        self.emit(f"if {cond}:")
+        self.emit_body(node.children[1])
+        if len(node.children) == 3:
+            self.emit("else:")
+            self.emit_body(node.children[2])
+        self.branch_depth -= 1
+
+    def stmt_WhileStmt(self, node):
+        cond = self.condition(node.children[0], "Condition in while must be boolean")
+        self.branch_depth += 1
+        self.emit(f"while {cond}:")
+        self.emit_loop_body(node.children[1])
+        self.branch_depth -= 1
+
+    stmt_While = stmt_WhileStmt
+
+    def stmt_ForStmt(self, node):
+        start, start_type = self.visit_expr(node.children[0])
+        end, end_type = self.visit_expr(node.children[1])
+        if start_type != "int" or end_type != "int":
+            self.emit(f"_fail('For bounds must be integers', {start}, {end})")
+            return
+        self.branch_depth += 1
+        self.emit(f"for v_{node.value} in range({start}, {end} + 1):")
+        self.emit_loop_body(node.children[2])
+        self.branch_depth -= 1
+
+    def stmt_CommandStmt(self, node):
+        if self.asynchronous:
+            self.emit(f"await _cmd({node.value!r})")
+        else:
+            self.emit(f"_cmd({node.value!r})")
+
+    def stmt_VarDec(self, node):
+        pass
+
+    def condition(self, expr, msg):
+        src, typ = self.visit_expr(expr)
+        if typ != "bool":
+            return f"_fail({msg!r}, {src})"
+        return src
+
+    # ------------------------------------------------------------------
+    # expressões: devolvem (código, tipo); tipo None = sempre falha
+    # ------------------------------------------------------------------
+    def visit_expr(self, node):
+        return getattr(self, "expr_" + type(node).__name__)(node)
+
+    def expr_IntVal(self, node):
+        return repr(node.value), "int"
+
+    def expr_StrVal(self, node):
+        return repr(node.value), "string"
+
+    def expr_BoolVal(self, node):
+        return repr(bool(node.value)), "bool"
+
+    def expr_Variable(self, node):
+        typ = self.types.get(node.value)
+        if typ is None:
+            return f"_fail('Undefined variable: {node.value}')", None
+        return f"v_{node.value}", typ
+
+    def expr_SensorAccess(self, node):
+        if self.asynchronous:
+            return f"(await _sensor({node.value!r}))", "string"
+        return f"_sensor({node.value!r})", "string"
+
+    def expr_Read(self, node):
+        raise CompileError("Read is not supported by the py engine")
+
+    def expr_UnOp(self, node):
+        src, typ = self.visit_expr(node.children[0])
+        op = node.value
+        if op in ("+", "-") and typ == "int":
+            return f"({op}{src})", "int"
+        if op == "!" and typ == "bool":
+            return f"(not {src})", "bool"
+        return f"_fail('Invalid unary operation {op} on type {typ}', {src})", None
+
+    def expr_BinOp(self, node):
+        left, lt = self.visit_expr(node.children[0])
+        right, rt = self.visit_expr(node.children[1])
+        op = node.value
+        if lt is not None and rt is not None:
+            if op == "+":
+                if lt == rt:
+                    return f"({left} + {right})", lt
+                if lt == "string" or rt == "string":
+                    return f"({self.to_str(left, lt)} + {self.to_str(right, rt)})", "string"
+            elif op in ("-", "*") and lt == rt == "int":
+                return f"({left} {op} {right})", "int"
+            elif op == "/" and lt == rt == "int":
+                return f"_div({left}, {right})", "int"
+            elif op in RELATIONAL and lt == rt:
+                return f"({left} {op} {right})", "bool"
+            elif op == "&&" and lt == rt == "bool":
+                # & avalia os dois lados, como BinOp
+                return f"({left} & {right})", "bool"
+            elif op == "||" and lt == rt == "bool":
+                return f"({left} | {right})", "bool"
+        return f"_fail('Type mismatch in operation: {op}', {left}, {right})", None
+
+    def to_str(self, src, typ):
+        if typ == "bool":
+            return f"_bool_str({src})"
+        if typ == "int":
+            return f"str({src})"
+        return src
+
+
+def run(program, symbol_table, code=None):
+    """
+    Executa `program` pelo backend Python. Comandos e sensores passam pela
+    tabela de símbolos raiz, como no interpretador de árvore.
+    """
+    if code is None:
+        code = PyTranspiler(program).compile()
+    namespace = {"_div": _div, "_fail": _fail, "_bool_str": bool_str}
+    exec(code, namespace)
+    try:
+        namespace["_programa"](symbol_table.command, symbol_table.read_sensor)
+    except NameError as e:
+        raise undefined_variable(e) from None
+
+
+def undefined_variable(e):
+    """UnboundLocalError (variável lida antes de ser declarada) -> erro da linguagem."""
+    match = _UNDEFINED.search(str(e))
+    if match is None:
+        return e
+    return Exception(f"Undefined variable: {match.group(1)}")
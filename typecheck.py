@@ -0,0 +1,682 @@
+"""
+Checagem estática de tipos e execução sem tags de tipo.
+
+Os tipos das variáveis são todos declarados (VarInit), então as checagens que
+Assignment, BinOp, UnOp, If e WhileStmt repetem a cada execução podem ser
+feitas uma única vez, antes de o robô se mover. TypeChecker percorre o
+programa inteiro e junta todos os erros encontrados, em vez de parar no
+primeiro. Programas com funções sempre passam por ele (Parser.parse): é aqui
+que argumentos e returns são checados, e não a cada chamada.
+
+Depois que a checagem passa, TypedCompiler transforma cada nó numa closure
+que trabalha com os valores crus (int, bool, str) guardados nos slots de um
+Frame (ver resolver.py): nenhuma tupla (tipo, valor) é criada em tempo de
+execução.
+
+Uso:
+    python3 typecheck.py programa.rbt           # só checa
+    python3 typecheck.py programa.rbt --bench   # compara memória e tempo com o tree
+"""
+import sys
+
+import main
+from main import trampoline
+from resolver import UNDEF, Frame, Resolver
+
+RELATIONAL = ("==", "!=", ">", "<", ">=", "<=")
+DEFAULTS = {"int": 0, "bool": False, "string": ""}
+# quadros do Python por nível da AST nas closures do TypedCompiler
+# (to_str acrescenta um à expressão convertida)
+FRAMES_PER_LEVEL = 2
+
+
+class TypeCheckError(Exception):
+    """Todos os erros de tipo do programa; `errors` guarda as mensagens."""
+    def __init__(self, errors):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+class TypeChecker:
+    """
+    Como no Resolver, fora de funções existe um único escopo: cada nome tem
+    um tipo só, vindo das suas declarações. Cada função tem o seu próprio
+    escopo (parâmetros e variáveis declaradas no corpo), na frente do
+    global. Cada expressão recebe o atributo `static_type` ("int", "bool",
+    "string" ou None se tiver erro). `located` guarda cada erro com a
+    posição do nó em que apareceu, como (pos, mensagem), para o check.py.
+    """
+    def __init__(self):
+        self.types = {}
+        self.errors = []
+        self.located = []
+        self._seen = set()
+        # nó sendo visitado: dá a posição dos erros
+        self.node = None
+        # nome -> FuncDec, e nome -> tipos locais de cada função
+        self.functions = {}
+        self.locals = {}
+        self.function = None
+
+    def check(self, program):
+        self.collect(program)
+        trampoline(self.visit_stmt(program))
+        return self.errors
+
+    def check_statement(self, stmt):
+        """Checa uma statement de topo (--stream); as declarações valem para as seguintes."""
+        self.errors = []
+        self.located = []
+        self._seen = set()
+        return self.check(stmt)
+
+    def error(self, msg):
+        if msg not in self.errors:
+            self.errors.append(msg)
+        key = (self.node.pos if self.node is not None else None, msg)
+        if key not in self._seen:
+            self._seen.add(key)
+            self.located.append(key)
+
+    def lookup(self, name):
+        if self.function is not None:
+            typ = self.locals[self.function.value].get(name)
+            if typ is not None:
+                return typ
+        return self.types.get(name)
+
+    # ------------------------------------------------------------------
+    # pré-passo: tipo de cada variável
+    # ------------------------------------------------------------------
+    def collect(self, program):
+        loops = []
+        stack = [(program, self.types)]
+        while stack:
+            node, types = stack.pop()
+            self.node = node
+            kind = type(node).__name__
+            if kind == "FuncDec":
+                if node.value in self.functions:
+                    self.error(f"Function '{node.value}' already declared")
+                self.functions[node.value] = node
+                types = self.locals[node.value] = {}
+                for param in node.children[:-1]:
+                    self.declare(types, param.value, param.var_type)
+                stack.append((node.children[-1], types))
+                continue
+            if kind == "VarInit":
+                self.declare(types, node.value, node.var_type)
+            elif kind == "ForStmt":
+                loops.append((node, types))
+            stack.extend((child, types) for child in node.children if child is not None)
+        # depois das declarações: a variável de iteração pode ser declarada depois do laço
+        for node, types in loops:
+            name = node.value
+            self.node = node
+            known = types.get(name, self.types.get(name))
+            if known is None:
+                # ForStmt cria a variável de iteração no escopo raiz se necessário
+                self.types[name] = "int"
+            elif known != "int":
+                self.error(f"Loop variable '{name}' declared as {known}")
+        self.node = None
+
+    def declare(self, types, name, var_type):
+        known = types.get(name)
+        if known is not None and known != var_type:
+            self.error(f"Variable '{name}' declared as both {known} and {var_type}")
+        else:
+            types[name] = var_type
+
+    # ------------------------------------------------------------------
+    # statements; os visitantes são geradores rodados por main.trampoline:
+    # `yield self.visit_expr(filho)` devolve o tipo do filho sem recursão
+    # ------------------------------------------------------------------
+    def visit_stmt(self, node):
+        outer, self.node = self.node, node
+        yield getattr(self, "stmt_" + type(node).__name__, self.stmt_unsupported)(node)
+        self.node = outer
+
+    def stmt_unsupported(self, node):
+        self.error(f"{type(node).__name__} is not supported by the type checker")
+
+    def stmt_Block(self, node):
+        for stmt in node.children:
+            yield self.visit_stmt(stmt)
+
+    def stmt_VarInit(self, node):
+        if node.children:
+            typ = yield self.visit_expr(node.children[0])
+            if typ is not None and typ != node.var_type:
+                self.error(f"Incompatible types: expected {node.var_type}, got {typ}")
+
+    def stmt_Assignment(self, node):
+        typ = yield self.visit_expr(node.children[0])
+        expected = self.lookup(node.value)
+        if expected is None:
+            self.error(f"Undefined variable: {node.value}")
+        elif typ is not None and typ != expected:
+            self.error(f"Incompatible types: expected {expected}, got {typ}")
+
+    def stmt_If(self, node):
+        yield self.condition(node.children[0], "Condition in if must be boolean")
+        for block in node.children[1:]:
+            yield self.visit_stmt(block)
+
+    def stmt_WhileStmt(self, node):
+        yield self.condition(node.children[0], "Condition in while must be boolean")
+        yield self.visit_stmt(node.children[1])
+
+    stmt_While = stmt_WhileStmt
+
+    def stmt_ForStmt(self, node):
+        start = yield self.visit_expr(node.children[0])
+        end = yield self.visit_expr(node.children[1])
+        if (start is not None and start != "int") or (end is not None and end != "int"):
+            self.error("For bounds must be integers")
+        yield self.visit_stmt(node.children[2])
+
+    def stmt_CommandStmt(self, node):
+        pass
+
+    def stmt_VarDec(self, node):
+        pass
+
+    def stmt_FuncDec(self, node):
+        outer, self.function = self.function, node
+        yield self.visit_stmt(node.children[-1])
+        self.function = outer
+
+    def stmt_Return(self, node):
+        if self.function is None:
+            self.error("Return outside of a function")
+            return
+        expected = self.function.ret_type
+        if not node.children:
+            if expected is not None:
+                self.error(f"Missing return value in function '{self.function.value}'")
+            return
+        typ = yield self.visit_expr(node.children[0])
+        if expected is None:
+            self.error("Invalid return in a void function")
+        elif typ is not None and typ != expected:
+            self.error(f"Incompatible types: expected {expected}, got {typ}")
+
+    def stmt_FuncCall(self, node):
+        yield self.call(node)
+
+    def call(self, node):
+        # tipo de retorno da função chamada (None se for void ou houver erro)
+        func = self.functions.get(node.value)
+        arg_types = []
+        for arg in node.children:
+            arg_types.append((yield self.visit_expr(arg)))
+        if func is None:
+            self.error(f"Undefined function: {node.value}")
+            return None
+        params = func.children[:-1]
+        if len(params) != len(arg_types):
+            self.error(f"Argument count mismatch in call to '{node.value}': "
+                       f"expected {len(params)}, got {len(arg_types)}")
+            return None
+        for param, typ in zip(params, arg_types):
+            if typ is not None and typ != param.var_type:
+                self.error(f"Type mismatch for parameter '{param.value}' of '{node.value}': "
+                           f"expected {param.var_type}, got {typ}")
+        return func.ret_type
+
+    def condition(self, expr, msg):
+        typ = yield self.visit_expr(expr)
+        if typ is not None and typ != "bool":
+            # o erro aponta para a condição, não para o if/while
+            outer, self.node = self.node, expr
+            self.error(msg)
+            self.node = outer
+
+    # ------------------------------------------------------------------
+    # expressões: devolvem o tipo (None = erro já reportado)
+    # ------------------------------------------------------------------
+    def visit_expr(self, node):
+        outer, self.node = self.node, node
+        method = getattr(self, "expr_" + type(node).__name__, None)
+        if method is None:
+            self.error(f"{type(node).__name__} is not supported by the type checker")
+            typ = None
+        else:
+            typ = yield method(node)
+        node.static_type = typ
+        self.node = outer
+        return typ
+
+    def expr_IntVal(self, node):
+        return "int"
+
+    def expr_StrVal(self, node):
+        return "string"
+
+    def expr_BoolVal(self, node):
+        return "bool"
+
+    def expr_SensorAccess(self, node):
+        return "string"
+
+    def expr_Variable(self, node):
+        typ = self.lookup(node.value)
+        if typ is None:
+            self.error(f"Undefined variable: {node.value}")
+        return typ
+
+    def expr_FuncCall(self, node):
+        if node.value in self.functions and self.functions[node.value].ret_type is None:
+            yield self.call(node)
+            self.error(f"Function '{node.value}' has no return value")
+            return None
+        return (yield self.call(node))
+
+    def expr_UnOp(self, node):
+        typ = yield self.visit_expr(node.children[0])
+        if typ is None:
+            return None
+        if node.value in ("+", "-") and typ == "int":
+            return "int"
+        if node.value == "!" and typ == "bool":
+            return "bool"
+        self.error(f"Invalid unary operation {node.value} on type {typ}")
+        return None
+
+    def expr_BinOp(self, node):
+        lt = yield self.visit_expr(node.children[0])
+        rt = yield self.visit_expr(node.children[1])
+        if lt is None or rt is None:
+            return None
+        op = node.value
+        if op == "+":
+            if lt == rt:
+                return lt
+            if lt == "string" or rt == "string":
+                return "string"
+        elif op in ("-", "*", "/") and lt == rt == "int":
+            return "int"
+        elif op in RELATIONAL and lt == rt:
+            return "bool"
+        elif op in ("&&", "||") and lt == rt == "bool":
+            return "bool"
+        self.error(f"Type mismatch in operation: {op}")
+        return None
+
+
+def check(program):
+    """Devolve a lista de erros de tipo de `program` (vazia se estiver tudo certo)."""
+    return TypeChecker().check(program)
+
+
+class TypedCompiler:
+    """
+    Transforma a AST já checada em closures sobre os slots do frame global.
+    Statements viram funções sem argumentos; expressões devolvem o valor cru.
+    """
+    def __init__(self, program, symbol_table):
+        self.program = program
+        self.symbol_table = symbol_table
+        self.names = Resolver().resolve(program)
+        self.frame = Frame(len(self.names))
+
+    def compile(self):
+        return trampoline(self.visit_stmt(self.program))
+
+    # ------------------------------------------------------------------
+    # statements; como no TypeChecker, `yield` compila um filho sem recursão
+    # ------------------------------------------------------------------
+    def visit_stmt(self, node):
+        return getattr(self, "stmt_" + type(node).__name__)(node)
+
+    def stmt_Block(self, node):
+        stmts = []
+        for stmt in node.children:
+            stmts.append((yield self.visit_stmt(stmt)))
+
+        def block():
+            for stmt in stmts:
+                stmt()
+        return block
+
+    def stmt_VarInit(self, node):
+        slots = self.frame.slots
+        slot = node.addr[1]
+        if not node.children:
+            default = DEFAULTS[node.var_type]
+
+            def init():
+                slots[slot] = default
+            return init
+        expr = yield self.visit_expr(node.children[0])
+
+        def init():
+            slots[slot] = expr()
+        return init
+
+    def stmt_Assignment(self, node):
+        slots = self.frame.slots
+        slot = node.addr[1]
+        name = node.value
+        expr = yield self.visit_expr(node.children[0])
+
+        def assign():
+            # a variável precisa ter sido declarada antes (como em SymbolTable.get)
+            if slots[slot] is UNDEF:
+                raise Exception(f"Undefined variable: {name}")
+            slots[slot] = expr()
+        return assign
+
+    def stmt_If(self, node):
+        cond = yield self.visit_expr(node.children[0])
+        then = yield self.visit_stmt(node.children[1])
+        if len(node.children) == 3:
+            other = yield self.visit_stmt(node.children[2])
+
+            def if_else():
+                if cond():
+                    then()
+                else:
+                    other()
+            return if_else
+
+        def if_():
+            if cond():
+                then()
+        return if_
+
+    def stmt_WhileStmt(self, node):
+        cond = yield self.visit_expr(node.children[0])
+        body = yield self.visit_stmt(node.children[1])
+
+        def while_():
+            while cond():
+                body()
+        return while_
+
+    stmt_While = stmt_WhileStmt
+
+    def stmt_ForStmt(self, node):
+        slots = self.frame.slots
+        slot = node.addr[1]
+        start = yield self.visit_expr(node.children[0])
+        end = yield self.visit_expr(node.children[1])
+        stmts = node.children[2].children
+        if all(type(stmt).__name__ == "CommandStmt" for stmt in stmts):
+            # mesmo atalho de ForStmt.evaluate: uma única repetição no sink
+            names = [stmt.value for stmt in stmts]
+            repeat = self.symbol_table.repeat_commands
+
+            def repeat_for():
+                first, last = start(), end()
+                if last >= first:
+                    slots[slot] = last
+                    repeat(last - first + 1, names)
+            return repeat_for
+        body = yield self.visit_stmt(node.children[2])
+
+        def for_():
+            for i in range(start(), end() + 1):
+                slots[slot] = i
+                body()
+        return for_
+
+    def stmt_CommandStmt(self, node):
+        command = self.symbol_table.command
+        name = node.value
+        return lambda: command(name)
+
+    def stmt_VarDec(self, node):
+        return lambda: None
+
+    # ------------------------------------------------------------------
+    # expressões
+    # ------------------------------------------------------------------
+    def visit_expr(self, node):
+        return getattr(self, "expr_" + type(node).__name__)(node)
+
+    def expr_IntVal(self, node):
+        value = node.value
+        return lambda: value
+
+    expr_StrVal = expr_IntVal
+
+    def expr_BoolVal(self, node):
+        value = bool(node.value)
+        return lambda: value
+
+    def expr_SensorAccess(self, node):
+        read_sensor = self.symbol_table.read_sensor
+        pos = node.value
+        return lambda: read_sensor(pos)
+
+    def expr_Variable(self, node):
+        slots = self.frame.slots
+        slot = node.addr[1]
+        name = node.value
+
+        def load():
+            value = slots[slot]
+            if value is UNDEF:
+                raise Exception(f"Undefined variable: {name}")
+            return value
+        return load
+
+    def expr_UnOp(self, node):
+        operand = yield self.visit_expr(node.children[0])
+        if node.value == "-":
+            return lambda: -operand()
+        if node.value == "!":
+            return lambda: not operand()
+        return operand
+
+    def expr_BinOp(self, node):
+        left = yield self.visit_expr(node.children[0])
+        right = yield self.visit_expr(node.children[1])
+        lt = node.children[0].static_type
+        rt = node.children[1].static_type
+        op = node.value
+        if op == "+" and lt != rt:
+            # concatenação com conversão, como BinOp.evaluate
+            left = self.to_str(left, lt)
+            right = self.to_str(right, rt)
+        if op == "+":
+            return lambda: left() + right()
+        if op == "-":
+            return lambda: left() - right()
+        if op == "*":
+            return lambda: left() * right()
+        if op == "/":
+            def div():
+                a, b = left(), right()
+                return a // b if b != 0 else 0
+            return div
+        if op == "==":
+            return lambda: left() == right()
+        if op == "!=":
+            return lambda: left() != right()
+        if op == "<":
+            return lambda: left() < right()
+        if op == ">":
+            return lambda: left() > right()
+        if op == "<=":
+            return lambda: left() <= right()
+        if op == ">=":
+            return lambda: left() >= right()
+        # os dois lados são sempre avaliados, como em BinOp.evaluate
+        if op == "&&":
+            return lambda: left() & right()
+        return lambda: left() | right()
+
+    @staticmethod
+    def to_str(expr, typ):
+        if typ == "bool":
+            return lambda: main.bool_str(expr())
+        if typ == "int":
+            return lambda: str(expr())
+        return expr
+
+
+def depth(program):
+    """Maior profundidade de nós de `program` (a raiz conta 1)."""
+    deepest = 0
+    stack = [(program, 1)]
+    while stack:
+        node, level = stack.pop()
+        deepest = max(deepest, level)
+        stack.extend((child, level + 1) for child in node.children if child is not None)
+    return deepest
+
+
+def call_deep(func, levels, frames_per_level=FRAMES_PER_LEVEL):
+    """Chama `func` com o limite de recursão folgado para `levels` níveis de closures."""
+    # a compilação não usa a pilha do Python, mas as closures chamam umas às
+    # outras (chamadas Python para Python, que no CPython não gastam a pilha de C)
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(limit + levels * frames_per_level)
+    try:
+        return func()
+    finally:
+        sys.setrecursionlimit(limit)
+
+
+def run(program, symbol_table):
+    """Checa `program` e, sem erros, executa com valores crus."""
+    errors = check(program)
+    if errors:
+        raise TypeCheckError(errors)
+    call_deep(TypedCompiler(program, symbol_table).compile(), depth(program))
+
+
+class _CountingInterpreter(main.Interpreter):
+    """
+    main.Interpreter que conta as tuplas (tipo, valor) que cria nas
+    expressões achatadas (uma por operador ou leitura de sensor executado)
+    e as iterações de laço. As escritas de variável são contadas por
+    _CountingVariables.
+    """
+    def __init__(self):
+        super().__init__()
+        self.boxes = 0
+        self.iterations = 0
+        # id(expressão) -> instruções que criam uma tupla nova a cada avaliação
+        self.fresh = {}
+
+    def value(self, expr, table):
+        result = super().value(expr, table)
+        fresh = self.fresh.get(id(expr))
+        if fresh is None:
+            entry = self.postfix.get(id(expr))
+            code = entry[1] if entry is not None else ()
+            fresh = self.fresh[id(expr)] = sum(
+                1 for op, _ in code if op in (main._BINARY, main._UNARY, main._SENSOR))
+        self.boxes += fresh
+        return result
+
+    def iterate(self, loop, count=1):
+        self.iterations += count
+
+
+class _CountingVariables(dict):
+    """
+    Variáveis da tabela raiz: Assignment, VarInit e a variável do for montam
+    uma tupla nova a cada escrita.
+    """
+    def __init__(self, interpreter):
+        super().__init__()
+        self.interpreter = interpreter
+
+    def __setitem__(self, name, type_val):
+        self.interpreter.boxes += 1
+        super().__setitem__(name, type_val)
+
+
+class _CountingCompiler(TypedCompiler):
+    """TypedCompiler com cada expressão embrulhada: conta as que devolvem tupla."""
+    def __init__(self, program, symbol_table):
+        super().__init__(program, symbol_table)
+        self.boxes = 0
+
+    def visit_expr(self, node):
+        expr = yield super().visit_expr(node)
+
+        def counted():
+            result = expr()
+            if type(result) is tuple:
+                self.boxes += 1
+            return result
+        return counted
+
+
+def bench(program, sensors=None):
+    """
+    Roda `program` no tree (main.Interpreter) e no typed com um sink em
+    memória. Mede o tempo de cada um e, com tracemalloc, o pico de memória
+    alocada durante a execução. As tuplas (tipo, valor) por iteração de
+    laço são uma estimativa: contam os operadores, leituras de sensor e
+    escritas de variável executados no tree e os resultados em tupla das
+    closures do typed, não as alocações de fato.
+    """
+    import time
+    import tracemalloc
+    from sinks import MemorySink
+    from sensors import StaticSensors
+
+    interpreter = _CountingInterpreter()
+    table = main.SymbolTable(sink=MemorySink(), sensors=StaticSensors(sensors))
+    table.variables = _CountingVariables(interpreter)
+    interpreter.execute(program, table)
+    compiler = _CountingCompiler(program, main.SymbolTable(sink=MemorySink(), sensors=StaticSensors(sensors)))
+    # uma closure a mais por expressão
+    call_deep(compiler.compile(), depth(program), FRAMES_PER_LEVEL + 1)
+    loops = max(1, interpreter.iterations)
+
+    results = {}
+    for engine in ("tree", "typed"):
+        table = main.SymbolTable(sink=MemorySink(), sensors=StaticSensors(sensors))
+        start = time.perf_counter()
+        main.run_program(program, table, engine)
+        results[engine + "_time"] = time.perf_counter() - start
+        # outra execução só para a memória: tracemalloc deixa tudo mais lento
+        table = main.SymbolTable(sink=MemorySink(), sensors=StaticSensors(sensors))
+        tracemalloc.start()
+        try:
+            main.run_program(program, table, engine)
+            results[engine + "_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {
+        "loop_iterations": interpreter.iterations,
+        "tree_boxes": interpreter.boxes,
+        "tree_boxes_per_iteration": interpreter.boxes / loops,
+        "typed_boxes": compiler.boxes,
+        "typed_boxes_per_iteration": compiler.boxes / loops,
+        **results,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argparser = argparse.ArgumentParser(description="Checagem estática de tipos")
+    argparser.add_argument("file")
+    argparser.add_argument("--bench", action="store_true",
+                           help="compara pico de memória, tempo e tuplas estimadas entre tree e typed")
+    args = argparser.parse_args()
+
+    with open(args.file, "r") as f:
+        program = main.Parser(main.Tokenizer(f.read())).parse()
+    errors = check(program)
+    for msg in errors:
+        sys.stderr.write(f"Erro: {msg}\n")
+    if errors:
+        sys.exit(1)
+    if args.bench:
+        stats = bench(program)
+        print(f"loop iterations: {stats['loop_iterations']}")
+        for engine in ("tree", "typed"):
+            print(f"{engine + ':':<6} {stats[engine + '_time']:.3f}s, "
+                  f"peak {stats[engine + '_peak_bytes']} bytes allocated, "
+                  f"~{stats[engine + '_boxes']} (type, value) tuples estimated "
+                  f"({stats[engine + '_boxes_per_iteration']:.1f} per iteration)")
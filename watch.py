@@ -0,0 +1,348 @@
+"""
+Modo watch: reexecuta um .rbt a cada gravação, reanalisando só o trecho editado.
+
+Document guarda o código, a lista de tokens (com o fim de cada um) e a AST.
+Numa edição:
+
+1. o trecho alterado sai do maior prefixo e do maior sufixo em comum entre o
+   texto antigo e o novo;
+2. o Tokenizer relê só a partir do token que encosta no trecho alterado, até
+   um token novo cair, já no sufixo inalterado, exatamente onde começava um
+   token antigo (deslocado): dali em diante os tokens antigos valem, só com
+   as posições deslocadas;
+3. a AST é percorrida a partir do programa: enquanto os tokens trocados
+   ficam estritamente entre as chaves de um bloco de uma única statement, a
+   busca desce para esse bloco. No bloco mais interno, só as statements que
+   cobrem os tokens trocados são lidas de novo pelo Parser, direto da lista
+   de tokens, e trocadas na lista de filhos; o resto da árvore é reusado.
+
+Se a leitura parcial falha (ou troca o sentido de algo fora do trecho, como
+um `else` solto), o documento inteiro é lido de novo, o que também dá a
+mensagem de erro certa. A ligação das funções (link_functions) e a checagem
+de tipos, quando há funções, continuam valendo para o programa inteiro.
+
+Uso:
+    python3 main.py --watch missao.rbt
+    python3 main.py --watch missao.rbt --engine vm --sensors front=wall
+"""
+import bisect
+import operator
+import os
+import sys
+import time
+
+import main
+from main import (EOF, FUNC, Block, ForStmt, FuncCall, FuncDec, If, Parser,
+                  Token, Tokenizer, WhileStmt)
+
+_POS = operator.attrgetter("pos")
+
+
+def _common_prefix(a, b):
+    # busca binária comparando fatias: a comparação roda em C
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix(a, b, limit):
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:len(a) - lo] == b[len(b) - mid:len(b) - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _scan(source, start=0):
+    """(token, fim) de cada token a partir de `start`, até o EOF."""
+    tokenizer = Tokenizer(source, start)
+    while True:
+        token = tokenizer.next
+        yield token, tokenizer.position
+        if token.type == EOF:
+            return
+        tokenizer.select_next()
+
+
+def _blocks(node):
+    # blocos cujo conteúdo pode ser relido sem reler a statement `node`
+    cls = type(node)
+    if cls is Block:
+        return [node]
+    if cls is If:
+        return node.children[1:]
+    if cls is WhileStmt or cls is ForStmt or cls is FuncDec:
+        return [node.children[-1]]
+    return []
+
+
+def _uses_functions(nodes):
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if type(node) is FuncDec or type(node) is FuncCall:
+            return True
+        stack.extend(child for child in node.children if child is not None)
+    return False
+
+
+class TokenList:
+    """Tokenizer sobre tokens já lidos: o Parser só usa next e select_next."""
+    def __init__(self, tokens, start, end, eof):
+        self.tokens = tokens
+        self.index = start
+        self.end = end
+        self.eof = eof
+        self.next = tokens[start] if start < end else eof
+
+    def select_next(self):
+        self.index += 1
+        self.next = self.tokens[self.index] if self.index < self.end else self.eof
+
+
+class RegionParser(Parser):
+    """Lê as statements de um trecho de bloco (nested) ou do nível de topo."""
+    def __init__(self, tokenizer, symbol_table, function=None, nested=False):
+        super().__init__(tokenizer, symbol_table)
+        self.function = function
+        self.nested = nested
+
+    def parse_simple_statement(self, stack):
+        if self.nested and self.tokenizer.next.type == FUNC:
+            raise Exception("Functions must be declared at the top level")
+        return super().parse_simple_statement(stack)
+
+
+class Document:
+    """
+    Código, tokens e AST de um programa, atualizados a cada edição por
+    update(). `program` é None enquanto o código não compila.
+    """
+    def __init__(self, source=None):
+        # só para o Parser: statements não tocam na tabela ao serem lidas
+        self.table = main.SymbolTable()
+        self.source = ""
+        self.tokens = []
+        self.ends = []
+        self.program = None
+        # False se link_functions/typecheck falharam na AST atual
+        self.linked = False
+        self.functions = {}
+        # da última atualização: leitura completa?, tokens lidos, statements relidas
+        self.full = True
+        self.scanned = 0
+        self.reparsed = 0
+        if source is not None:
+            self.load(source)
+
+    def load(self, source):
+        """Lê o programa inteiro de novo."""
+        self.source = source
+        self.program = None
+        self.tokens = []
+        self.ends = []
+        for token, end in _scan(source):
+            self.tokens.append(token)
+            self.ends.append(end)
+        self.full = True
+        self.scanned = len(self.tokens)
+        tokens = self.tokens
+        parser = Parser(TokenList(tokens, 0, len(tokens) - 1, tokens[-1]), self.table)
+        program = parser.parse()
+        self.reparsed = len(program.children)
+        self.functions = parser.functions
+        self.program = program
+        self.linked = True
+        return program
+
+    def update(self, source):
+        """Aplica o novo texto do arquivo e devolve a AST atualizada."""
+        if self.program is None:
+            return self.load(source)
+        if source == self.source:
+            self.full = False
+            self.scanned = self.reparsed = 0
+            changed = False
+        else:
+            try:
+                changed = self.reparse(source)
+            except Exception:
+                # o trecho sozinho não fecha: o documento inteiro diz o que houve
+                return self.load(source)
+        if changed or not self.linked:
+            self.linked = False
+            functions = {}
+            if main.link_functions(self.program, functions):
+                import typecheck
+                errors = typecheck.check(self.program)
+                if errors:
+                    raise typecheck.TypeCheckError(errors)
+            self.functions = functions
+            self.linked = True
+        return self.program
+
+    def reparse(self, source):
+        """Atualiza tokens e AST; True se as funções precisam ser religadas."""
+        old, tokens, ends = self.source, self.tokens, self.ends
+        start = _common_prefix(old, source)
+        suffix = _common_suffix(old, source, min(len(old), len(source)) - start)
+        delta = len(source) - len(old)
+        new_end = len(source) - suffix
+
+        # 1) tokens: relê do token que termina no trecho editado (ou depois)
+        # até sincronizar com um token antigo no sufixo inalterado
+        first = bisect.bisect_left(ends, start)
+        fresh, fresh_ends = [], []
+        for token, end in _scan(source, ends[first - 1] if first else 0):
+            if token.pos >= new_end:
+                target = token.pos - delta
+                k = bisect.bisect_left(tokens, target, lo=first, key=_POS)
+                if k < len(tokens) and tokens[k].pos == target:
+                    break
+            fresh.append(token)
+            fresh_ends.append(end)
+        self.full = False
+        self.scanned = len(fresh)
+        self.reparsed = 0
+        threshold = tokens[k].pos
+
+        if not fresh and k == first:
+            # só espaços ou comentários mudaram
+            self.source = source
+            self.shift_tokens(first, delta)
+            self.shift_nodes(threshold, delta)
+            return False
+
+        # 2) AST: desce até o bloco mais interno que contém os tokens trocados
+        # (em índices da lista antiga: tokens[first:k] saem, `fresh` entra)
+        container = self.program
+        lo, hi = 0, len(tokens) - 1
+        function = None
+        while True:
+            children = container.children
+            if not children:
+                k1, k2, s, e = 0, -1, lo, hi
+                break
+            if first < k:
+                lo_tok, hi_tok = first, k - 1
+            else:
+                lo_tok = hi_tok = max(first - 1, lo)
+            k1 = max(bisect.bisect_right(children, tokens[lo_tok].pos, key=_POS) - 1, 0)
+            k2 = max(bisect.bisect_right(children, tokens[hi_tok].pos, key=_POS) - 1, k1)
+            s = bisect.bisect_left(tokens, children[k1].pos, key=_POS)
+            e = bisect.bisect_left(tokens, children[k2 + 1].pos, key=_POS) if k2 + 1 < len(children) else hi
+            if k1 != k2:
+                break
+            node = children[k1]
+            blocks = _blocks(node)
+            for i, block in enumerate(blocks):
+                open_ = bisect.bisect_left(tokens, block.pos, key=_POS)
+                if i + 1 < len(blocks):
+                    # then de um if com else: "}" "else" "{"
+                    close = bisect.bisect_left(tokens, blocks[i + 1].pos, key=_POS) - 2
+                else:
+                    close = e - 1
+                if open_ < first and k <= close:
+                    container, lo, hi = block, open_ + 1, close
+                    if type(node) is FuncDec:
+                        function = node
+                    break
+            else:
+                break
+
+        # 3) troca os tokens e desloca o que vem depois do trecho editado
+        self.source = source
+        tokens[first:k] = fresh
+        ends[first:k] = fresh_ends
+        self.shift_tokens(first + len(fresh), delta)
+        self.shift_nodes(threshold, delta)
+
+        # 4) relê só as statements afetadas, direto da lista de tokens
+        e += len(fresh) - (k - first)
+        nested = container is not self.program
+        eof = Token(EOF, None, tokens[e].pos)
+        parser = RegionParser(TokenList(tokens, s, e, eof), self.table, function, nested)
+        statements = list(parser.iter_program())
+        if nested and not statements and len(container.children) == k2 - k1 + 1:
+            raise Exception("Empty block is not allowed")
+        removed = container.children[k1:k2 + 1]
+        container.children[k1:k2 + 1] = statements
+        self.reparsed = len(statements)
+        # sem funções no programa nem no trecho trocado não há o que religar;
+        # com funções, a checagem de tipos vale para o programa inteiro
+        return bool(self.functions) or _uses_functions(removed) or _uses_functions(statements)
+
+    def shift_tokens(self, index, delta):
+        if not delta:
+            return
+        for token in self.tokens[index:]:
+            token.pos += delta
+        ends = self.ends
+        ends[index:] = [end + delta for end in ends[index:]]
+
+    def shift_nodes(self, threshold, delta):
+        """Soma `delta` a `pos` de todo nó que começa em `threshold` ou depois."""
+        if not delta:
+            return
+        stack = [self.program]
+        while stack:
+            node = stack.pop()
+            pos = node.pos
+            if pos is not None and pos >= threshold:
+                node.pos = pos + delta
+            children = node.children
+            if type(node) is Block and children:
+                # statements que terminam antes de `threshold` ficam como estão
+                i = bisect.bisect_right(children, threshold, key=_POS)
+                stack.extend(children[max(i - 1, 0):])
+            else:
+                stack.extend(child for child in children if child is not None)
+
+    def report(self, elapsed):
+        kind = "full parse" if self.full else "incremental"
+        return (f"watch: {kind}, {self.scanned} tokens scanned, "
+                f"{self.reparsed} statements parsed, {elapsed * 1e3:.1f} ms")
+
+
+def watch(path, run, interval=0.2, log=sys.stderr):
+    """
+    Acompanha `path`: a cada mudança atualiza o Document e chama
+    run(program); erros de análise são mostrados e a espera continua.
+    Ctrl-C encerra.
+    """
+    document = Document()
+    signature = None
+    try:
+        while True:
+            try:
+                stat = os.stat(path)
+                current = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                current = None
+            if current is not None and current != signature:
+                signature = current
+                with open(path, 'r') as f:
+                    source = f.read()
+                if source != document.source or document.program is None:
+                    started = time.perf_counter()
+                    try:
+                        program = document.update(source)
+                    except Exception as e:
+                        sys.stdout.flush()
+                        for msg in getattr(e, "errors", None) or [e]:
+                            log.write(f"Erro: {msg}\n")
+                    else:
+                        log.write(document.report(time.perf_counter() - started) + "\n")
+                        run(program)
+                    log.flush()
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass